@@ -0,0 +1,335 @@
+"""Analytics over recorded games
+
+This module loads record files (see Records.py) into a GameArchive, which holds every game, ship and shot in flat NumPy
+arrays, and works out statistics from those arrays in whole-array passes rather than looping over the games in Python:
+
+    shots_to_win(): the number of shots the winner of each game fired, for histograms
+    first_hit_heatmaps(): how often each cell was the first one a player hit
+    mode_contributions(): how many shots, hits and sinks each ComputerPlayer targeting mode made
+    last_sunk(): how often each ship was the last one sunk
+
+Loading decodes every varint in a block of the file at once with NumPy, so the only Python loop left is the one stepping
+from entry to entry, which reads one number per game. Run it on one or more record files, such as ones from two
+versions of the AI, to compare them:
+
+    python Analytics.py old.rec new.rec
+
+The module needs NumPy; its functions raise ImportError without it.
+"""
+
+from collections import Counter
+from timeit import default_timer
+
+from Records import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+block_size = 1 << 22
+"""The number of bytes of a record file decoded at once"""
+
+
+def decode_varints(data):
+    """Decodes every varint in a block of bytes at once
+
+    A varint ends at every byte below 0x80. Most are only a byte or two long, so the value of every varint is built up
+    a byte at a time, each time only for the ones long enough. Varints longer than 9 bytes, which only seeds can be,
+    don't fit in 64 bits and come out wrong, but nothing here needs the seeds.
+
+    Args:
+        data (numpy.ndarray): A uint8 array, which must end at the end of a varint
+
+    Returns:
+        A tuple of int64 arrays of the value of every varint, the position of its first byte and the position of the
+        byte after it
+    """
+    ends = numpy.flatnonzero(data < 0x80) + 1
+    starts = numpy.concatenate(([0], ends[:-1]))
+    values = (data[starts] & 0x7F).astype(numpy.int64)
+    longer = numpy.flatnonzero(ends - starts > 1)
+    for byte in range(1, 9):
+        if not len(longer):
+            break
+        values[longer] |= (data[starts[longer] + byte] & 0x7F).astype(numpy.int64) << 7 * byte
+        longer = longer[ends[longer] - starts[longer] > byte + 1]
+    return values, starts, ends
+
+
+class GameArchive(object):
+    """Every game in some record files, as NumPy arrays
+
+    The shots of game g are at positions shot_offsets[g] to shot_offsets[g + 1] of the shot arrays, in the order they
+    were fired; the ships of every game are listed the same way in the ship arrays, player 0's fleet first.
+
+    Attributes:
+        names (list of str): Every ship name in the files, indexed by ship_name
+        rows (numpy.ndarray): The number of rows on the boards of every game
+        columns (numpy.ndarray): The number of columns on the boards of every game
+        shot_offsets (numpy.ndarray): Where every game's shots start in the shot arrays, with the total at the end
+        shot_game, shot_player, shot_cell, shot_result, shot_mode (numpy.ndarray): The game, the player who fired (0 or
+            1), the cell, the result (the index in shot_results) and the mode (the index in shot_modes) of every shot
+        ship_game, ship_player, ship_cell, ship_direction, ship_size, ship_name (numpy.ndarray): The game, the owner,
+            the first cell, the direction (the index in directions), the size and the name (the index in names) of
+            every ship
+    """
+    fields = [('rows', 'int32'), ('columns', 'int32'), ('shots', 'int32'), ('ships', 'int32'),
+              ('shot_player', 'int8'), ('shot_cell', 'int32'), ('shot_result', 'int8'), ('shot_mode', 'int8'),
+              ('ship_cell', 'int32'), ('ship_direction', 'int8'), ('ship_size', 'int32'), ('ship_name', 'int32')]
+    """The arrays decoded from the files, with their types; ships has two numbers per game, one for each fleet"""
+
+    def __init__(self, paths):
+        """Inits GameArchive with every game in the record files at the given paths; needs NumPy"""
+        if numpy is None:
+            raise ImportError("GameArchive needs NumPy")
+        self.names = []
+        parts = {field: [] for field, dtype in self.fields}
+        for path in paths:
+            self._load(path, parts)
+        arrays = {field: numpy.concatenate(parts[field]) if parts[field] else numpy.zeros(0, dtype)
+                  for field, dtype in self.fields}
+        self.rows = arrays['rows']
+        self.columns = arrays['columns']
+        games = numpy.arange(len(self.rows), dtype=numpy.int32)
+        self.shot_offsets = numpy.concatenate(([0], numpy.cumsum(arrays['shots'], dtype=numpy.int64)))
+        self.shot_game = numpy.repeat(games, arrays['shots'])
+        self.shot_player = arrays['shot_player']
+        self.shot_cell = arrays['shot_cell']
+        self.shot_result = arrays['shot_result']
+        self.shot_mode = arrays['shot_mode']
+        self.ship_game = numpy.repeat(games, arrays['ships'].reshape(-1, 2).sum(axis=1))
+        self.ship_player = numpy.repeat(numpy.tile(numpy.array([0, 1], dtype=numpy.int8), len(games)), arrays['ships'])
+        self.ship_cell = arrays['ship_cell']
+        self.ship_direction = arrays['ship_direction']
+        self.ship_size = arrays['ship_size']
+        self.ship_name = arrays['ship_name']
+
+    @property
+    def games(self):
+        """The number of games in the archive"""
+        return len(self.rows)
+
+    def _load(self, path, parts):
+        """Decodes a record file a block at a time, adding its arrays to parts"""
+        reader = RecordReader(path)
+        data = numpy.frombuffer(reader._map, dtype=numpy.uint8) if len(reader._map) else numpy.zeros(0, numpy.uint8)
+        name_ids = []
+        position = len(MAGIC)
+        while position < len(data):
+            block = data[position:position + block_size]
+            # the block has to end with a whole varint
+            if position + block_size < len(data):
+                block = block[:numpy.flatnonzero(block < 0x80)[-1] + 1]
+            used = self._load_block(block, reader.version, name_ids, parts)
+            if not used:
+                if position + block_size >= len(data):
+                    # the last entry was only partly written
+                    break
+                raise ValueError("{0} has an entry longer than a block".format(path))
+            position += used
+        # the map can't be closed while an array still uses it
+        data = block = None
+        reader.close()
+
+    def _load_block(self, block, version, name_ids, parts):
+        """Decodes the whole entries at the start of a block, adding their arrays to parts
+
+        Every entry is its kind, its length and its payload, so where the next entry would start is worked out for
+        every varint at once; only the chain of entries from the first one is followed in Python.
+
+        An N entry's name isn't made of varints, and when its last byte is 0x80 or more the varint it ends in runs on
+        into the next entry. The chain stops after such an entry, so the next block starts at the entry after it and
+        is split into varints from there.
+
+        Returns:
+            The number of bytes of the block used
+        """
+        values, starts, ends = decode_varints(block)
+        size = len(block)
+        tokens = len(values)
+        if tokens < 2:
+            return 0
+        entry_ends = ends[1:] + values[1:]
+        # the number of the varint starting at every byte that starts one, and at the end of the block; -1 elsewhere
+        token = numpy.full(size + 1, -1, dtype=numpy.int64)
+        token[starts] = numpy.arange(tokens)
+        token[size] = tokens
+        following = numpy.where(entry_ends <= size, token[numpy.clip(entry_ends, 0, size)], tokens)
+        entries = []
+        append = entries.append
+        item = following.item
+        entry = 0
+        while 0 <= entry < tokens - 1:
+            append(entry)
+            entry = item(entry)
+        if entries and entry_ends[entries[-1]] > size:
+            entries.pop()
+        if not entries:
+            return 0
+        used = int(entry_ends[entries[-1]])
+        entries = numpy.array(entries, dtype=numpy.int64)
+        kinds = values[entries]
+        for entry in entries[kinds == ord('N')].tolist():
+            payload = bytearray(block[ends[entry + 1]:entry_ends[entry]].tobytes())
+            number, start = get_varint(payload, 0)
+            name = str(payload[start:])
+            if name not in self.names:
+                self.names.append(name)
+            name_ids.append(self.names.index(name))
+        # a G entry is its kind, its length, then the seed, rows, columns and two fleets, then the shots
+        games = entries[kinds == ord('G')]
+        if not len(games):
+            return used
+        first_fleet = values[games + 5]
+        second_fleet = values[games + 6 + 4 * first_fleet]
+        shot_starts = games + 8 + 4 * (first_fleet + second_fleet)
+        shots = values[shot_starts - 1]
+        ships = numpy.stack([first_fleet, second_fleet], axis=1).ravel()
+        ship_starts = numpy.stack([games + 6, games + 7 + 4 * first_fleet], axis=1).ravel()
+        ship_values = values[ranges(ship_starts, 4 * ships)].reshape(-1, 4)
+        shot_values = values[ranges(shot_starts, shots)]
+        arrays = {'rows': values[games + 3], 'columns': values[games + 4], 'shots': shots, 'ships': ships,
+                  'shot_player': shot_values & 1, 'shot_result': shot_values >> 1 & 3,
+                  'ship_cell': ship_values[:, 0], 'ship_direction': ship_values[:, 1],
+                  'ship_size': ship_values[:, 2],
+                  'ship_name': numpy.array(name_ids, dtype=numpy.int64)[ship_values[:, 3]]}
+        if version == 1:
+            arrays['shot_cell'] = shot_values >> 3
+            arrays['shot_mode'] = numpy.zeros(len(shot_values), dtype=numpy.int8)
+        else:
+            arrays['shot_cell'] = shot_values >> 6
+            arrays['shot_mode'] = shot_values >> 3 & 7
+        for field, dtype in self.fields:
+            parts[field].append(arrays[field].astype(dtype))
+        return used
+
+
+def ranges(starts, counts):
+    """Concatenates the ranges of counts[i] numbers from starts[i], as one array"""
+    total = int(counts.sum())
+    if not total:
+        return numpy.zeros(0, dtype=numpy.int64)
+    offsets = numpy.cumsum(counts) - counts
+    return numpy.repeat(starts - offsets, counts) + numpy.arange(total)
+
+
+def shots_to_win(archive):
+    """Returns an array of the number of shots the winner of every game fired; the winner fired the last shot"""
+    last = archive.shot_offsets[1:] - 1
+    winner = archive.shot_player[last]
+    fired = archive.shot_player == winner[archive.shot_game]
+    return numpy.bincount(archive.shot_game[fired], minlength=archive.games)
+
+
+def first_hit_heatmaps(archive):
+    """Counts how often each cell was the first one a player hit in a game
+
+    Returns:
+        A dictionary mapping every board shape (rows, columns) in the archive to an array of that shape with the count
+        for every cell
+    """
+    games = []
+    cells = []
+    hit = archive.shot_result != 0
+    for player in range(2):
+        hits = numpy.flatnonzero(hit & (archive.shot_player == player))
+        # the shots are in game order, so a player's first hit in a game is where the game changes
+        hit_games = archive.shot_game[hits]
+        first = numpy.concatenate(([True], hit_games[1:] != hit_games[:-1])) if len(hits) else hits.astype(bool)
+        games.append(hit_games[first])
+        cells.append(archive.shot_cell[hits[first]])
+    games = numpy.concatenate(games)
+    cells = numpy.concatenate(cells)
+    heatmaps = {}
+    shapes = archive.rows[games].astype(numpy.int64) << 32 | archive.columns[games]
+    for shape in numpy.unique(shapes):
+        rows, columns = int(shape >> 32), int(shape & 0xFFFFFFFF)
+        counts = numpy.bincount(cells[shapes == shape], minlength=rows * columns)
+        heatmaps[(rows, columns)] = counts.reshape(rows, columns)
+    return heatmaps
+
+
+def mode_contributions(archive):
+    """Counts the shots, hits and sinks of every targeting mode
+
+    Returns:
+        A dictionary mapping every mode in shot_modes that fired any shots to a tuple of its shots, hits and sinks
+    """
+    modes = len(shot_modes)
+    shots = numpy.bincount(archive.shot_mode, minlength=modes)
+    hits = numpy.bincount(archive.shot_mode[archive.shot_result != 0], minlength=modes)
+    sinks = numpy.bincount(archive.shot_mode[archive.shot_result == 2], minlength=modes)
+    return {mode: (int(shots[number]), int(hits[number]), int(sinks[number]))
+            for number, mode in enumerate(shot_modes) if shots[number]}
+
+
+def last_sunk(archive):
+    """Counts how often each ship was the last one sunk in a game
+
+    The last shot of a game sinks the last ship, so that ship is the one of the loser's ships that covers the cell.
+
+    Returns:
+        A Counter of ship names
+    """
+    last = archive.shot_offsets[1:] - 1
+    cells = archive.shot_cell[last][archive.ship_game]
+    loser = 1 - archive.shot_player[last][archive.ship_game]
+    columns = archive.columns[archive.ship_game]
+    start = archive.ship_cell
+    horizontal = archive.ship_direction == directions.index('e')
+    row_steps, column_steps = numpy.divmod(cells - start, columns)
+    # cells before the start of a ship wrap round to a negative row
+    size = archive.ship_size
+    covers = numpy.where(horizontal, (cells // columns == start // columns) & (cells >= start) & (cells - start < size),
+                         (column_steps == 0) & (row_steps >= 0) & (row_steps < size))
+    sunk = numpy.flatnonzero(covers & (archive.ship_player == loser))
+    counts = numpy.bincount(archive.ship_name[sunk], minlength=len(archive.names))
+    return Counter({name: int(counts[number]) for number, name in enumerate(archive.names) if counts[number]})
+
+
+def report(archive):
+    """Returns a multi-line summary of the games in an archive"""
+    if not archive.games:
+        return "Games: 0"
+    shots = shots_to_win(archive)
+    lines = ["Games: {0}".format(archive.games),
+             "Shots to win: mean {0:.2f}, min {1}, median {2:.0f}, 90th percentile {3:.0f}, max {4}".format(
+                 shots.mean(), shots.min(), numpy.percentile(shots, 50, interpolation='higher'),
+                 numpy.percentile(shots, 90, interpolation='higher'), shots.max()),
+             "Targeting modes:"]
+    total = float(len(archive.shot_mode))
+    for mode, (fired, hits, sinks) in sorted(mode_contributions(archive).items(), key=lambda item: -item[1][0]):
+        lines.append("{0:>10}: {1:.1%} of shots, {2} hits ({3:.1%} of its shots), {4} ships sunk".format(
+            mode or 'human', fired / total, hits, hits / float(fired), sinks))
+    lines.append("Last ship sunk:")
+    for name, count in last_sunk(archive).most_common():
+        lines.append("{0:>10}: {1:.1%}".format(name, count / float(archive.games)))
+    for (rows, columns), heatmap in sorted(first_hit_heatmaps(archive).items()):
+        if rows <= 26 and columns <= 26:
+            lines.append("First hits on {0}x{1} boards, per 1000 first hits:".format(rows, columns))
+            scale = 1000.0 / max(heatmap.sum(), 1)
+            for row, label in enumerate(geometry(rows, columns).row_labels):
+                lines.append("{0:>3} ".format(label) + " ".join("{0:3.0f}".format(count * scale)
+                                                               for count in heatmap[row]))
+    lines.append("Histogram of shots to win:")
+    histogram = numpy.bincount(shots)
+    for count in numpy.flatnonzero(histogram):
+        lines.append("{0:>5} {1}".format(count, histogram[count]))
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Report statistics of the games in record files, one file at a time.")
+    parser.add_argument("paths", nargs="+", help="record files, such as ones written by Simulator.py --record")
+    args = parser.parse_args()
+    for path in args.paths:
+        start = default_timer()
+        archive = GameArchive([path])
+        loaded = default_timer()
+        text = report(archive)
+        print("{0}: loaded in {1:.2f} s, analysed in {2:.2f} s".format(path, loaded - start, default_timer() - loaded))
+        print(text)
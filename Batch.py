@@ -0,0 +1,349 @@
+"""Lockstep batch simulation with NumPy
+
+Simulator.py plays one game at a time through Board and ComputerPlayer objects, so most of its time goes on the
+interpreter rather than the game. A GameBatch instead holds thousands of one-sided games at once as NumPy arrays, one
+row per game, and moves every game on by one shot at a time with a handful of array operations:
+
+    ship (int8): The index of the ship on every cell, or -1 for water
+    hit (bool): Whether every cell has been fired on
+    wounded (bool): Whether every cell has been hit but isn't part of a sunken ship
+    remaining (int8): The number of cells of every ship that haven't been hit
+    mode, target, direction, flipped: The ComputerPlayer's targeting state (see ComputerPlayer._take_turn())
+
+Every row has one more cell than the board, which stands for every cell off the edge: it is always fired on and always
+water, so walking off the board looks the same as walking into a miss and needs no test of its own.
+
+The AI is the ComputerPlayer's: search mode fires at one of the unfired cells with the most unfired neighbors, which is
+what its scores come down to for the size 2 it scores every ship as; pinpoint fires at the first unfired neighbor of the
+target clockwise from the direction; destroy walks along the hit cells of the ship and reverses, and hands over to
+pinpoint or search the same way. A turn is played in destroy, then pinpoint, then search mode, so a game handed on
+fires in the same step. Ties are broken with NumPy's random numbers rather than each game's Random, so the games aren't
+the ones Simulator.py plays for the same seed, but they're played by the same rules. Fleets are drawn by
+Placement.sequential_batch(), which places them the same way as random_fleet().
+
+There's no EndgameSolver (see Endgame.py): the last ships are sunk with the targeting modes like the rest. So the
+distribution of shots to win is that of a ComputerPlayer made with endgame=None, which takes a little under a shot more
+on average than the default one, and the layouts Optimizer.py finds with it are the ones that AI takes the longest to
+sink.
+
+Finished games are retired after every step, and their rows dropped every so often, so the arrays shrink as the batch
+plays out. Montecarlo mode, the endgame solver, records and instrumentation are only in Simulator.py.
+
+Run it directly to compare it with Simulator.py:
+
+    python Batch.py 100000 --seed 1
+"""
+
+from Simulator import *
+from Placement import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+batch_modes = ['search', 'pinpoint', 'destroy']
+"""The targeting modes a GameBatch plays in, in the order they're numbered in GameBatch.mode"""
+
+
+class GameBatch(object):
+    """A batch of one-sided games played in lockstep
+
+    Attributes:
+        geometry (Geometry): The Geometry of every board
+        sizes (list of int): The size of each ship of the fleet
+        rng (numpy.random.RandomState): The random numbers used for placing ships and breaking ties
+        ship (numpy.ndarray): The index of the ship on every cell of every game, or -1 for water
+        hit (numpy.ndarray): Whether every cell of every game has been fired on
+        wounded (numpy.ndarray): Whether every cell of every game has been hit but isn't part of a sunken ship
+        remaining (numpy.ndarray): The number of cells of every ship of every game that haven't been hit
+        afloat (numpy.ndarray): The number of ships of every game that haven't been sunk
+        mode (numpy.ndarray): The targeting mode of every game, as an index in batch_modes, or len(batch_modes) for a
+            game that is over but still has its row
+        target (numpy.ndarray): The target cell of every game, for pinpoint and destroy modes
+        direction (numpy.ndarray): The target direction of every game, as an index in directions
+        flipped (numpy.ndarray): Whether every game has already reversed direction in destroy mode
+        shots (numpy.ndarray): The number of shots every game has taken
+        number (numpy.ndarray): The number of every game, its row when the batch was made
+        turns (list of int): The number of turns started in each of batch_modes
+        times (list of float): The seconds spent on each of batch_modes
+        retired (int): The number of games that are over but still have their rows
+    """
+    def __init__(self, games, sizes, rng, geometry=None, layouts=None):
+        """Inits GameBatch with the given number of games, each with a fleet placed at random unless given; needs NumPy
+
+        Args:
+            games (int): The number of games
+            sizes (list of int): The size of each ship
+            rng (numpy.random.RandomState): The random numbers to use
+            geometry (Geometry): The Geometry of every board; the standard board if None
+            layouts (numpy.ndarray): The fleet of every game, as a row of the number of each ship's placement in
+                Geometry.placements(), like fleet_batches() gives; drawn at random if None
+        """
+        if numpy is None:
+            raise ImportError("GameBatch needs NumPy")
+        self.geometry = geometry or standard
+        self.sizes = sizes
+        self.rng = rng
+        cells = self.geometry.cells
+        # the neighbors of every cell in each direction, with the extra cell for off the board
+        self.neighbors = numpy.array([[cells if neighbor is None else neighbor for neighbor in
+                                       self.geometry.neighbors[direction]] + [cells] for direction in directions],
+                                     dtype=numpy.int64)
+        # 1 for the cells with a neighbor to the west and to the east, for counting neighbors along the rows
+        column = numpy.arange(cells) % self.geometry.columns
+        self.has_west = (column != 0).astype(numpy.int8)
+        self.has_east = (column != self.geometry.columns - 1).astype(numpy.int8)
+        # wide enough to count every cell of a row without overflowing
+        self.count_type = numpy.int8 if cells < 128 else numpy.int32
+        self.ship = numpy.full((games, cells + 1), -1, dtype=numpy.int8)
+        if layouts is None:
+            words = {size: placement_words(size, self.geometry) for size in set(sizes)}
+            layouts = sequential_batch(sizes, games, rng, words)
+        rows = numpy.arange(games)[:, None]
+        for number, size in enumerate(sizes):
+            placements = numpy.array([run for run, mask in self.geometry.placements(size)], dtype=numpy.int64)
+            self.ship[rows, placements[layouts[:, number]]] = number
+        self.hit = numpy.zeros((games, cells + 1), dtype=bool)
+        self.hit[:, cells] = True
+        self.wounded = numpy.zeros((games, cells + 1), dtype=bool)
+        self.remaining = numpy.tile(numpy.array(sizes, dtype=numpy.int8), (games, 1))
+        self.afloat = numpy.full(games, len(sizes), dtype=numpy.int8)
+        self.mode = numpy.zeros(games, dtype=numpy.int8)
+        self.target = numpy.zeros(games, dtype=numpy.int64)
+        self.direction = numpy.full(games, directions.index('w'), dtype=numpy.int64)
+        self.flipped = numpy.zeros(games, dtype=bool)
+        self.shots = numpy.zeros(games, dtype=numpy.int64)
+        self.number = numpy.arange(games)
+        self.turns = [0] * len(batch_modes)
+        self.times = [0.0] * len(batch_modes)
+        self.retired = 0
+
+    def __len__(self):
+        """The number of games still being played"""
+        return len(self.afloat) - self.retired
+
+    def _pick(self, choices):
+        """Returns a column of each row of a boolean array picked at random from its True ones; every row needs one"""
+        # summing the bools as int8 rather than as bools saves a conversion of every cell
+        running = choices.view(numpy.int8).cumsum(axis=1, dtype=self.count_type)
+        picks = (self.rng.random_sample(len(choices)) * running[:, -1]).astype(self.count_type)
+        return (running > picks[:, None]).argmax(axis=1)
+
+    def _fire(self, games, cells):
+        """Fires on a cell of each of the given games
+
+        Returns:
+            Two boolean arrays: whether each shot hit a ship, and whether it sank one
+        """
+        self.hit[games, cells] = True
+        self.shots[games] += 1
+        ships = self.ship[games, cells]
+        hits = ships >= 0
+        sunk = numpy.zeros(len(games), dtype=bool)
+        if hits.any():
+            rows, ships = games[hits], ships[hits]
+            self.wounded[rows, cells[hits]] = True
+            self.remaining[rows, ships] -= 1
+            sinking = self.remaining[rows, ships] == 0
+            if sinking.any():
+                rows, ships = rows[sinking], ships[sinking]
+                self.wounded[rows] &= self.ship[rows] != ships[:, None]
+                self.afloat[rows] -= 1
+                sunk[numpy.flatnonzero(hits)[sinking]] = True
+        return hits, sunk
+
+    def _retarget(self, games):
+        """Points each of the given games at one of its wounded cells, or puts it in search mode if there are none
+
+        Returns:
+            The games that have wounded cells
+        """
+        wounded = self.wounded[games].any(axis=1)
+        aimed = games[wounded]
+        if len(aimed):
+            self.target[aimed] = self._pick(self.wounded[aimed])
+        self.mode[games[~wounded]] = batch_modes.index('search')
+        return aimed
+
+    def _walk(self, games):
+        """Follows the hit ship cells from the target of each game in its direction, moving the target along them
+
+        Returns:
+            The unfired cell after the last hit ship cell of each game, or -1 where the walk ends in a miss or the edge
+        """
+        cells = self.target[games]
+        ends = numpy.full(len(games), -1, dtype=numpy.int64)
+        walking = numpy.arange(len(games))
+        while len(walking):
+            rows = games[walking]
+            following = self.neighbors[self.direction[rows], cells[walking]]
+            fired = self.hit[rows, following]
+            ends[walking[~fired]] = following[~fired]
+            onward = fired & (self.ship[rows, following] >= 0)
+            cells[walking[onward]] = following[onward]
+            walking = walking[onward]
+        self.target[games] = cells
+        return ends
+
+    def _destroy(self, games):
+        """Plays a turn of destroy mode for each of the given games
+
+        Returns:
+            The games handed on to pinpoint mode, and those handed on to search mode
+        """
+        cells = self._walk(games)
+        stuck = cells < 0
+        # a game that hasn't reversed yet reverses and walks back the other way
+        turning = stuck & ~self.flipped[games]
+        if turning.any():
+            rows = games[turning]
+            self.direction[rows] = (self.direction[rows] + 2) % 4
+            self.flipped[rows] = True
+            cells[turning] = self._walk(rows)
+            stuck = cells < 0
+        # a game still stuck has already reversed, and is handed on
+        handed = games[stuck]
+        self.flipped[handed] = False
+        pinpoint = self._retarget(handed)
+        self.mode[pinpoint] = batch_modes.index('pinpoint')
+        firing, cells = games[~stuck], cells[~stuck]
+        hits, sunk = self._fire(firing, cells)
+        flipped = self.flipped[firing]
+        reversing = firing[~hits & ~flipped]
+        self.direction[reversing] = (self.direction[reversing] + 2) % 4
+        self.flipped[reversing] = True
+        rotating = firing[~hits & flipped]
+        self.direction[rotating] = (self.direction[rotating] + 1) % 4
+        self.flipped[rotating] = False
+        self.flipped[firing[sunk]] = False
+        self._retarget(firing[sunk])
+        return pinpoint, handed[self.mode[handed] == batch_modes.index('search')]
+
+    def _pinpoint(self, games):
+        """Plays a turn of pinpoint mode for each of the given games
+
+        Returns:
+            The games handed on to search mode
+        """
+        turns = (self.direction[games, None] + numpy.arange(4)) % 4
+        around = self.neighbors[turns, self.target[games, None]]
+        unfired = ~self.hit[games[:, None], around]
+        found = unfired.any(axis=1)
+        handed = games[~found]
+        self.mode[handed] = batch_modes.index('search')
+        firing = games[found]
+        turn = unfired[found].argmax(axis=1)
+        rows = numpy.arange(len(firing))
+        directions_fired = turns[found][rows, turn]
+        hits, sunk = self._fire(firing, around[found][rows, turn])
+        self.mode[firing[hits]] = batch_modes.index('destroy')
+        self.direction[firing] = numpy.where(hits, directions_fired, (directions_fired + 1) % 4)
+        return handed
+
+    def _search(self, games):
+        """Plays a turn of search mode for each of the given games"""
+        columns = self.geometry.columns
+        unfired = (~self.hit[games, :-1]).view(numpy.int8)
+        # one more than the number of unfired neighbors of every cell, north, south, west and east
+        scores = numpy.ones(unfired.shape, dtype=numpy.int8)
+        scores[:, columns:] += unfired[:, :-columns]
+        scores[:, :-columns] += unfired[:, columns:]
+        scores[:, 1:] += unfired[:, :-1] * self.has_west[1:]
+        scores[:, :-1] += unfired[:, 1:] * self.has_east[:-1]
+        # and 0 for the fired cells, so every unfired cell scores above them
+        scores *= unfired
+        cells = self._pick(scores == scores.max(axis=1)[:, None])
+        hits, sunk = self._fire(games, cells)
+        aimed = games[hits]
+        self.mode[aimed] = batch_modes.index('pinpoint')
+        self.target[aimed] = cells[hits]
+
+    def step(self):
+        """Fires one shot in every game, then retires the games that are over
+
+        Returns:
+            Two arrays: the numbers of the games that finished, and the number of shots each took to win
+        """
+        started = [numpy.flatnonzero(self.mode == number) for number in range(len(batch_modes))]
+        search, pinpoint, destroy = started
+        for number, games in enumerate(started):
+            self.turns[number] += len(games)
+        start = default_timer()
+        if len(destroy):
+            to_pinpoint, to_search = self._destroy(destroy)
+            pinpoint = numpy.concatenate((pinpoint, to_pinpoint))
+            search = numpy.concatenate((search, to_search))
+        after_destroy = default_timer()
+        if len(pinpoint):
+            search = numpy.concatenate((search, self._pinpoint(pinpoint)))
+        after_pinpoint = default_timer()
+        if len(search):
+            self._search(search)
+        for number, seconds in enumerate((default_timer() - after_pinpoint, after_pinpoint - after_destroy,
+                                          after_destroy - start)):
+            self.times[number] += seconds
+        over = numpy.flatnonzero((self.afloat == 0) & (self.mode != len(batch_modes)))
+        self.mode[over] = len(batch_modes)
+        self.retired += len(over)
+        finished = (self.number[over], self.shots[over])
+        # the rows of finished games are only dropped once there are enough of them to be worth copying the rest
+        if self.retired * 4 >= len(self.afloat):
+            playing = self.mode != len(batch_modes)
+            for name in ('ship', 'hit', 'wounded', 'remaining', 'afloat', 'mode', 'target', 'direction', 'flipped',
+                         'shots', 'number'):
+                setattr(self, name, getattr(self, name)[playing])
+            self.retired = 0
+        return finished
+
+
+def batch_simulate(games, seed=None, shape=(10, 10), fleet=None, batch=10000):
+    """Plays games in lockstep batches and collects statistics
+
+    Args:
+        games (int): The number of games to play
+        seed (int): Seed for the random numbers; None seeds from the system
+        shape (tuple): The rows and columns of every board
+        fleet (dict): The names of the ships in every fleet and their sizes; the standard 5 ships if None
+        batch (int): The most games played at once
+
+    Returns:
+        A Results containing the statistics of every game; the times of each mode are the times of its part of every
+        step, so they only add up to the time spent playing
+    """
+    rng = numpy.random.RandomState(seed)
+    # placed in the same order as a Player's ships
+    sizes = list(dict(standard_fleet if fleet is None else fleet).values())
+    board_geometry = geometry(*shape)
+    results = Results()
+    for first in range(0, games, batch):
+        start = default_timer()
+        playing = GameBatch(min(batch, games - first), sizes, rng, board_geometry)
+        while len(playing):
+            results.shots.update(playing.step()[1].tolist())
+        results.elapsed += default_timer() - start
+        for number, mode in enumerate(batch_modes):
+            results.mode_turns[mode] += playing.turns[number]
+            results.mode_time[mode] += playing.times[number]
+    return results
+
+
+# Benchmark of the batch simulator against the object model of Simulator.py
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Play the AI in lockstep batches and compare it with Simulator.py.")
+    parser.add_argument("games", nargs="?", type=int, default=100000, help="number of games to play (default 100000)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, for repeatable runs")
+    parser.add_argument("--batch", type=int, default=10000, help="most games played at once (default 10000)")
+    parser.add_argument("--compare", type=int, default=2000,
+                        help="number of games to play with Simulator.py for comparison (default 2000)")
+    args = parser.parse_args()
+    results = batch_simulate(args.games, args.seed, batch=args.batch)
+    print(results.report())
+    reference = simulate(args.compare, args.seed)
+    print("Simulator.py, with the endgame solver: mean {0:.2f} shots, {1:.1f} games per second; batch: {2:.1f} times "
+          "as many games per second".format(reference.mean(), reference.games / reference.elapsed,
+                          (results.games / results.elapsed) / (reference.games / reference.elapsed)))
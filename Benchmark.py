@@ -0,0 +1,367 @@
+"""Micro- and macro-benchmarks of the game's hot paths, with stored baselines
+
+Every benchmark times one operation over and over. The microbenchmarks time single calls of adjacent(),
+Board.neighborhoods(), Board.put_ship(), Board.sink_ships(), Board.__str__(), Board.show(), and
+ComputerPlayer.take_turn() in each targeting mode; the macrobenchmarks time whole AI-vs-AI games, the way Simulator.py
+plays them. Run it directly for a report:
+
+    python Benchmark.py
+
+Each benchmark prepares the inputs for a number of calls first, such as a fresh Board for every put_ship() or a game
+played up to the point where the ComputerPlayer is in the mode being timed, and only the calls themselves are timed,
+with the garbage collector off, as timeit does. Everything is prepared from a Random with a fixed seed, so every run
+times the same calls, enough of them to take tens of milliseconds at least. Each repeat starts with the caches the AI
+shares between games emptied, so the games don't get faster as the run goes on.
+
+That's repeated a number of times, and the fastest repeat is kept, since anything else running on the machine can only
+make a repeat slower. The repeats go round every benchmark in turn rather than timing one benchmark over and over, so a
+spell of the machine being busy slows one repeat of several benchmarks rather than every repeat of one. How far the
+median repeat is behind the fastest is kept as well, as the benchmark's noise.
+
+The times can be saved as a baseline, and a later run compared against it, which fails if any benchmark has got slower
+than the baseline by more than a threshold. A benchmark's noise in the baseline is allowed on top, up to a cap, so the
+ones that are hard to time steadily on a machine don't fail on unchanged code; only the baseline's noise counts, so a
+run that is noisy itself doesn't loosen its own limits. --strict allows no noise at all, just the threshold:
+
+    python Benchmark.py --save
+    python Benchmark.py --compare --threshold 20
+    python Benchmark.py --compare --strict
+
+Baselines are only comparable on the same machine and Python, so the baselines file records both; a baseline from a
+different one is compared anyway, with a warning. The batch game benchmark needs NumPy, and is skipped without it.
+"""
+
+import gc
+import json
+import os
+import platform
+import sys
+from collections import namedtuple
+from functools import partial
+from random import Random
+from timeit import default_timer
+
+from Simulator import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+baseline_file = "benchmarks.json"
+"""The file baselines are saved to and compared against"""
+
+Benchmark = namedtuple('Benchmark', ['name', 'kind', 'prepare', 'calls'])
+"""A benchmark: its name, 'micro' or 'macro', a function that takes a Random and a number of calls and returns a list
+of that many functions to time calling, and the number of calls to time in each repeat"""
+
+
+def shot_board(rng, shots=30):
+    """Returns a Board with a random fleet on it and a number of random cells fired on, with any sunk ships removed"""
+    player = ComputerPlayer(rng=rng, pool=None)
+    player.setup()
+    for cell in rng.sample(range(player.board.geometry.cells), shots):
+        player.board.make(cell)
+    return player.board
+
+
+def prepare_adjacent(rng, calls):
+    """Calls adjacent() on random locations and directions that stay on the board"""
+    moves = [(location, direction) for location in locations for direction in directions
+             if standard.neighbors[direction][cell_index[location]] is not None]
+    return [partial(adjacent, *rng.choice(moves)) for call in range(calls)]
+
+
+def prepare_neighborhoods(rng, calls):
+    """Calls Board.neighborhoods() on random locations and sizes of boards that have been fired on"""
+    boards = [shot_board(rng) for board in range(16)]
+    return [partial(rng.choice(boards).neighborhoods, rng.choice(locations), rng.randint(2, 5))
+            for call in range(calls)]
+
+
+def prepare_put_ship(rng, calls):
+    """Calls Board.put_ship() on empty Boards, with sizes, locations and directions that fit"""
+    moves = [(size, location, direction) for size in range(2, 6) for location in locations for direction in directions
+             if standard.ship_cells(size, cell_index[location], direction) is not None]
+    return [partial(Board().put_ship, *(rng.choice(moves) + ("Ship",))) for call in range(calls)]
+
+
+def prepare_sink_ships(rng, calls):
+    """Calls Board.sink_ships() on Boards with one of their ships waiting to be removed"""
+    thunks = []
+    for call in range(calls):
+        player = ComputerPlayer(rng=rng, pool=None)
+        player.setup()
+        for cell in rng.choice(player.board.ships).cells:
+            player.board.fire_cell(cell)
+        thunks.append(player.board.sink_ships)
+    return thunks
+
+
+def prepare_str(rng, calls):
+    """Draws Boards that have been fired on, with their ships showing"""
+    boards = [shot_board(rng) for board in range(16)]
+    return [rng.choice(boards).__str__ for call in range(calls)]
+
+
+def prepare_show(rng, calls):
+    """Draws Boards that have been fired on, with their ships hidden"""
+    boards = [shot_board(rng) for board in range(16)]
+    return [rng.choice(boards).show for call in range(calls)]
+
+
+def position(rng, mode):
+    """Plays a game up to a random turn that starts in the given mode, and returns the attacking ComputerPlayer
+
+    The attacker has no opening book, so search mode turns work their scores out rather than looking them up, and no
+    EndgameSolver unless the mode is 'endgame', which starts on the first turn the opposing player has no more ships
+    left than the solver takes. Its PosteriorSampler, for 'montecarlo', draws 200 layouts a turn.
+    """
+    while True:
+        defender = ComputerPlayer(rng=Random(rng.getrandbits(32)), pool=None)
+        sampler = None
+        if mode == 'montecarlo':
+            sampler = PosteriorSampler(defender.ships.values(), 200)
+        endgame = EndgameSolver() if mode == 'endgame' else None
+        attacker = ComputerPlayer(rng=Random(rng.getrandbits(32)), sampler=sampler, book=None, endgame=endgame)
+        attacker.set_opponent(defender)
+        defender.setup()
+        for turn in range(rng.randrange(40)):
+            if len(defender.board.ships) <= 1:
+                break
+            attacker.take_turn()
+        while defender.board.ships:
+            if mode == 'endgame' and len(defender.board.ships) <= endgame.ships or attacker.mode == mode:
+                return attacker
+            attacker.take_turn()
+
+
+def prepare_take_turn(mode, rng, calls):
+    """Calls ComputerPlayer.take_turn() in positions starting in the given mode"""
+    return [position(rng, mode).take_turn for call in range(calls)]
+
+
+def prepare_game(rng, calls):
+    """Plays whole headless games, the way Simulator.py does"""
+    return [partial(play, Results(), rng=Random(rng.getrandbits(32))) for call in range(calls)]
+
+
+def prepare_batch_game(rng, calls):
+    """Plays batches of 1000 games in lockstep with NumPy, the way Batch.py does"""
+    from Batch import batch_simulate
+    return [partial(batch_simulate, 1000, rng.getrandbits(32)) for call in range(calls)]
+
+
+benchmarks = [
+    Benchmark('adjacent', 'micro', prepare_adjacent, 200000),
+    Benchmark('Board.neighborhoods', 'micro', prepare_neighborhoods, 20000),
+    Benchmark('Board.put_ship', 'micro', prepare_put_ship, 10000),
+    Benchmark('Board.sink_ships', 'micro', prepare_sink_ships, 10000),
+    Benchmark('Board.__str__', 'micro', prepare_str, 2000),
+    Benchmark('Board.show', 'micro', prepare_show, 2000),
+    Benchmark('take_turn search', 'micro', partial(prepare_take_turn, 'search'), 500),
+    Benchmark('take_turn pinpoint', 'micro', partial(prepare_take_turn, 'pinpoint'), 1000),
+    Benchmark('take_turn destroy', 'micro', partial(prepare_take_turn, 'destroy'), 1000),
+    Benchmark('take_turn montecarlo', 'micro', partial(prepare_take_turn, 'montecarlo'), 20),
+    Benchmark('take_turn endgame', 'micro', partial(prepare_take_turn, 'endgame'), 200),
+    Benchmark('game', 'macro', prepare_game, 50),
+    Benchmark('batch game', 'macro', prepare_batch_game, 2),
+]
+"""Every benchmark, in the order they're run and reported"""
+
+
+def available(benchmark):
+    """Returns whether a benchmark can be run here; the batch game needs NumPy"""
+    return benchmark.name != 'batch game' or numpy is not None
+
+
+def clear_caches():
+    """Empties the caches the AI shares between games, so every repeat starts from the same state
+
+    The shared opening book is emptied too, and never loads book_file after that, so the times don't depend on whether
+    there's a book on disk or on reading it.
+    """
+    endgame_solver.table.clear()
+    opening_book.path = None
+    opening_book.table.clear()
+
+
+def time_calls(benchmark, seed=0, scale=1.0):
+    """Prepares and times one repeat of a benchmark
+
+    Args:
+        benchmark (Benchmark): The benchmark to time
+        seed (int): Seeds the Random its calls are prepared with
+        scale (float): Multiplies the number of calls timed
+
+    Returns:
+        The seconds per call
+    """
+    calls = max(int(benchmark.calls * scale), 1)
+    thunks = benchmark.prepare(Random(seed), calls)
+    clear_caches()
+    gc.collect()
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        start = default_timer()
+        for thunk in thunks:
+            thunk()
+        return (default_timer() - start) / calls
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def run(names=None, repeats=9, seed=0, scale=1.0, stream=None):
+    """Times every benchmark that can be run here, or the ones with the given names
+
+    Args:
+        names (list of str): The names of the benchmarks to run; None for all of them
+        repeats (int): The number of times to time each one, going round all of them each time
+        seed (int): Seeds the Random the calls are prepared with
+        scale (float): Multiplies the number of calls timed in each repeat
+        stream (file): A stream to write each time to once it's measured, if any
+
+    Returns:
+        A tuple of two dictionaries of the name of every benchmark run: to the seconds per call of its fastest repeat,
+        and to its noise, how many percent slower than that its median repeat was
+    """
+    chosen = [benchmark for benchmark in benchmarks
+              if (names is None or benchmark.name in names) and available(benchmark)]
+    samples = dict((benchmark.name, []) for benchmark in chosen)
+    for repeat in range(repeats):
+        for benchmark in chosen:
+            samples[benchmark.name].append(time_calls(benchmark, seed, scale))
+    times = {}
+    noise = {}
+    for benchmark in chosen:
+        repeat_times = sorted(samples[benchmark.name])
+        times[benchmark.name] = repeat_times[0]
+        noise[benchmark.name] = (repeat_times[len(repeat_times) // 2] / repeat_times[0] - 1) * 100
+        if stream is not None:
+            stream.write("{0:>22} ({1}): {2}, noise {3:.1f}%\n".format(
+                benchmark.name, benchmark.kind, format_time(times[benchmark.name]), noise[benchmark.name]))
+    if stream is not None:
+        stream.flush()
+    return times, noise
+
+
+def format_time(seconds):
+    """Formats a time per call in the most readable unit"""
+    if seconds >= 1:
+        return "{0:.3f} s".format(seconds)
+    if seconds >= 0.001:
+        return "{0:.3f} ms".format(seconds * 1000)
+    return "{0:.3f} us".format(seconds * 1000000)
+
+
+def machine():
+    """Returns a description of the machine and Python the benchmarks are run on"""
+    return {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'machine': platform.machine(), 'processor': platform.processor(), 'system': platform.system()}
+
+
+def save(times, noise, path=baseline_file):
+    """Saves times and noise as the baseline, along with the machine they were measured on, keeping any others in the
+    file"""
+    baseline = load(path) if os.path.exists(path) else {'times': {}}
+    baseline['machine'] = machine()
+    baseline['times'].update(times)
+    baseline.setdefault('noise', {}).update(noise)
+    with open(path, 'w') as stream:
+        json.dump(baseline, stream, indent=2, separators=(',', ': '), sort_keys=True)
+        stream.write("\n")
+
+
+def load(path=baseline_file):
+    """Loads a baseline, as a dictionary of the 'machine' it was measured on and the 'times' and 'noise' of its
+    benchmarks; baselines saved before noise was measured have none"""
+    with open(path) as stream:
+        return json.load(stream)
+
+
+def compare(times, baseline, threshold=25.0, noise_cap=10.0):
+    """Compares times against a baseline
+
+    Args:
+        times (dict): The name of every benchmark run to its seconds per call
+        baseline (dict): The baseline, as load() gives it
+        threshold (float): The most percent slower than the baseline a benchmark can be without failing, on top of its
+            noise allowance
+        noise_cap (float): The most percent of a benchmark's noise in the baseline allowed on top of threshold; 0 to
+            enforce threshold alone
+
+    Returns:
+        A tuple of the list of the names of the benchmarks that failed, and a multi-line report
+    """
+    failed = []
+    lines = []
+    for benchmark in benchmarks:
+        name = benchmark.name
+        if name not in times:
+            continue
+        if name not in baseline['times']:
+            lines.append("{0:>22}: {1}, no baseline".format(name, format_time(times[name])))
+            continue
+        change = (times[name] / baseline['times'][name] - 1) * 100
+        limit = threshold + min(baseline.get('noise', {}).get(name, 0.0), noise_cap)
+        verdict = ""
+        if change > limit:
+            failed.append(name)
+            verdict = "  REGRESSED"
+        lines.append("{0:>22}: {1} against {2}, {3:+.1f}% of {4:+.1f}% allowed{5}".format(
+            name, format_time(times[name]), format_time(baseline['times'][name]), change, limit, verdict))
+    return failed, "\n".join(lines)
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Time the game's hot paths, and save or compare against a baseline.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default all of them): " +
+                                                 ", ".join(benchmark.name for benchmark in benchmarks))
+    parser.add_argument("--repeats", type=int, default=9, help="times to time each benchmark (default 9)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed the calls are prepared with (default 0)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiplies the number of calls timed, for quicker or steadier runs (default 1)")
+    parser.add_argument("--baseline", default=baseline_file, help="baselines file (default %(default)s)")
+    parser.add_argument("--save", action="store_true", help="save the times as the baseline")
+    parser.add_argument("--compare", action="store_true",
+                        help="compare the times against the baseline, and fail if any regressed")
+    parser.add_argument("--threshold", type=float, default=25.0,
+                        help="most percent slower than the baseline a benchmark can be, on top of its noise "
+                             "allowance (default 25)")
+    parser.add_argument("--noise-cap", type=float, default=10.0,
+                        help="most percent of a benchmark's noise in the baseline allowed on top of the threshold "
+                             "(default 10)")
+    parser.add_argument("--strict", action="store_true", help="allow no noise, only the threshold")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(benchmark.name for benchmark in benchmarks)
+    if unknown:
+        parser.error("unknown benchmarks: " + ", ".join(sorted(unknown)))
+    baseline = None
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            parser.error("there's no baseline in {0}; run with --save first".format(args.baseline))
+        baseline = load(args.baseline)
+    times, noise = run(args.names or None, args.repeats, args.seed, args.scale, None if args.compare else sys.stdout)
+    if args.save:
+        save(times, noise, args.baseline)
+        print("Saved {0} times to {1}".format(len(times), args.baseline))
+    if baseline is not None:
+        if baseline.get('machine') != machine():
+            print("Warning: the baseline was measured on a different machine or Python: {0}".format(
+                json.dumps(baseline.get('machine'), sort_keys=True)))
+        noise_cap = 0.0 if args.strict else args.noise_cap
+        failed, report = compare(times, baseline, args.threshold, noise_cap)
+        print(report)
+        allowed = "{0:g}%".format(args.threshold)
+        if noise_cap:
+            allowed += " and up to {0:g}% of noise".format(noise_cap)
+        if failed:
+            print("{0} of {1} benchmarks regressed by more than {2}: {3}".format(
+                len(failed), len(times), allowed, ", ".join(failed)))
+            sys.exit(1)
+        print("No benchmark regressed by more than {0}".format(allowed))
@@ -0,0 +1,221 @@
+"""Zobrist hashing and the opening book of the AI's search mode
+
+In search mode the ComputerPlayer fires at one of the cells with the best probability score (see Density.py), and those
+cells only depend on which cells it has fired on and the sizes of the ships left. Early in a game the same few states
+come up over and over, so an OpeningBook keeps the best cells of every state it has seen within the first depth shots,
+and the ComputerPlayer only has to work the scores out for a state that isn't in it.
+
+States are keyed by Zobrist hashing: every (cell, hit or miss) and every (size, number of ships of that size) has a
+random 64 bit key, and a state's hash is the exclusive or of the keys of its shots and its remaining ships. Adding a
+shot is one more exclusive or, so the ComputerPlayer keeps the hash of its shots up to date as it fires. The keys are
+drawn from a Random seeded with the shape of the board, so they're the same in every process and a book saved by one
+can be loaded by another.
+
+A book can be saved to a file and loaded from one. The file starts with the 4 bytes BOOK_MAGIC, then the length and
+the characters of the name of the scoring it was built with (Density.scoring), then holds an entry for every state, all
+varints (see Records.py): the rows and columns of the board, the hash, the number of best cells and the cells
+themselves. The shared opening_book loads book_file, next to this module, the first time it's looked in, if there is
+one, so a book built once (see the benchmark below, or Simulator.py's --book option) makes the opening of every game a
+hash lookup, from whatever directory the game is run in.
+
+The best cells are stored exactly as the scoring gives them, so playing from a book gives the same games as working
+every score out. A book built with another scoring, or in an older format, is refused rather than loaded; the shared
+opening_book then plays without it, which still gives the same games, and it can be built again.
+"""
+
+import os
+from random import Random
+
+from Density import scoring
+from Records import *
+
+
+BOOK_MAGIC = 'BSB2'
+"""The bytes every opening book file starts with; the last one is the version of the format"""
+
+book_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening.book")
+"""The file the shared opening_book is loaded from, if it exists"""
+
+
+class Zobrist(object):
+    """The Zobrist keys of one shape of board
+
+    Attributes:
+        shape (int): rows << 16 | columns, which seeds the keys
+        shots (list of int): The key of every shot, at 2 * cell for a miss and 2 * cell + 1 for a hit
+        fleets (dict): The key of every (size, number of ships of that size), made on demand
+    """
+    def __init__(self, rows, columns):
+        """Inits Zobrist with the keys for a board of the given shape"""
+        self.shape = rows << 16 | columns
+        rng = Random(self.shape)
+        self.shots = [rng.getrandbits(64) for key in range(2 * rows * columns)]
+        self.fleets = {}
+
+    def shot(self, cell, hit):
+        """Returns the key of a shot on a cell, which hit a ship or not"""
+        return self.shots[2 * cell + bool(hit)]
+
+    def fleet(self, sizes):
+        """Returns the key of the remaining ships, given the size of each"""
+        key = 0
+        for size in set(sizes):
+            pair = (size, sizes.count(size))
+            if pair not in self.fleets:
+                # seeded by the pair rather than drawn in turn, so every process makes the same key
+                self.fleets[pair] = Random(self.shape << 32 | pair[0] << 16 | pair[1]).getrandbits(64)
+            key ^= self.fleets[pair]
+        return key
+
+
+zobrists = {}
+"""The Zobrist keys of every shape of board used so far, by (rows, columns)"""
+
+
+def zobrist(geometry):
+    """Returns the Zobrist keys of the shape of a Geometry, making them the first time the shape is used"""
+    shape = (geometry.rows, geometry.columns)
+    if shape not in zobrists:
+        zobrists[shape] = Zobrist(*shape)
+    return zobrists[shape]
+
+
+class OpeningBook(object):
+    """A transposition table of the best search mode cells of the states seen early in games
+
+    Attributes:
+        path (str): The file to load the book from the first time it's looked in; None once it has been, or for none.
+            A file load() refuses is left out, so the book starts empty
+        depth (int): The most shots a state can have had to be looked up or stored
+        maxsize (int): The most states stored; once it's full, new states are no longer added
+        table (dict): Maps (rows, columns, hash) to the tuple of the best cells of the state
+        hits (int): The number of lookups the book answered
+        misses (int): The number of lookups it couldn't
+    """
+    def __init__(self, path=None, depth=10, maxsize=1 << 16):
+        """Inits OpeningBook empty, to be loaded from path if it's given and exists"""
+        self.path = path
+        self.depth = depth
+        self.maxsize = maxsize
+        self.table = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, geometry, state):
+        """Returns the tuple of the best cells of a state, or None if it isn't in the book
+
+        Args:
+            geometry (Geometry): The Geometry of the board
+            state (int): The Zobrist hash of the state
+        """
+        if self.path is not None:
+            path, self.path = self.path, None
+            if os.path.exists(path):
+                try:
+                    self.load(path)
+                except ValueError:
+                    pass
+        best = self.table.get((geometry.rows, geometry.columns, state))
+        if best is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return best
+
+    def put(self, geometry, state, best):
+        """Stores the best cells of a state, unless the book is full
+
+        Args:
+            geometry (Geometry): The Geometry of the board
+            state (int): The Zobrist hash of the state
+            best (list of int): The best cells of the state
+        """
+        if len(self.table) < self.maxsize:
+            self.table[(geometry.rows, geometry.columns, state)] = tuple(best)
+
+    def load(self, path):
+        """Adds the states of a book file to the book
+
+        Raises ValueError, without adding any, if the file isn't an opening book in the current format or was built with
+        another scoring than Density.scoring.
+        """
+        with open(path, 'rb') as stream:
+            data = stream.read()
+        if data[:len(BOOK_MAGIC) - 1] != BOOK_MAGIC[:-1]:
+            raise ValueError("{0} isn't an opening book".format(path))
+        if data[:len(BOOK_MAGIC)] != BOOK_MAGIC:
+            raise ValueError("{0} is an opening book in an older format; build it again".format(path))
+        buffer = bytearray(data)
+        length, position = get_varint(buffer, len(BOOK_MAGIC))
+        built = str(buffer[position:position + length])
+        if built != scoring:
+            raise ValueError("{0} was built with the scoring {1!r}, not {2!r}; build it again".format(
+                path, built, scoring))
+        position += length
+        while position < len(buffer) and len(self.table) < self.maxsize:
+            rows, position = get_varint(buffer, position)
+            columns, position = get_varint(buffer, position)
+            state, position = get_varint(buffer, position)
+            count, position = get_varint(buffer, position)
+            best = []
+            for cell in range(count):
+                cell, position = get_varint(buffer, position)
+                best.append(cell)
+            self.table[(rows, columns, state)] = tuple(best)
+
+    def save(self, path):
+        """Writes every state in the book to a file, replacing it"""
+        buffer = bytearray(BOOK_MAGIC)
+        put_varint(buffer, len(scoring))
+        buffer.extend(scoring)
+        for (rows, columns, state), best in sorted(self.table.items()):
+            for number in (rows, columns, state, len(best)) + best:
+                put_varint(buffer, number)
+        with open(path, 'wb') as stream:
+            stream.write(buffer)
+
+
+opening_book = OpeningBook(book_file)
+"""The OpeningBook shared by every ComputerPlayer in the process"""
+
+
+# Builds an opening book by playing games, and times the opening moves with and without it
+
+if __name__ == '__main__':
+    import argparse
+    from timeit import default_timer
+
+    from Player import *
+
+    parser = argparse.ArgumentParser(description="Build an opening book by playing ComputerPlayer against itself.")
+    parser.add_argument("games", nargs="?", type=int, default=2000, help="number of games to play (default 2000)")
+    parser.add_argument("--depth", type=int, default=10, help="most shots into a game to store (default 10)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default 0)")
+    parser.add_argument("--output", default=book_file, help="file to save the book to (default %(default)s)")
+    args = parser.parse_args()
+
+    def opening(book, seed):
+        """Times the first depth turns of a game played with a book, or without one if it's None"""
+        attacker = ComputerPlayer(rng=Random(seed), book=book)
+        defender = ComputerPlayer(rng=Random(seed + 1))
+        attacker.set_opponent(defender)
+        defender.setup()
+        start = default_timer()
+        for turn in range(args.depth):
+            attacker.take_turn()
+        return default_timer() - start
+
+    book = OpeningBook(depth=args.depth)
+    for game in range(args.games):
+        opening(book, 2 * (args.seed + game))
+    book.save(args.output)
+    print("{0} states from {1} games saved to {2}".format(len(book.table), args.games, args.output))
+    # timed on new games, which only share the states the book has seen
+    seeds = [2 * (args.seed + args.games + game) for game in range(args.games)]
+    book.maxsize = len(book.table)
+    without = sum(opening(None, seed) for seed in seeds)
+    book.hits = book.misses = 0
+    using = sum(opening(book, seed) for seed in seeds)
+    print("First {0} turns: {1:.3f} ms per game without the book, {2:.3f} ms with it ({3:.1%} of lookups hit)".format(
+        args.depth, without / args.games * 1000, using / args.games * 1000,
+        float(book.hits) / max(book.hits + book.misses, 1)))
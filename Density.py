@@ -0,0 +1,302 @@
+"""Probability density map for the AI's search mode
+
+This module contains the scoring used by the ComputerPlayer in search mode. The 'probability score' of a location is the
+number of neighborhoods (see Board.neighborhoods) that it has for each ship the opposing player has remaining, summed
+over those ships. The density() function computes every score from scratch the way the AI always used to, while the
+DensityMap keeps the scores between turns and only updates the ones that a new shot or a sunk ship can change.
+
+A score only depends on which cells within size - 1 steps along the location's row and column have been hit, so a shot
+only changes the scores of the cells around it in its own row and column. The scores are also kept in buckets by value,
+so the best locations can be read off without scanning the board. Each turn costs at most time in proportion to the
+number of cells, whatever the size of the board and the number of ships, so the AI can play on large boards.
+
+Counts aren't memoized. The AI scores every ship as size 2, and a count at size 2 is the number of the cell's four
+neighbors that haven't been hit: four byte lookups, which is less than building any key for them would take.
+
+PlacementDensity is an optional engine that needs NumPy. It scores every cell at once from running sums along the rows
+and columns, and gives the same scores as the other two for the sizes the AI scores with.
+"""
+
+from bisect import bisect_left, insort
+
+from Gameboard import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+scoring = "neighborhoods 1"
+"""Names the search mode scoring, for the opening books built with it (see Book.py); it must be changed along with any
+change to the scoring that changes which cells are best"""
+
+
+def neighborhood_count(geometry, fired, index, size):
+    """Counts the neighborhoods of a specific size around a cell without building them
+
+    This is len(Board.neighborhoods(location, size)) worked out from the cells that have been hit: walking out in each
+    direction, every cell within size - 1 steps that is on the board and not hit is counted, and a line with n cells
+    counted on either side of the location holds n + 1 - size + 1 neighborhoods.
+
+    Args:
+        geometry (Geometry): The Geometry of the Board
+        fired (bytearray): 1 for every cell of the Board that has been hit, as given by Geometry.unpack()
+        index (int): The index of the cell
+        size (int): The size of neighborhoods to count
+
+    Returns:
+        The number of neighborhoods the cell has at the given size
+    """
+    rays = geometry.rays
+    vert = hori = 2 - size
+    for cell in rays['n'][index][:size - 1] + rays['s'][index][:size - 1]:
+        if not fired[cell]:
+            vert += 1
+    for cell in rays['w'][index][:size - 1] + rays['e'][index][:size - 1]:
+        if not fired[cell]:
+            hori += 1
+    return max(vert, 0) + max(hori, 0)
+
+
+def density(board, sizes):
+    """Computes the probability score of every location on a Board from scratch
+
+    Args:
+        board (Board): The Board to score
+        sizes (list of int): The size used for each remaining ship
+
+    Returns:
+        A dictionary of every location on the board to its score; locations that have been hit score 0
+    """
+    node_probablities = {node: 0 for node in board.nodes.keys()}
+    for node in node_probablities.keys():
+        if not board.nodes[node].is_hit:
+            for size in sizes:
+                node_probablities[node] += len(board.neighborhoods(node, size))
+    return node_probablities
+
+
+class DensityMap(object):
+    """Incrementally updated probability scores for one Board
+
+    Every call to sync() catches up with the shots fired on the Board since the last call, whoever fired them, and with
+    any change to the sizes of the remaining ships. A new shot only updates the cells around it, but when the sizes
+    change every score is worked out again, which is one pass over the board for each different size.
+
+    Attributes:
+        board (Board): The Board being scored
+        hit_mask (int): The Board's hit bitmask as of the last sync()
+        fired (bytearray): 1 for every cell in hit_mask, so single cells can be tested without shifting the bitmask
+        sizes (list of int): The sorted sizes of the remaining ships as of the last sync()
+        weights (list of tuple): (size, number of ships of that size) for every different size in sizes
+        counts (dict): Maps each size in sizes to a list of the neighborhood count of every cell at that size
+        scores (list of int): The score of every cell, by index
+        buckets (dict): Maps each score to a sorted list of the indexes of the cells with that score
+        top (int): The highest score that any cell has
+    """
+    def __init__(self, board):
+        """Inits DensityMap for the given Board with no ships, so every score is 0 until the first sync()"""
+        self.board = board
+        self.geometry = board.geometry
+        self.hit_mask = 0
+        self.fired = bytearray(self.geometry.cells)
+        self.sizes = []
+        self.weights = []
+        self.counts = {}
+        self.scores = [0] * self.geometry.cells
+        self.buckets = {0: list(range(self.geometry.cells))}
+        self.top = 0
+
+    def _move(self, index, score):
+        """Changes the score of a cell, keeping the buckets and the top score up to date"""
+        old = self.scores[index]
+        if old == score:
+            return
+        bucket = self.buckets[old]
+        del bucket[bisect_left(bucket, index)]
+        if not bucket:
+            del self.buckets[old]
+        insort(self.buckets.setdefault(score, []), index)
+        self.scores[index] = score
+        if score > self.top:
+            self.top = score
+        while self.top not in self.buckets:
+            self.top -= 1
+
+    def _score(self, index):
+        """Works out the score of a cell from the neighborhood counts"""
+        if self.fired[index]:
+            return 0
+        return sum(self.counts[size][index] * number for size, number in self.weights)
+
+    def _rebuild(self):
+        """Works out every score and bucket from the neighborhood counts"""
+        if stats.enabled:
+            stats.count('DensityMap rebuilds')
+        self.scores = [self._score(index) for index in range(self.geometry.cells)]
+        self.buckets = {}
+        for index, score in enumerate(self.scores):
+            self.buckets.setdefault(score, []).append(index)
+        self.top = max(self.buckets)
+
+    def sync(self, sizes):
+        """Brings the scores up to date with the Board
+
+        Args:
+            sizes (list of int): The size used for each remaining ship
+        """
+        sizes = sorted(sizes)
+        if sizes != self.sizes:
+            for size in set(sizes) - set(self.counts):
+                self.counts[size] = [neighborhood_count(self.geometry, self.fired, index, size)
+                                     for index in range(self.geometry.cells)]
+            self.sizes = sizes
+            self.weights = [(size, sizes.count(size)) for size in sorted(set(sizes))]
+            self._rebuild()
+        new_hits = self.board.hit_mask & ~self.hit_mask
+        while new_hits:
+            bit = new_hits & -new_hits
+            new_hits ^= bit
+            self._fire(bit.bit_length() - 1)
+
+    def _fire(self, index):
+        """Updates the counts and scores of the cells whose neighborhoods pass through a newly hit cell"""
+        self.hit_mask |= 1 << index
+        self.fired[index] = 1
+        self._move(index, 0)
+        if not self.counts:
+            return
+        reach = max(self.counts) - 1
+        rays = self.geometry.rays
+        cells = sum((rays[direction][index][:reach] for direction in directions), ())
+        if stats.enabled:
+            stats.count('DensityMap rescored cells', len(cells))
+        for size, counts in self.counts.items():
+            for cell in cells:
+                counts[cell] = neighborhood_count(self.geometry, self.fired, cell, size)
+        for cell in cells:
+            self._move(cell, self._score(cell))
+
+    def best(self):
+        """Returns the sorted indexes of the cells with the highest score"""
+        return self.buckets[self.top]
+
+
+def run_coverage(fired, size):
+    """Counts the unbroken runs of a specific size along each line of a grid that cover each cell
+
+    Args:
+        fired (numpy.ndarray): A 2-d 0/1 array with a line of cells in each row, set where a cell has been hit
+        size (int): The length of run
+
+    Returns:
+        An array the same shape as fired, giving the number of runs of size cells with no hit cell in them covering
+        each cell. Each line takes two running sums, one to find the open runs and one to count them.
+    """
+    lines, length = fired.shape
+    if size > length:
+        return numpy.zeros(fired.shape, dtype=numpy.int32)
+    totals = numpy.zeros((lines, length + 1), dtype=numpy.int32)
+    numpy.cumsum(fired, axis=1, out=totals[:, 1:])
+    open_runs = totals[:, size:] - totals[:, :-size] == 0
+    # the runs covering cell j are the ones starting from j - size + 1 to j, as far as the ends of the line allow
+    starts = numpy.zeros((lines, length - size + 2), dtype=numpy.int32)
+    numpy.cumsum(open_runs, axis=1, out=starts[:, 1:])
+    cells = numpy.arange(length)
+    return starts[:, numpy.minimum(cells, length - size) + 1] - starts[:, numpy.maximum(cells - size + 1, 0)]
+
+
+class PlacementDensity(object):
+    """Probability scores for one Board computed with NumPy from running sums along the rows and columns
+
+    A placement (see Geometry.placements) is blocked when any of its cells has been hit. The score of a cell is the
+    number of unblocked placements covering it for each remaining ship, which run_coverage() counts for a whole board at
+    a time. This counts the same thing as neighborhood_count() whenever neighborhoods can't step over a hit cell, which
+    is always the case for the size 2 the AI scores every ship as; for longer ships only unbroken runs are counted.
+
+    It has the same interface as DensityMap, so the ComputerPlayer can use either.
+
+    Attributes:
+        board (Board): The Board being scored
+        scores (list of int): The score of every cell, by index, as of the last sync()
+    """
+    def __init__(self, board):
+        """Inits PlacementDensity for the given Board; raises ImportError if NumPy isn't installed"""
+        if numpy is None:
+            raise ImportError("PlacementDensity needs NumPy")
+        self.board = board
+        self.geometry = board.geometry
+        self.scores = [0] * self.geometry.cells
+        self._best = list(range(self.geometry.cells))
+
+    def sync(self, sizes):
+        """Recomputes the scores from the Board
+
+        Args:
+            sizes (list of int): The size used for each remaining ship
+        """
+        rows, columns = self.geometry.rows, self.geometry.columns
+        fired = numpy.frombuffer(bytes(self.geometry.unpack(self.board.hit_mask)), dtype=numpy.uint8)
+        grid = fired.reshape(rows, columns).astype(numpy.int32)
+        scores = numpy.zeros((rows, columns), dtype=numpy.int32)
+        for size in set(sizes):
+            scores += sizes.count(size) * (run_coverage(grid, size) + run_coverage(grid.T, size).T)
+        scores = scores.ravel()
+        scores[fired == 1] = 0
+        self.scores = scores.tolist()
+        self._best = numpy.flatnonzero(scores == scores.max()).tolist()
+
+    def best(self):
+        """Returns the sorted indexes of the cells with the highest score"""
+        return self._best
+
+
+# Benchmark of the per-turn cost of scoring, from scratch and incrementally
+
+if __name__ == '__main__':
+    from random import Random
+    from timeit import default_timer
+
+    rng = Random(0)
+    engines = [DensityMap] + ([PlacementDensity] if numpy is not None else [])
+    scratch = 0.0
+    times = {engine: 0.0 for engine in engines}
+    turns = 0
+    for game in range(20):
+        board = Board()
+        maps = [engine(board) for engine in engines]
+        sizes = [2, 2, 2, 2, 2]
+        for shot in rng.sample(locations, 60):
+            board.fire(shot)
+            start = default_timer()
+            reference = density(board, sizes)
+            scratch += default_timer() - start
+            for scores in maps:
+                start = default_timer()
+                scores.sync(sizes)
+                times[type(scores)] += default_timer() - start
+                assert [reference[location] for location in locations] == scores.scores
+            turns += 1
+    print("density() from scratch:   {0:.3f} ms per turn".format(scratch / turns * 1000))
+    for engine in engines:
+        print("{0:24}  {1:.3f} ms per turn".format(engine.__name__ + ".sync():", times[engine] / turns * 1000))
+
+    # The per-turn cost on a large board, with the sizes changing as ships are sunk
+    board = Board(geometry(100, 100))
+    maps = [engine(board) for engine in engines]
+    times = {engine: 0.0 for engine in engines}
+    sizes = [2] * 20
+    shots = rng.sample(board.geometry.locations, 2000)
+    for turn, shot in enumerate(shots):
+        board.fire(shot)
+        if turn % 100 == 99:
+            sizes.pop()
+        for scores in maps:
+            start = default_timer()
+            scores.sync(sizes)
+            times[type(scores)] += default_timer() - start
+        assert len(set(tuple(scores.scores) for scores in maps)) == 1
+    for engine in engines:
+        print("{0:24}  {1:.3f} ms per turn on a 100x100 board".format(engine.__name__ + ".sync():",
+                                                                     times[engine] / len(shots) * 1000))
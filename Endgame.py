@@ -0,0 +1,411 @@
+"""Exact endgame solving for the AI
+
+Once only one or two of the opposing player's ships are left, every layout of them that agrees with what the AI has seen
+can be listed: no ship on a miss or on a sunk ship, every hit that hasn't sunk a ship covered by one, and no remaining
+ship lying entirely on hits (it would have been sunk). Taking each of those layouts to be equally likely, the expected
+number of shots left to sink them all can be worked out exactly for every cell the AI could fire on next, by following
+every way each shot could turn out: a miss, a hit, or a hit that sinks a ship, which the Board reveals with its cells.
+The EndgameSolver fires at the cells that leave the fewest shots expected.
+
+Listing the layouts is cheap enough to try on every turn of the endgame. The placements of each ship that miss every
+blocked cell are found with a few shifts of the bitmask of the open cells, and without any hits to cover their number
+alone usually shows there are more layouts than the solver takes; otherwise the listing covers the hits first and stops
+as soon as there are too many. A state is keyed by its layouts and its hits rather than by every cell fired on,
+since a miss on a cell no layout could use changes nothing, which lets states reached by different shots share an entry.
+
+The search is branch and bound. A state's remaining ships can't need fewer shots than they have cells that haven't been
+hit, the first of them no sooner than the first hit, so every shot has a lower bound on how well it can do; the shots
+are tried from the lowest bound up, each only worked out as far as it takes to show it's worse than the best found, and
+the rest are skipped once their bounds are. The exact search is still exponential in the number of layouts: up to eight
+take at most a few hundred states, at around 0.05 ms each, and fourteen up to a couple of thousand. In practice that's
+the last ship, once few enough places are left for it or it has been hit. A pair of ships almost always has dozens of
+layouts even with one of them hit, and thousands without, so the solver only takes two ships for the rare states where
+they're boxed in; it's left to the targeting modes the rest of the time.
+
+Each move is capped at a number of layouts and at a number of states visited, counting every visit, and if it reaches
+either cap the solver gives up on it and the ComputerPlayer plays its usual targeting modes instead. The cap on states
+is the hard cap on the time a move can take: 1000 states are about 50 ms at most on the machine it was tuned on. A
+move's search keeps its states to itself, so its answer only depends on the state it was asked about: the same in every
+process and on every machine, whatever was solved before, and the AI plays the same way every time for the same random
+state. The answers are kept in a table shared by every ComputerPlayer in the process, which only saves working them out
+again.
+
+A wall-clock budget can be set as well, which falls back to the targeting modes the same way once a move runs out of it;
+the answer then also depends on the speed of the machine. Game.py and Server.py give the shared solver
+interactive_budget, so a slow machine can't keep a player waiting, and have an --endgame-budget option to change it.
+Simulator.py leaves it off, so its games stay repeatable, and its --no-endgame option turns the solver off altogether
+for throughput: it plays about four times as many games a second without it, for about 0.7 more shots a game.
+"""
+
+import threading
+from timeit import default_timer
+
+from Gameboard import *
+
+
+infinity = float('inf')
+epsilon = 1e-9
+"""Comparisons of expected shots allow for epsilon of rounding, so moves that are equally good are all found"""
+
+
+class OutOfTime(Exception):
+    """Raised inside EndgameSolver when a move reaches its cap on states or its budget"""
+    pass
+
+
+runs = {}
+"""The cells every horizontal and every vertical placement starts on, for every (rows, columns, size) asked for"""
+
+
+def open_starts(geometry, size, blocked):
+    """Finds the cells the placements of a ship of a specific size that don't cover any blocked cell start on
+
+    The cells a horizontal placement can start on are the open ones whose next size - 1 cells to the east are open too,
+    which is the open cells shifted and anded size - 1 times, and the same down the columns for vertical ones. That's a
+    few operations on the whole bitmask rather than one for every placement on the board.
+
+    Args:
+        geometry (Geometry): The Geometry of the board
+        size (int): The size of ship
+        blocked (int): Bitmask of the cells no ship can be on
+
+    Returns:
+        A tuple of the bitmasks of the cells the horizontal and the vertical placements start on; a ship of size 1 only
+        has horizontal ones
+    """
+    key = (geometry.rows, geometry.columns, size)
+    if key not in runs:
+        across = down = 0
+        for cells, mask in geometry.placements(size):
+            if cells[-1] - cells[0] == size - 1 and (size > 1 or not across >> cells[0] & 1):
+                across |= 1 << cells[0]
+            else:
+                down |= 1 << cells[0]
+        runs[key] = (across, down)
+    across, down = runs[key]
+    open_cells = ~blocked & ((1 << geometry.cells) - 1)
+    for step in range(size):
+        across &= open_cells >> step
+        down &= open_cells >> step * geometry.columns
+    return across, down
+
+
+def open_placements(geometry, size, starts):
+    """Lists the placements of a ship of a specific size from the cells they start on
+
+    Args:
+        geometry (Geometry): The Geometry of the board
+        size (int): The size of ship
+        starts (tuple of int): The bitmasks of the cells the horizontal and the vertical placements start on, as given
+            by open_starts()
+
+    Returns:
+        A list of the bitmask of every placement, horizontal ones first, each in the order of Geometry.placements()
+    """
+    horizontal = (1 << size) - 1
+    vertical = sum(1 << step * geometry.columns for step in range(size))
+    masks = []
+    for cells, run in zip(starts, (horizontal, vertical)):
+        while cells:
+            bit = cells & -cells
+            cells ^= bit
+            masks.append(run * bit)
+    return masks
+
+
+class Search(object):
+    """The working state of one move's search, which nothing else shares
+
+    Attributes:
+        table (dict): Maps the key of every state solved on the move to (expected shots left, tuple of the best cells)
+        bounds (dict): Maps the key of every state found to be worse than a shot it was tried for to a lower bound on
+            its expected shots left
+        nodes (int): The number of states the move can still visit
+        deadline (float): The default_timer() reading the move has to finish by, or None for no limit
+    """
+    def __init__(self, nodes, deadline=None):
+        """Inits Search with nothing worked out"""
+        self.table = {}
+        self.bounds = {}
+        self.nodes = nodes
+        self.deadline = deadline
+
+
+class EndgameSolver(object):
+    """Exact expected-shots targeting for the last few ships, with a table of solved states
+
+    Moves can be asked for from different threads: each move's search keeps its own state, and the table and the
+    counters are only changed under a lock.
+
+    Attributes:
+        ships (int): The most ships the opposing player can have left for the solver to be used
+        layouts (int): The most layouts a state can have to be solved; beyond that the solver isn't tried
+        nodes (int): The most states a move can visit, counting every visit
+        budget (float): The most wall-clock seconds to spend on a move, or None for no limit, so moves only depend on
+            the state they're asked about
+        maxsize (int): The most states kept in table; once it's full, new states are no longer added
+        table (dict): Maps the key of every state a move was asked for to the tuple of its best cells, or None if the
+            solver gave up on it for reaching the cap on states; a state's key is (rows, columns, hits, tuple of its
+            layouts), since the cells no ship can be on only matter through the layouts they rule out
+        solved (int): The number of moves the solver answered
+        fallbacks (int): The number of moves it was tried on but gave up, for too many layouts or reaching a cap
+    """
+    def __init__(self, ships=2, layouts=8, nodes=1000, budget=None, maxsize=1 << 16):
+        """Inits EndgameSolver with an empty table"""
+        self.ships = ships
+        self.layouts = layouts
+        self.nodes = nodes
+        self.budget = budget
+        self.maxsize = maxsize
+        self.table = {}
+        self.solved = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+
+    def consistent(self, geometry, sizes, blocked, hits):
+        """Lists every layout of the remaining ships that agrees with what has been seen, if there are few enough
+
+        Ships are placed on the first hit nothing covers yet for as long as there is one, which only leaves a few
+        placements to try at each step, and then anywhere that's left. Ships of the same size are interchangeable, so
+        each set of their placements is listed once.
+
+        Args:
+            geometry (Geometry): The Geometry of the board
+            sizes (tuple of int): The sizes of the remaining ships, largest first
+            blocked (int): Bitmask of the cells no ship can be on: misses and sunk ships
+            hits (int): Bitmask of the hit cells that aren't part of a sunk ship
+
+        Returns:
+            A list of layouts, each a (bitmask of every ship, tuple of (size, bitmask) for every ship, largest first)
+            pair, or None if there are more than self.layouts
+        """
+        starts = dict((size, open_starts(geometry, size, blocked)) for size in set(sizes))
+        if not hits:
+            # given where the other ships really are, all but the few placements of a ship that would touch them agree
+            # too, so if that leaves too many there's no need to list them
+            for number, size in enumerate(sizes):
+                count = bin(starts[size][0]).count('1') + bin(starts[size][1]).count('1')
+                touching = sum(other * (2 * size if size > 1 else 1) for other in sizes[:number] + sizes[number + 1:])
+                if count - touching > self.layouts:
+                    return None
+        allowed = {}
+        for size in starts:
+            allowed[size] = [mask for mask in open_placements(geometry, size, starts[size]) if mask & ~hits]
+        through = {}
+        layouts = []
+
+        def place(rest, first, taken, layout):
+            needed = hits & ~taken
+            if not rest:
+                if not needed:
+                    layouts.append((taken, tuple(sorted(layout, reverse=True))))
+                return
+            if needed:
+                # some ship has to cover the first hit nothing covers yet, and only a few placements of each size do
+                low = needed & -needed
+                for size in sorted(set(rest), reverse=True):
+                    if (size, low) not in through:
+                        through[(size, low)] = [mask for mask in allowed[size] if mask & low]
+                    others = list(rest)
+                    others.remove(size)
+                    for mask in through[(size, low)]:
+                        if not mask & taken:
+                            layout.append((size, mask))
+                            place(tuple(others), 0, taken | mask, layout)
+                            layout.pop()
+                            if len(layouts) > self.layouts:
+                                return
+                return
+            size = rest[0]
+            for position in range(first, len(allowed[size])):
+                mask = allowed[size][position]
+                if not mask & taken:
+                    layout.append((size, mask))
+                    place(rest[1:], position + 1 if rest[1:2] == (size,) else 0, taken | mask, layout)
+                    layout.pop()
+                    if len(layouts) > self.layouts:
+                        return
+
+        place(sizes, 0, 0, [])
+        return layouts if len(layouts) <= self.layouts else None
+
+    def best(self, geometry, sizes, blocked, hits):
+        """Finds the cells to fire on that leave the fewest shots expected to sink the remaining ships
+
+        Args:
+            geometry (Geometry): The Geometry of the board
+            sizes (list of int): The sizes of the remaining ships
+            blocked (int): Bitmask of the cells no ship can be on: misses and sunk ships
+            hits (int): Bitmask of the hit cells that aren't part of a sunk ship
+
+        Returns:
+            The sorted tuple of the best cells, or None if there are too many ships or layouts left, no layout agrees
+            with what has been seen, or the move reached one of its caps
+        """
+        if not sizes or len(sizes) > self.ships:
+            return None
+        sizes = tuple(sorted(sizes, reverse=True))
+        layouts = self.consistent(geometry, sizes, blocked, hits)
+        best = None
+        if layouts:
+            key = self._key((geometry.rows, geometry.columns), hits, layouts)
+            if key in self.table:
+                best = self.table[key]
+            else:
+                search = Search(self.nodes, None if self.budget is None else default_timer() + self.budget)
+                try:
+                    best = self._solve(search, key, hits, sizes, layouts, infinity)[1]
+                except OutOfTime:
+                    pass
+                # running out of time depends on the machine, so only the other answers are kept
+                if best is not None or search.nodes < 0:
+                    with self._lock:
+                        if len(self.table) < self.maxsize:
+                            self.table[key] = best
+        with self._lock:
+            if best is None:
+                self.fallbacks += 1
+            else:
+                self.solved += 1
+        return best
+
+    def _solve(self, search, key, hits, sizes, layouts, cutoff):
+        """Works out the expected shots left and the best cells of a state, from its layouts
+
+        Only values up to cutoff are worked out exactly. Past that, the state only needs to be known to be worse, so
+        its value is given as a lower bound above cutoff, which is also kept for the next time the state comes up in
+        the search.
+
+        Returns:
+            A tuple of the expected number of shots left and the sorted tuple of the best cells, or of a lower bound
+            above cutoff and None; raises OutOfTime if either of the move's caps is reached first
+        """
+        search.nodes -= 1
+        if search.nodes < 0 or search.deadline is not None and default_timer() > search.deadline:
+            raise OutOfTime
+        entry = search.table.get(key)
+        if entry is not None:
+            return entry
+        bound = search.bounds.get(key)
+        if bound is not None and bound > cutoff:
+            return bound, None
+        if len(layouts) == 1:
+            # every cell of the ships that hasn't been hit has to be fired on, and the order doesn't matter
+            cells = layouts[0][0] & ~hits
+            return float(bin(cells).count('1')), tuple(cell for cell in range(cells.bit_length()) if cells >> cell & 1)
+        shape = key[:2]
+        total = float(len(layouts))
+        moves = []
+        for bit in self._counts(hits, layouts):
+            outcomes = []
+            misses = []
+            wounds = []
+            sinks = {}
+            for union, layout in layouts:
+                if not union & bit:
+                    misses.append((union, layout))
+                    continue
+                for size, mask in layout:
+                    if mask & bit:
+                        break
+                if mask & ~hits & ~bit:
+                    wounds.append((union, layout))
+                else:
+                    sinks.setdefault((size, mask), []).append((union & ~mask, layout))
+            if misses:
+                outcomes.append((hits, sizes, misses))
+            if wounds:
+                outcomes.append((hits | bit, sizes, wounds))
+            for (size, mask), sunk in sorted(sinks.items()):
+                if len(sizes) > 1:
+                    rest = list(sizes)
+                    rest.remove(size)
+                    outcomes.append((hits & ~mask, tuple(rest),
+                                     [(union, tuple(ship for ship in layout if ship != (size, mask)))
+                                      for union, layout in sunk]))
+            outcomes = [(len(child) / total, self._bound(search, child_key, child_hits, child_sizes, child), child_key,
+                         child_hits, child_sizes, child)
+                        for child_key, child_hits, child_sizes, child in
+                        ((self._key(shape, child_hits, child), child_hits, child_sizes, child)
+                         for child_hits, child_sizes, child in outcomes)]
+            moves.append((1 + sum(outcome[0] * outcome[1] for outcome in outcomes), bit, outcomes))
+        moves.sort(key=lambda move: move[:2])
+        best_value = infinity
+        best_cells = []
+        lowest = infinity
+        for lower, bit, outcomes in moves:
+            limit = min(best_value, cutoff)
+            if lower > limit + epsilon:
+                lowest = min(lowest, lower)
+                break
+            value = lower
+            for weight, child_lower, child_key, child_hits, child_sizes, child in outcomes:
+                # the most this outcome can take without the move doing worse than limit
+                child_cutoff = (limit + epsilon - value) / weight + child_lower
+                value += weight * (self._solve(search, child_key, child_hits, child_sizes, child, child_cutoff)[0] -
+                                   child_lower)
+                if value > limit + epsilon:
+                    break
+            if value > limit + epsilon:
+                lowest = min(lowest, value)
+            elif value < best_value - epsilon:
+                best_value = value
+                best_cells = [bit]
+            else:
+                best_cells.append(bit)
+        if best_value > cutoff + epsilon:
+            bound = max(lowest, cutoff + epsilon)
+            search.bounds[key] = bound
+            return bound, None
+        entry = (best_value, tuple(sorted(bit.bit_length() - 1 for bit in best_cells)))
+        search.table[key] = entry
+        return entry
+
+    @staticmethod
+    def _key(shape, hits, layouts):
+        """Returns the key of a state in the tables"""
+        return shape + (hits, tuple(layout for union, layout in layouts))
+
+    @staticmethod
+    def _counts(hits, layouts):
+        """Counts how many layouts have a ship on every cell that hasn't been fired on, by the cell's bit"""
+        counts = {}
+        for union, layout in layouts:
+            union &= ~hits
+            while union:
+                bit = union & -union
+                union ^= bit
+                counts[bit] = counts.get(bit, 0) + 1
+        return counts
+
+    def _bound(self, search, key, hits, sizes, layouts):
+        """Returns a lower bound on the expected shots left in a state, cheap enough to work out for every move
+
+        A state that has been solved already gives its value, and one found to be worse than a move gives the bound
+        that was kept. Otherwise, every cell of the remaining ships that hasn't been hit has to be fired on, the first
+        of them no sooner than the first hit. However the shots are ordered, the first k of them can only hit in as
+        many layouts as the k cells with ships in the most layouts have between them, which bounds how soon the first
+        hit can be expected.
+        """
+        left = sum(sizes) - bin(hits).count('1')
+        if not left:
+            return 0.0
+        entry = search.table.get(key)
+        if entry is not None:
+            return entry[0]
+        total = float(len(layouts))
+        expected = 0.0
+        covered = 0
+        for count in sorted(self._counts(hits, layouts).values(), reverse=True):
+            expected += 1 - covered / total
+            covered += count
+            if covered >= total:
+                break
+        return max(expected + left - 1, search.bounds.get(key, 0.0))
+
+
+endgame_solver = EndgameSolver()
+"""The EndgameSolver shared by every ComputerPlayer in the process; setting ships to 0 turns it off"""
+
+interactive_budget = 0.05
+"""The wall-clock seconds per move Game.py and Server.py give endgame_solver by default"""
@@ -1,73 +1,115 @@
 """Game Running code
 
-This module contains the main loop that runs the game, handling the turn taking system and choosing to play against
-a computer or another human. The clear() method prints 100 blank lines, used to clear the screen.
+This module is the terminal front end of the game: HumanPlayers (see Player.py) ask for their moves and show the
+results, while a GameSession (see Session.py) keeps the rules, the turn order and the winner. You can play against a
+computer or another human. The clear() method clears the screen between players, so neither sees the other's board;
+against the computer the boards just stay on the screen, and only the rows that change are redrawn.
+
+Every game is recorded in record_file when it ends (see Records.py), with the seed the computer played with, so it can
+be replayed exactly. The file is opened once the arguments have been read; one written in an older version of the
+record format is moved aside to make way for a new one.
+
+The computer solves the endgame exactly when it can (see Endgame.py), for at most --endgame-budget seconds a move.
+
+The answers can come from a script instead of the keyboard (see Inputs.py): a file with one answer per line, or - for a
+pipe. Every "Press Enter" is skipped, and --quiet shows nothing at all, so a script plays a whole game, human moves and
+all, as fast as the code can go:
+
+    python Game.py moves.txt --quiet
 """
 
+import sys
+from argparse import ArgumentParser
+
 from Player import *
+from Records import *
+from Session import *
+
+
+record_file = "games.rec"
+
+
+def remaining_ships(player):
+    """Returns the names of the ships a Player has left, as a string"""
+    return ", ".join([ship[1] for ship in player.board.ships])
+
 
+parser = ArgumentParser(description="Play Battleship.")
+parser.add_argument("script", nargs="?", default=None,
+                    help="file of answers to play from instead of the keyboard, one per line, or - to read them from "
+                         "standard input")
+parser.add_argument("--quiet", action="store_true", help="show nothing while playing from a script")
+parser.add_argument("--endgame-budget", type=float, default=interactive_budget,
+                    help="most seconds the computer spends solving an endgame move before it plays its usual targeting "
+                         "(default %(default)g)")
+args = parser.parse_args()
+if args.quiet and args.script is None:
+    parser.error("--quiet needs a script")
+endgame_solver.budget = args.endgame_budget
+source = keyboard if args.script is None else script(args.script, None if args.quiet else sys.stdout)
+renderer = Renderer(mode='off') if args.quiet else screen
+try:
+    records, moved = open_records(record_file)
+except ValueError as error:
+    sys.exit("Can't record games: {0}. Move it out of the way to play.".format(error))
+if moved is not None:
+    source.say("{0} was in an older record format, so it has been moved to {1}.".format(record_file, moved))
 
 human = ["human", "person", "yes", "0"]
 computer = ["computer", "ai", "cpu", "bot", "no", "1"]
 yes = ["y", "yes", "1"]
 no = ["n", "no", "0"]
-player1 = HumanPlayer()
-while True:
-    start = handle(["Welcome to Battleship! Do you want to play against a human or a computer?"],
-                   "Please choose human or computer.",
-                   precondition=lambda x: True if x.lower() in human or x.lower() in computer else False)[1][0].lower()
-    winner = None
-    if start in human:
-        player2 = HumanPlayer()
-        player1.set_opponent(player2)
-        clear()
-        raw_input("It is Player 1's turn to place ships. Press Enter to continue.")
-        player1.setup()
-        clear()
-        raw_input("It is Player 2's turn to place ships. Press Enter to continue")
-        player2.setup()
-        while True:
-            clear()
-            raw_input("It is Player 1's turn. Press Enter to continue")
-            player1.take_turn()
-            if not player2.board.ships:
-                winner = "Player 1"
-                break
-            raw_input("Enemy Remaining Ships: " + ", ".join([ship[1] for ship in player2.board.ships]))
-            clear()
-            raw_input("It is Player 2's turn. Press Enter to continue")
-            player2.take_turn()
-            raw_input("Enemy Remaining Ships: " + ", ".join([ship[1] for ship in player1.board.ships]))
-            if not player1.board.ships:
-                winner = "Player 2"
-                break
-    else:
-        clear()
-        player2 = ComputerPlayer()
-        player1.set_opponent(player2)
-        player2.setup()
-        raw_input("It is your turn to place ships. Press Enter to continue")
-        player1.setup()
-        while True:
-            clear()
-            raw_input("It is your turn. Press Enter to continue")
-            player1.take_turn()
-            if not player2.board.ships:
-                winner = "You"
-                break
-            raw_input("Enemy Remaining Ships: " + ", ".join([ship[1] for ship in player2.board.ships]))
-            player2.take_turn()
-            if not player1.board.ships:
-                winner = "The computer"
-                break
-    if winner == 'You':
-        print "You win!"
-    else:
-        print(winner + " wins!")
-    again = handle(["Do you want to play again?"], "Say yes or no.",
-                   precondition=lambda x: True if x.lower() in yes else False)[1][0].lower()
-    if again:
-        player1 = HumanPlayer()
-    else:
-        break
-    
+player1 = HumanPlayer(renderer=renderer, source=source)
+try:
+    while True:
+        start = handle(["Welcome to Battleship! Do you want to play against a human or a computer?"],
+                       "Please choose human or computer.",
+                       precondition=lambda x: True if x.lower() in human or x.lower() in computer else False,
+                       source=source)[1][0].lower()
+        if start in human:
+            session = GameSession(player1, HumanPlayer(renderer=renderer, source=source))
+            names = ["Player 1", "Player 2"]
+            for player in range(2):
+                renderer.clear()
+                source.pause("It is {0}'s turn to place ships. Press Enter to continue".format(names[player]))
+                session.players[player].setup(session)
+            while session.phase != 'finished':
+                player = session.turn
+                renderer.clear()
+                source.pause("It is {0}'s turn. Press Enter to continue".format(names[player]))
+                session.players[player].take_turn(session)
+                if session.phase != 'finished':
+                    source.pause("Enemy Remaining Ships: " + remaining_ships(session.players[1 - player]))
+        else:
+            renderer.clear()
+            seed = randrange(2 ** 32)
+            session = GameSession(player1, ComputerPlayer(rng=Random(seed)), seed)
+            names = ["You", "The computer"]
+            source.pause("It is your turn to place ships. Press Enter to continue")
+            player1.setup(session)
+            while session.phase != 'finished':
+                if session.ai_turn:
+                    session.ai_move()
+                    continue
+                source.pause("It is your turn. Press Enter to continue")
+                player1.take_turn(session)
+                if session.phase != 'finished':
+                    source.pause("Enemy Remaining Ships: " + remaining_ships(session.players[1]))
+        records.write(session.record())
+        records.flush()
+        winner = names[session.winner]
+        if winner == 'You':
+            source.say("You win!")
+        else:
+            source.say(winner + " wins!")
+        again = handle(["Do you want to play again?"], "Say yes or no.",
+                       precondition=lambda x: True if x.lower() in yes or x.lower() in no else False,
+                       source=source)[1][0].lower()
+        if again in yes:
+            player1 = HumanPlayer(renderer=renderer, source=source)
+        else:
+            break
+except EOFError:
+    # a script has run out of answers
+    source.say("Out of input.")
+records.close()
@@ -4,19 +4,45 @@
 This file contains all of the battleship game mechanics code
 It includes the board objects, node objects, and a helper method to determine the adjacent node in a given direction
 
-A good possibility for refactoring is to add a Ship class; I have a couple inconsistent ways of representing them
-throughout my code, and it would be an improvement to streamline that.
+The Board keeps its state in two integer bitmasks, one for the cells that contain a ship and one for the cells that have
+been fired upon, with one bit per cell. The nodes attribute is a lightweight view over those bitmasks, so code written
+against the original dictionary of Node objects still works.
+
+Ships are Ship records, which are still the ([list of locations of ship], "string name of ship") tuples the rest of the
+code has always used, but also count how many of their cells are still afloat. Together with the Board's index of which
+ship is on each cell, that lets fire() report a hit, a miss or a sunk ship straight away.
+
+A Board can have any number of rows and columns (see Geometry.py); the standard a-j and 1-10 board is the default.
+
+Lookahead doesn't need to copy a Board. snapshot() captures its whole state as a BoardSnapshot of a few integers, which
+restore() puts back; make() fires on a cell and removes the ship it sinks, and unmake() takes the last of those back,
+ship and all; and clone() makes another Board that shares everything with this one until either of them changes it.
+Misses only change the hit bitmask, which is an integer, so a clone only copies its ships the first time it hits one.
 
 """
 
+from collections import namedtuple
+
+from Geometry import *
+from Stats import *
+
 
-class Node:
+SHIP_GLYPH = u'☐'.encode('utf-8')
+HIT_GLYPH = u'☒'.encode('utf-8')
+MISS_GLYPH = u'○'.encode('utf-8')
+WATER_GLYPH = u' 🞄 '.encode('utf-8')
+"""The strings used to draw each kind of Node, shared by the Node objects and the Board's own drawing code."""
+
+
+class Node(object):
     """Gameboard Node object
     
     Attributes:
         is_ship (bool): Whether the node contains a part of a ship
         is_hit (bool): Whether the node has been fired upon
     """
+    __slots__ = ('is_ship', 'is_hit')
+
     def __init__(self, ship=False, hit=False):
         """Inits Node with default False for both is_ship and is_hit"""
         self.is_ship = ship
@@ -40,14 +66,14 @@ class Node:
         """Very dependent on certain Unicode character widths, which can be different in different environments"""
         if self.is_ship:
             if self.is_hit:
-                return u'☒'.encode('utf-8')
+                return HIT_GLYPH
             else:
-                return u'☐'.encode('utf-8')
+                return SHIP_GLYPH
         else:
             if self.is_hit:
-                return u'○'.encode('utf-8')
+                return MISS_GLYPH
             else:
-                return u' 🞄 '.encode('utf-8')
+                return WATER_GLYPH
 
     def hide(self):
         """Node hiding function
@@ -55,12 +81,86 @@ class Node:
         Used to hide unrevealed Nodes for the opposing player.
         
         Returns:
-            self if self.is_hit, else a blank Node()
+            self if self.is_hit, else the shared blank hidden_node
         """
         if self.is_hit:
             return self
         else:
-            return Node()
+            return hidden_node
+
+
+class HiddenNode(Node):
+    """A blank Node that can't be changed
+
+    Every Node that hasn't been revealed hides as the same HiddenNode, hidden_node, instead of a new blank Node each
+    time. Since it's shared it's read-only, so it can't be fired upon.
+    """
+    def __init__(self):
+        pass
+
+    @property
+    def is_ship(self):
+        return False
+
+    @property
+    def is_hit(self):
+        return False
+
+
+hidden_node = HiddenNode()
+"""The HiddenNode that every unrevealed Node hides as"""
+
+
+class Ship(namedtuple('Ship', ['locations', 'name'])):
+    """A ship on a Board
+
+    A Ship is a 2-tuple of ([list of locations of ship], "string name of ship"), so it can be used anywhere a ship
+    always could, with some extra attributes.
+
+    Attributes:
+        cells (tuple of int): The cells of the ship, in the same order as its locations
+        mask (int): The bitmask of the ship's cells
+        remaining (int): The number of the ship's cells that haven't been hit
+        number (int): The ship's index in the placed ships of its Board, or None until it's placed on one
+    """
+    def __new__(cls, cells, name, geometry=None):
+        """Creates a Ship with the given cells and name, on a board with the given Geometry (the standard one if None)"""
+        geometry = geometry or standard
+        ship = super(Ship, cls).__new__(cls, [geometry.locations[cell] for cell in cells], name)
+        ship.cells = tuple(cells)
+        ship.mask = sum(1 << cell for cell in cells)
+        ship.remaining = len(cells)
+        ship.number = None
+        return ship
+
+    @property
+    def size(self):
+        """The number of cells in the ship"""
+        return len(self.cells)
+
+    def copy(self):
+        """Returns a copy of the Ship with its own count of the cells that haven't been hit; the rest is shared"""
+        ship = tuple.__new__(Ship, self)
+        ship.cells = self.cells
+        ship.mask = self.mask
+        ship.remaining = self.remaining
+        ship.number = self.number
+        return ship
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+
+Shot = namedtuple('Shot', ['cell', 'result', 'ship'])
+"""The result of firing on a Board: the cell fired upon, 'miss', 'hit' or 'sunk', and the Ship hit (None for a miss)"""
+
+BoardSnapshot = namedtuple('BoardSnapshot', ['ship_mask', 'hit_mask', 'placed', 'afloat', 'sunk'])
+"""The state of a Board, which Board.restore() can put back: its two bitmasks, the number of ships placed on it, a
+bitmask of the numbers of the ships still in its ships, and the numbers of the ships in its sunk. It only holds
+integers, so it never changes and is cheap to keep; the remaining count of every ship follows from the hit bitmask."""
 
 
 class ShipError(Exception):
@@ -84,72 +184,188 @@ ltn = {'a': 1,
        'j': 10}
 
 ntl = ' abcdefghij'
-""" Helper objects for translating numbers to letters and back, used specifcally in the adjacent function below"""
+""" Helper objects for translating numbers to letters and back on the standard board"""
 
 
-def adjacent(location, direction):
+standard = geometry(10, 10)
+locations = standard.locations
+cell_index = standard.index
+"""The Geometry of the standard board, and its helper objects for translating location strings to cells and back"""
+
+
+def adjacent(location, direction, geometry=None):
     """Adjacent Node function
     
     Args:
         location (str): The given location, as a string
         direction (str): The given direction, as a string of a single lowercase character as a cardinal direction
+        geometry (Geometry): The Geometry of the board; the standard board if None
     
     Returns:
-        A string representing the location adjacent to the given location in the given direction.
+        A string representing the location adjacent to the given location in the given direction; raises NodeError if
+        that would be off the board, or KeyError if the given location isn't on the board.
     """
-    longi = int(location[1:])
-    lati = ltn[location[0]]
-    if direction == 'n':
-        lati = lati - 1
-        if lati < 1:
-            raise NodeError
-    elif direction == 's':
-        lati = lati + 1
-        if lati > 10:
-            raise NodeError
-    elif direction == 'e':
-        longi = longi + 1
-        if longi > 10:
-            raise NodeError
-    else:
-        longi = longi - 1
-        if longi < 1:
-            raise NodeError
-    return ntl[lati] + str(longi)
+    if stats.enabled:
+        stats.count('adjacent')
+    geometry = geometry or standard
+    cell = geometry.neighbors[direction if direction in 'nse' else 'w'][geometry.index[location]]
+    if cell is None:
+        raise NodeError
+    return geometry.locations[cell]
+
+
+class BoardNode(Node):
+    """A Node that reads and writes its state straight from the bits of a Board
+
+    These are created on demand by Board.nodes, and only hold a reference to the Board and their cell, so creating one
+    is cheap and any number of them can exist for the same cell. Hitting one goes through the Board, so its ships keep
+    count of their hits.
+
+    Attributes:
+        board (Board): The Board that the Node belongs to
+        cell (int): The Node's cell
+        bit (int): The bit for the Node's cell in the Board's bitmasks
+    """
+    __slots__ = ('board', 'cell', 'bit')
+
+    def __init__(self, board, cell):
+        """Inits BoardNode for the given cell of the given Board"""
+        self.board = board
+        self.cell = cell
+        self.bit = 1 << cell
+
+    @property
+    def is_ship(self):
+        return bool(self.board.ship_mask & self.bit)
+
+    @is_ship.setter
+    def is_ship(self, value):
+        if value:
+            self.board.ship_mask |= self.bit
+        else:
+            self.board.ship_mask &= ~self.bit
+
+    @property
+    def is_hit(self):
+        return bool(self.board.hit_mask & self.bit)
+
+    @is_hit.setter
+    def is_hit(self, value):
+        if value and not self.is_hit:
+            self.board.fire_cell(self.cell)
+        elif not value and self.is_hit:
+            self.board.unfire_cell(self.cell)
+
+
+class NodeMap(object):
+    """Dictionary-like view of a Board's cells, mapping location strings to BoardNodes
+
+    Supports the read-only parts of the dictionary interface that the rest of the game uses: indexing, membership,
+    iteration, keys(), values() and items(). Locations are always listed row by row, from a1 to j10 on the standard
+    board.
+    """
+    __slots__ = ('board',)
+
+    def __init__(self, board):
+        self.board = board
+
+    def __getitem__(self, location):
+        return BoardNode(self.board, self.board.geometry.index[location])
+
+    def __contains__(self, location):
+        return location in self.board.geometry.index
+
+    def __iter__(self):
+        return iter(self.board.geometry.locations)
+
+    def __len__(self):
+        return self.board.geometry.cells
+
+    def keys(self):
+        return list(self.board.geometry.locations)
+
+    def values(self):
+        return [BoardNode(self.board, index) for index in range(self.board.geometry.cells)]
+
+    def items(self):
+        return [(location, BoardNode(self.board, index))
+                for index, location in enumerate(self.board.geometry.locations)]
 
-class Board:
+
+class Board(object):
     """Game Board object
     
     Attributes:
-        nodes (dict): A dictionary containing every location on the board as keys which correspond to a Node value
-        ships (list): A list of the ships contained on the board, represented
-            as a 2-tuple ([list of locations of ship], "string name of ship")
+        geometry (Geometry): The Geometry of the board, which gives its size and its location strings
+        ship_mask (int): A bitmask with the bit of every cell that contains part of a ship set
+        hit_mask (int): A bitmask with the bit of every cell that has been fired upon set
+        nodes (NodeMap): A dictionary-like view containing every location on the board as keys which correspond to a
+            Node value
+        ships (list): A list of the ships contained on the board, represented as Ships, which are
+            2-tuples ([list of locations of ship], "string name of ship")
+        ship_at (list): The Ship on every cell, or None
+        sunk (list): The Ships that have been sunk but not yet removed from ships by sink_ships()
+        placed (list): Every Ship placed on the Board, in the order they were placed, sunk or not
+        history (list): (cell, number of the Ship removed or None) for every shot make() can take back
+        shared (bool): Whether the ships and their lists may be shared with a clone, and must be copied before changing
     """
-    def __init__(self):
-        """Inits Board with blank Nodes for the standard a-j and 1-10 battleship gameboard and no ships on the board."""
-        nodes = []
-        for letter in "abcdefghij":
-            for number in range(10):
-                nodes.append(letter + str(number + 1))
-        for index, item in enumerate(nodes):
-            nodes[index] = (item, Node())
-        self.nodes = dict(nodes)
+    def __init__(self, geometry=None):
+        """Inits Board with blank Nodes and no ships on the board.
+
+        Args:
+            geometry (Geometry): The Geometry of the board; the standard a-j and 1-10 battleship gameboard if None
+        """
+        self.geometry = geometry or standard
+        self.ship_mask = 0
+        self.hit_mask = 0
+        self.nodes = NodeMap(self)
         self.ships = []
+        self.ship_at = [None] * self.geometry.cells
+        self.sunk = []
+        self.placed = []
+        self.history = []
+        self.shared = False
 
-    def __str__(self):
-        """Used to display the gameboard
+    def glyph(self, index):
+        """Returns the string used to draw the cell with the given index"""
+        bit = 1 << index
+        if self.ship_mask & bit:
+            return HIT_GLYPH if self.hit_mask & bit else SHIP_GLYPH
+        return MISS_GLYPH if self.hit_mask & bit else WATER_GLYPH
+
+    def hidden_glyph(self, index):
+        """Returns the string used to draw the cell with the given index for the opposing player"""
+        if self.hit_mask & 1 << index:
+            return self.glyph(index)
+        return WATER_GLYPH
+
+    def heading(self):
+        """Returns the line of column numbers drawn above the Board
         
         Ridiculously sensitive to Unicode character widths; there's actually two different kinds of spaces used
-        in that initial boardstring to make everything line up. One is extremely narrow.
+        in the column headings to make everything line up. One is extremely narrow. Single digit headings get a narrow
+        space on each side, longer ones only before them.
         """
-        boardstring = u'   1   2   3   4   5   6   7   8   9   10'.encode('utf-8')
-        for letter in "abcdefghij":
-            line = "\n" + letter
-            for i in range(10):
-                line += " " + str(self.nodes[letter + str(i + 1)])
-            boardstring += line
+        return (u' ' * self.geometry.label_width + u''.join(
+            u' \u200a' + unicode(number) + (u'\u200a' if number < 10 else u'')
+            for number in range(1, self.geometry.columns + 1))).encode('utf-8')
+
+    def row_label(self, row):
+        """Returns the label drawn at the start of a row, padded to the width of the longest one"""
+        return self.geometry.row_labels[row].ljust(self.geometry.label_width)
+
+    def _draw(self, glyph):
+        """Draws the Board, getting the string for each cell from the given function"""
+        columns = self.geometry.columns
+        boardstring = self.heading()
+        for row in range(self.geometry.rows):
+            boardstring += "\n" + self.row_label(row) + "".join(" " + glyph(row * columns + i) for i in range(columns))
         return boardstring
 
+    def __str__(self):
+        """Used to display the gameboard"""
+        return self._draw(self.glyph)
+
     def neighborhoods(self, location, size):
         """Collects all of the valid neighborhoods of a specific size around a given location.
         
@@ -160,6 +376,10 @@ class Board:
         the player, too, in the future. It's important for the AI to determine the most likely location on the board to
         have a ship.
         
+        Walking out from the location in each direction, every cell within size - 1 steps that is on the board and has
+        not been hit is collected; hit cells are stepped over rather than ending the walk, which is how the AI has
+        always counted. The neighborhoods are then the runs of size consecutive collected cells in each line.
+
         Args:
             location (str): The location to collect neighborhoods of
             size (int): The size of neighborhoods to collect
@@ -167,22 +387,15 @@ class Board:
         Returns:
             A list containing all of the valid neighborhoods of the given location at the given size
         """
-        neighbors = {'n': [], 'e': [], 's': [], 'w': []}
-        for direction in ['n', 'e', 's', 'w']:
-            for i in range(size):
-                candidate = location
-                skip = False
-                for j in range(i):
-                    skip = False
-                    try:
-                        candidate = adjacent(candidate, direction)
-                        assert not self.nodes[candidate].is_hit
-                    except (NodeError, AssertionError):
-                        skip = True
-                if not skip:
-                    neighbors[direction].append(candidate)
-        vert = neighbors['n'][:0:-1] + neighbors['s']
-        hori = neighbors['w'][:0:-1] + neighbors['e']
+        if stats.enabled:
+            stats.count('Board.neighborhoods')
+        cell = self.geometry.index[location]
+        hit_mask = self.hit_mask
+        rays = self.geometry.rays
+        north, south, west, east = ([self.geometry.locations[other] for other in rays[direction][cell][:size - 1]
+                                     if not hit_mask >> other & 1] for direction in 'nswe')
+        vert = north[::-1] + [location] + south
+        hori = west[::-1] + [location] + east
         lists = []
         for i in range(len(vert) - size + 1):
             lists.append(vert[i:i + size])
@@ -200,82 +413,229 @@ class Board:
             location (str): String representing location of one end of the ship being placed
             direction (str): String representing direction of ship to place
             name (str): Name of ship being placed
+
+        Returns:
+            The Ship placed
         """
         # These directions should probably be outside of this method; used to handle various ways of writing directions
         east = ["E", "EAST", "RIGHT", "R"]
         west = ["W", "WEST", "LEFT", "L"]
         north = ["N", "NORTH", "UP", "U"]
         south = ["S", "SOUTH", "DOWN", "D"]
-        ship = []
-        location = location.lower()
         try:
-            # This is very messy, an extremely good target for refactoring using the adjacent function
-            #       (the adjacent function was written after this code)
-            # The basic idea is that we iterate location by location, along the direction given at the place given
-            # Testing whether each location is a valid place to put a ship
-            # If we ever run into an exception, then the ship placement is invalid, so we raise ShipError
-            # If we don't, then we iterate through again, placing the ship this time.
-            if direction.upper() in east:
-                assert (self.nodes[location[0] + str(int(location[1:]) + size - 1)])
-                for i in range(int(location[1:]), int(location[1:]) + size):
-                    assert (self.nodes[location[0] + str(i)].is_ship is False)
-                for i in range(int(location[1:]), int(location[1:]) + size):
-                    self.nodes[location[0] + str(i)].is_ship = True
-                    ship.append(location[0] + str(i))
-            elif direction.upper() in west:
-                assert (self.nodes[location[0] + str(int(location[1:]) - size + 1)])
-                for i in range(int(location[1:]) - size + 1, int(location[1:]) + 1):
-                    assert (self.nodes[location[0] + str(i)].is_ship is False)
-                for i in range(int(location[1:]) - size + 1, int(location[1:]) + 1):
-                    self.nodes[location[0] + str(i)].is_ship = True
-                    ship.append(location[0] + str(i))
-            elif direction.upper() in north:
-                length = ntl[ltn[location[0]] - size + 1]
-                assert (ltn[location[0]] - size + 1 > 0)
-                assert (self.nodes[length + location[1:]])
-                for i in range(size):
-                    assert (self.nodes[ntl[ltn[location[0]] - i] + location[1:]].is_ship is False)
-                for i in range(size):
-                    self.nodes[ntl[ltn[location[0]] - i] + location[1:]].is_ship = True
-                    ship.append(ntl[ltn[location[0]] - i] + location[1:])
-            elif direction.upper() in south:
-                length = ntl[ltn[location[0]] + size - 1]
-                assert (ltn[location[0]] + size - 1 < 11)
-                assert (self.nodes[length + location[1:]])
-                for i in range(size):
-                    assert (self.nodes[ntl[ltn[location[0]] + i] + location[1:]].is_ship is False)
-                for i in range(size):
-                    self.nodes[ntl[ltn[location[0]] + i] + location[1:]].is_ship = True
-                    ship.append(ntl[ltn[location[0]] + i] + location[1:])
-            else:
-                assert False
-            self.ships.append((ship, name))
-        except (AssertionError, KeyError, IndexError):
-            # We raise a KeyError going off the board in one direction, and an IndexError the other, due to the ntl and
-            # ltn objects being a string and a dictionary.
-            # The AssertionError arrises from a location that already contains a ship.
+            cell = self.geometry.index[location.lower()]
+        except (KeyError, AttributeError):
+            raise ShipError
+        if direction.upper() in east:
+            cells = self.geometry.ship_cells(size, cell, 'e')
+        elif direction.upper() in west:
+            cells = self.geometry.ship_cells(size, cell, 'w')
+        elif direction.upper() in north:
+            cells = self.geometry.ship_cells(size, cell, 'n')
+        elif direction.upper() in south:
+            cells = self.geometry.ship_cells(size, cell, 's')
+        else:
+            cells = None
+        if not cells:
+            raise ShipError
+        return self.add_ship(cells, name)
+
+    def add_ship(self, cells, name):
+        """Places a ship on the given cells of the Board
+
+        If the ship would overlap another ship, raises ShipError
+
+        Args:
+            cells (tuple of int): The cells of the ship being placed
+            name (str): Name of ship being placed
+
+        Returns:
+            The Ship placed
+        """
+        ship = Ship(cells, name, self.geometry)
+        if self.ship_mask & ship.mask:
             raise ShipError
+        if self.shared:
+            self._own()
+        ship.number = len(self.placed)
+        self.placed.append(ship)
+        self.ship_mask |= ship.mask
+        for cell in cells:
+            self.ship_at[cell] = ship
+        ship.remaining -= bin(self.hit_mask & ship.mask).count('1')
+        self.ships.append(ship)
+        if not ship.remaining:
+            self.sunk.append(ship)
+        return ship
 
     def fire(self, node):
-        self.nodes[node].hit()
+        """Fires on the given location
+
+        Args:
+            node (str): The location to fire on
+
+        Returns:
+            A Shot with the result; raises NodeError if the location has already been fired upon, or KeyError if it
+            isn't on the board
+        """
+        return self.fire_cell(self.geometry.index[node])
+
+    def fire_cell(self, cell):
+        """Fires on the given cell
+
+        Args:
+            cell (int): The cell to fire on
+
+        Returns:
+            A Shot with the result; raises NodeError if the cell has already been fired upon
+        """
+        bit = 1 << cell
+        if self.hit_mask & bit:
+            raise NodeError
+        self.hit_mask |= bit
+        ship = self.ship_at[cell]
+        if ship is None:
+            return Shot(cell, 'miss', None)
+        if self.shared:
+            self._own()
+            ship = self.ship_at[cell]
+        ship.remaining -= 1
+        if ship.remaining:
+            return Shot(cell, 'hit', ship)
+        self.sunk.append(ship)
+        return Shot(cell, 'sunk', ship)
+
+    def unfire_cell(self, cell):
+        """Takes back a shot on the given cell, marking it as not fired upon
+
+        A ship that the shot sank is still afloat again afterwards, unless sink_ships() has already removed it.
+        """
+        bit = 1 << cell
+        if not self.hit_mask & bit:
+            return
+        self.hit_mask &= ~bit
+        if self.shared and self.ship_at[cell] is not None:
+            self._own()
+        ship = self.ship_at[cell]
+        if ship is not None:
+            if not ship.remaining and ship in self.sunk:
+                self.sunk.remove(ship)
+            ship.remaining += 1
 
     def sink_ships(self):
-        """Removes and returns a ship from the Board if every part has been sunk"""
-        for ship in self.ships:
-            if filter(lambda node: self.nodes[node].is_hit, ship[0]) == ship[0]:
-                self.ships.remove(ship)
-                return ship
+        """Removes and returns a ship from the Board if every part has been sunk
+
+        Only the ships that fire() has seen sink are checked, so this doesn't depend on the size of the fleet. If more
+        than one is waiting, the first in self.ships is returned.
+        """
+        if self.sunk:
+            if self.shared:
+                self._own()
+            ship = min(self.sunk, key=self.ships.index) if len(self.sunk) > 1 else self.sunk[0]
+            self.sunk.remove(ship)
+            self.ships.remove(ship)
+            return ship
         return None
 
+    def make(self, cell):
+        """Fires on the given cell and removes the ship that sinks, if any, so that unmake() can take both back
+
+        Args:
+            cell (int): The cell to fire on
+
+        Returns:
+            A tuple of the Shot and the Ship that sink_ships() removed, or None; raises NodeError if the cell has
+            already been fired upon
+        """
+        shot = self.fire_cell(cell)
+        ship = self.sink_ships()
+        self.history.append((cell, None if ship is None else ship.number))
+        return shot, ship
+
+    def unmake(self):
+        """Takes back the last shot fired by make() that hasn't been taken back yet, putting back the ship it removed
+
+        Raises IndexError if there's no shot to take back.
+        """
+        cell, number = self.history.pop()
+        if number is not None:
+            if self.shared:
+                self._own()
+            ship = self.placed[number]
+            # ships is always in the order they were placed
+            index = 0
+            while index < len(self.ships) and self.ships[index].number < number:
+                index += 1
+            self.ships.insert(index, ship)
+        self.unfire_cell(cell)
+        if number is not None and not ship.remaining:
+            # the ship removed had already been sunk by an earlier shot
+            self.sunk.append(ship)
+
+    def snapshot(self):
+        """Returns a BoardSnapshot of the Board's state, which restore() can put back"""
+        afloat = 0
+        for ship in self.ships:
+            afloat |= 1 << ship.number
+        return BoardSnapshot(self.ship_mask, self.hit_mask, len(self.placed), afloat,
+                             tuple(ship.number for ship in self.sunk))
+
+    def restore(self, snapshot):
+        """Puts back the state of a BoardSnapshot of this Board or of one it was cloned from
+
+        Ships placed since the snapshot are taken off again, and the history of make() is cleared. Raises ValueError if
+        the snapshot isn't of this Board.
+        """
+        if snapshot.placed > len(self.placed):
+            raise ValueError("The snapshot has ships that aren't on this Board")
+        if self.shared:
+            self._own()
+        for ship in self.placed[snapshot.placed:]:
+            for cell in ship.cells:
+                self.ship_at[cell] = None
+        del self.placed[snapshot.placed:]
+        ship_mask = 0
+        for ship in self.placed:
+            ship_mask |= ship.mask
+            ship.remaining = ship.size - bin(snapshot.hit_mask & ship.mask).count('1')
+        if ship_mask != snapshot.ship_mask:
+            raise ValueError("The snapshot has ships that aren't on this Board")
+        self.ship_mask = ship_mask
+        self.hit_mask = snapshot.hit_mask
+        self.ships = [ship for ship in self.placed if snapshot.afloat >> ship.number & 1]
+        self.sunk = [self.placed[number] for number in snapshot.sunk]
+        del self.history[:]
+
+    def clone(self):
+        """Returns a copy of the Board that shares its ships with this one until either of them changes them
+
+        The clone starts with no history of its own, so unmake() can't take back shots made before it was cloned.
+        """
+        board = Board.__new__(Board)
+        board.geometry = self.geometry
+        board.ship_mask = self.ship_mask
+        board.hit_mask = self.hit_mask
+        board.nodes = NodeMap(board)
+        board.ships = self.ships
+        board.ship_at = self.ship_at
+        board.sunk = self.sunk
+        board.placed = self.placed
+        board.history = []
+        board.shared = self.shared = True
+        return board
+
+    def _own(self):
+        """Copies the ships and the lists of them that the Board may share with a clone, so it can change them"""
+        placed = [ship.copy() for ship in self.placed]
+        self.placed = placed
+        self.ship_at = [None if ship is None else placed[ship.number] for ship in self.ship_at]
+        self.ships = [placed[ship.number] for ship in self.ships]
+        self.sunk = [placed[ship.number] for ship in self.sunk]
+        self.shared = False
+
     def show(self):
         """Displays the game Board, with unrevealed nodes hidden for the opposing player"""
-        boardstring = u'   1   2   3   4   5   6   7   8   9   10'.encode('utf-8')
-        for letter in "abcdefghij":
-            line = "\n" + letter
-            for i in range(10):
-                line += " " + str(self.nodes[letter + str(i + 1)].hide())
-            boardstring += line
-        return boardstring
+        return self._draw(self.hidden_glyph)
 
 
 # Code used to test this module
@@ -286,3 +646,54 @@ class Board:
 # print a
 # print a.sink_ships()
 # print a.ships
+
+
+# Benchmark of exploring hypothetical shots, by copying the Board and by the snapshot, make and clone methods
+
+if __name__ == '__main__':
+    from copy import deepcopy
+    from random import Random
+    from timeit import default_timer
+
+    rng = Random(0)
+    board = Board()
+    for name, size in [("Carrier", 5), ("Battleship", 4), ("Cruiser", 3), ("Submarine", 3), ("Destroyer", 2)]:
+        while True:
+            try:
+                board.put_ship(size, rng.choice(locations), rng.choice('nsew'), name)
+                break
+            except ShipError:
+                pass
+    for cell in rng.sample(range(standard.cells), 30):
+        board.make(cell)
+    unfired = [cell for cell in range(standard.cells) if not board.hit_mask >> cell & 1]
+
+    def explore(name, method):
+        """Times firing on every unfired cell of the board in turn and taking the shot back"""
+        start = default_timer()
+        for repeat in range(100):
+            for cell in unfired:
+                method(cell)
+        print("{0:>18}: {1:.2f} us per hypothetical shot".format(
+            name, (default_timer() - start) / (100 * len(unfired)) * 1000000))
+
+    def copied(cell):
+        deepcopy(board).make(cell)
+
+    def cloned(cell):
+        board.clone().make(cell)
+
+    def made(cell):
+        board.make(cell)
+        board.unmake()
+
+    snapshot = board.snapshot()
+
+    def restored(cell):
+        board.make(cell)
+        board.restore(snapshot)
+
+    explore("deepcopy", copied)
+    explore("clone", cloned)
+    explore("make and unmake", made)
+    explore("snapshot, restore", restored)
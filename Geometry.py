@@ -0,0 +1,190 @@
+"""Board geometry tables
+
+This module works out everything about the shape of a board once, so the game code can look things up instead of
+parsing location strings and catching exceptions at the edges of the board. Cells are numbered row by row from 0, so
+on the standard board a1 is 0, a10 is 9 and j10 is 99, and the bit for a cell in a Board's bitmasks is 1 << cell.
+Location strings are only needed where the game talks to a player.
+
+Boards can be any number of rows and columns. A location is the row's label followed by the column's number, like b7.
+Rows are labelled with letters by default, going on to aa, ab and so on past z the way spreadsheet columns are, so
+every location still reads as letters then digits; they can be numbered instead, in which case a comma separates the
+row from the column, like 12,7.
+
+Use geometry() to get the tables for a board size; they're built the first time they're asked for and shared after that.
+"""
+
+
+directions = ['n', 'e', 's', 'w']
+"""The cardinal directions, ordered such that adding 1 mod 4 rotates clockwise, and adding two reverses."""
+
+steps = {'n': (-1, 0), 'e': (0, 1), 's': (1, 0), 'w': (0, -1)}
+"""The change in (row, column) for one step in each direction"""
+
+
+def row_labels(rows, labels='letters'):
+    """Names the rows of a board
+
+    Args:
+        rows (int): The number of rows on the board
+        labels (str): 'letters' for a to z, then aa, ab and so on; 'numbers' for 1, 2 and so on
+
+    Returns:
+        A list of the label of every row, top to bottom
+    """
+    if labels == 'numbers':
+        return [str(row + 1) for row in range(rows)]
+    if labels != 'letters':
+        raise ValueError("labels must be 'letters' or 'numbers'")
+    names = []
+    for row in range(rows):
+        name = ''
+        row += 1
+        while row:
+            row, letter = divmod(row - 1, 26)
+            name = 'abcdefghijklmnopqrstuvwxyz'[letter] + name
+        names.append(name)
+    return names
+
+
+bit_values = bytearray(256)
+bit_values[ord('1')] = 1
+"""Translation table from the characters of a binary string to the values of the bits, used by Geometry.unpack()"""
+
+
+class Geometry(object):
+    """Lookup tables for a board of a specific size
+
+    Attributes:
+        rows (int): The number of rows on the board
+        columns (int): The number of columns on the board
+        cells (int): The number of cells on the board
+        labels (str): How the rows are labelled, either 'letters' or 'numbers'
+        row_labels (list of str): The label of every row
+        label_width (int): The length of the longest row label
+        separator (str): The string between the row label and the column number in a location
+        locations (list of str): The location string of every cell
+        index (dict): Maps every location string to its cell
+        neighbors (dict): Maps each direction to a list of the neighboring cell of every cell in that direction, or
+            None where that would be off the board
+        rays (dict): Maps each direction to a list of the tuple of cells from every cell (not including it) to the
+            edge of the board in that direction, nearest first
+    """
+    def __init__(self, rows=10, columns=10, labels='letters'):
+        """Inits Geometry for a board with the given number of rows and columns, and rows labelled the given way"""
+        if rows < 1 or columns < 1:
+            raise ValueError("a board needs at least one row and one column")
+        self.rows = rows
+        self.columns = columns
+        self.cells = rows * columns
+        self.labels = labels
+        self.row_labels = row_labels(rows, labels)
+        self.label_width = max(len(label) for label in self.row_labels)
+        self.separator = ',' if labels == 'numbers' else ''
+        self.locations = [label + self.separator + str(number + 1) for label in self.row_labels
+                          for number in range(columns)]
+        self.index = {location: cell for cell, location in enumerate(self.locations)}
+        self.neighbors = {}
+        self.rays = {}
+        # every ray is a slice of the cell's row or column, which is much quicker to build on large boards
+        lines = {'e': [tuple(range(row * columns, (row + 1) * columns)) for row in range(rows)],
+                 's': [tuple(range(col, self.cells, columns)) for col in range(columns)]}
+        lines['w'] = [line[::-1] for line in lines['e']]
+        lines['n'] = [line[::-1] for line in lines['s']]
+        for direction in steps:
+            rays = []
+            for cell in range(self.cells):
+                row, col = divmod(cell, columns)
+                if direction in 'ew':
+                    line, position = lines[direction][row], col if direction == 'e' else columns - 1 - col
+                else:
+                    line, position = lines[direction][col], row if direction == 's' else rows - 1 - row
+                rays.append(line[position + 1:])
+            self.rays[direction] = rays
+            self.neighbors[direction] = [ray[0] if ray else None for ray in rays]
+        self._ship_cells = {}
+        self._placements = {}
+        self._covering = {}
+
+    def unpack(self, mask):
+        """Splits a bitmask of cells into a bytearray with a 1 for every cell whose bit is set and a 0 for the rest
+
+        Testing the bits one at a time costs time in proportion to the size of the bitmask each, which adds up on large
+        boards, so code that needs every bit should unpack the bitmask once instead.
+        """
+        return bytearray(format(mask, 'b')[::-1].ljust(self.cells, '0')).translate(bit_values)
+
+    def ship_cells(self, size, cell, direction):
+        """Finds the cells of a ship of a specific size with one end at a cell, pointing in a direction
+
+        Args:
+            size (int): The size of ship
+            cell (int): The cell at the given end of the ship
+            direction (str): The direction the ship points in from that end
+
+        Returns:
+            A tuple of the ship's cells, listed outwards from the given end for north, south and east and from the far
+            end back to the given end for west (the order the Board has always listed them in), or None if the ship
+            would go off the board
+        """
+        key = (size, cell, direction)
+        if key not in self._ship_cells:
+            ray = self.rays[direction][cell]
+            if size < 1 or len(ray) < size - 1:
+                cells = None
+            elif direction == 'w':
+                cells = ray[size - 2::-1] + (cell,) if size > 1 else (cell,)
+            else:
+                cells = (cell,) + ray[:size - 1]
+            self._ship_cells[key] = cells
+        return self._ship_cells[key]
+
+    def placements(self, size):
+        """Lists every placement of a ship of a specific size on an empty board
+
+        Each placement is a horizontal or vertical run of size cells. The horizontal ones come first, row by row, then
+        the vertical ones.
+
+        Args:
+            size (int): The size of ship
+
+        Returns:
+            A list of (tuple of cells, bitmask of cells) for every placement
+        """
+        if size not in self._placements:
+            runs = []
+            for row in range(self.rows):
+                for col in range(self.columns - size + 1):
+                    runs.append(tuple(row * self.columns + col + i for i in range(size)))
+            for row in range(self.rows - size + 1):
+                for col in range(self.columns):
+                    runs.append(tuple((row + i) * self.columns + col for i in range(size)))
+            self._placements[size] = [(cells, sum(1 << cell for cell in cells)) for cells in runs]
+        return self._placements[size]
+
+    def covering(self, size):
+        """Indexes the placements of a ship of a specific size by the cells they cover
+
+        Args:
+            size (int): The size of ship
+
+        Returns:
+            A list of the tuple of the numbers of the placements (in the order of placements()) covering every cell
+        """
+        if size not in self._covering:
+            covering = [[] for cell in range(self.cells)]
+            for number, (cells, mask) in enumerate(self.placements(size)):
+                for cell in cells:
+                    covering[cell].append(number)
+            self._covering[size] = [tuple(numbers) for numbers in covering]
+        return self._covering[size]
+
+
+geometries = {}
+"""Cache of the Geometry for every board size asked for so far, keyed by (rows, columns, labels)"""
+
+
+def geometry(rows=10, columns=10, labels='letters'):
+    """Returns the shared Geometry for a board with the given number of rows and columns, and rows labelled that way"""
+    if (rows, columns, labels) not in geometries:
+        geometries[(rows, columns, labels)] = Geometry(rows, columns, labels)
+    return geometries[(rows, columns, labels)]
@@ -0,0 +1,149 @@
+"""Player input
+
+Every answer a human gives the game goes through an InputSource. The shared keyboard source asks for input with
+raw_input and writes messages to standard output, the way the game always has. A scripted source reads its answers
+from a list of lines instead: a file, a pipe, or any iterator of strings, such as a generator making up moves for a
+load or fuzz test. It writes its prompts and messages to a stream, or nowhere at all, and doesn't wait for Enter to be
+pressed, so a game driven by one runs at the speed of the code. A script that runs out of lines raises EOFError, the
+same as raw_input at the end of a pipe.
+
+    human = HumanPlayer(source=script("moves.txt"), renderer=Renderer(mode='off'))
+
+handle() (see Player.py) reads from an InputSource in a loop until it gets an answer it accepts, so any amount of bad
+input only costs time.
+"""
+
+import sys
+
+
+class InputSource(object):
+    """Where a player's answers come from: the keyboard, or a script of lines
+
+    Attributes:
+        lines (iterator): The lines still to be read, or None to ask for them with raw_input
+        stream (file): The stream prompts and messages are written to, or None to write nothing; keyboard input always
+            shows its prompts, since raw_input writes them itself
+        reads (int): The number of answers read
+        rejected (int): The number of answers handle() didn't accept
+    """
+    def __init__(self, lines=None, stream=None):
+        """Inits InputSource reading from the keyboard if lines is None, or else from the given iterable of lines
+
+        Args:
+            lines (iterable of str): The answers to give, in order; line endings are stripped off
+            stream (file): The stream to write prompts and messages to, or None to write nothing
+        """
+        self.lines = None if lines is None else iter(lines)
+        self.stream = stream
+        self.reads = 0
+        self.rejected = 0
+
+    def read(self, prompt):
+        """Asks for an answer
+
+        Returns:
+            The answer, without its line ending; raises EOFError if there are no answers left
+        """
+        self.reads += 1
+        if self.lines is None:
+            return raw_input(prompt)
+        if self.stream is not None:
+            self.stream.write(prompt)
+        for line in self.lines:
+            return line.rstrip('\r\n')
+        raise EOFError
+
+    def pause(self, prompt):
+        """Waits for Enter to be pressed at the keyboard; a script just shows the prompt and carries on"""
+        if self.lines is None:
+            raw_input(prompt)
+        elif self.stream is not None:
+            self.stream.write(prompt + "\n")
+
+    def say(self, message):
+        """Shows a message"""
+        if self.stream is not None:
+            self.stream.write(message + "\n")
+
+    def reject(self, message):
+        """Shows the message for an answer that wasn't accepted, and counts it"""
+        self.rejected += 1
+        self.say(message)
+
+
+def script(source, stream=None):
+    """Makes an InputSource that reads its answers from a script
+
+    Args:
+        source: A file name, '-' for standard input, an open file or pipe, or any iterable of strings
+        stream (file): The stream to write prompts and messages to, or None to write nothing
+
+    Returns:
+        The InputSource; a file is read a line at a time, as the answers are needed, and a file opened from its name is
+        closed once its lines run out or the InputSource is discarded
+    """
+    if source == '-':
+        source = sys.stdin
+    elif isinstance(source, basestring):
+        source = _lines(open(source))
+    return InputSource(source, stream)
+
+
+def _lines(opened):
+    """Generates the lines of a file, closing it when they run out or the generator is closed"""
+    try:
+        for line in opened:
+            yield line
+    finally:
+        opened.close()
+
+
+keyboard = InputSource(stream=sys.stdout)
+"""The InputSource for the keyboard shared by the game"""
+
+
+# Plays human-path games driven by a script of random and bad moves, to show how fast and robust the input layer is
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    from random import Random
+    from timeit import default_timer
+
+    from Session import *
+
+    parser = ArgumentParser(description="Play HumanPlayer against ComputerPlayer from a script of random moves.")
+    parser.add_argument("games", type=int, nargs="?", default=100, help="number of games to play (default 100)")
+    parser.add_argument("--junk", type=float, default=0.5,
+                        help="fraction of the answers that are made up rather than locations (default 0.5)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default 0)")
+    args = parser.parse_args()
+
+    rng = Random(args.seed)
+    junk = ["", " ", "k11", "a0", "z", "north", "5a", "\x00", "a" * 1000, "a1 n", "fire"]
+
+    def moves():
+        """Makes up answers forever: locations, directions and junk"""
+        while True:
+            if rng.random() < args.junk:
+                yield rng.choice(junk)
+            else:
+                yield rng.choice(standard.locations)
+                yield rng.choice(['n', 'e', 's', 'w', 'north', 'down', 'L'])
+
+    source = InputSource(moves())
+    silent = Renderer(mode='off')
+    turns = 0
+    start = default_timer()
+    for game in range(args.games):
+        human = HumanPlayer(source=source, renderer=silent)
+        session = GameSession(human, ComputerPlayer(rng=Random(rng.getrandbits(32))))
+        human.setup(session)
+        while session.phase != 'finished':
+            if session.ai_turn:
+                session.ai_move()
+            else:
+                human.take_turn(session)
+                turns += 1
+    elapsed = default_timer() - start
+    print("{0} games, {1} human turns in {2:.2f} s: {3:.0f} answers read per second, {4} of them rejected".format(
+        args.games, turns, elapsed, source.reads / elapsed, source.rejected))
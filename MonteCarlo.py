@@ -0,0 +1,184 @@
+"""Monte-Carlo posterior targeting for the AI
+
+Search mode scores cells by counting where a single ship could fit, which ignores the fact that ships can't overlap and
+ignores the hits the AI already knows about. This module instead samples complete layouts of the opposing player's
+remaining ships that agree with everything the AI has seen: no ship on a miss or on a sunk ship, every hit that hasn't
+sunk a ship covered by one, and no remaining ship lying entirely on hits (it would have been sunk). The AI then fires at
+the cell that has a ship in the most samples.
+
+Layouts are drawn the same way ComputerPlayer.setup() places its own ships (see Placement.random_fleet()), and the ones
+that don't cover every hit are thrown away. Samples are kept between turns: after each shot the ones that no longer agree
+with what the AI has seen are dropped and only the shortfall is drawn again. Each move can be given a wall-clock budget,
+and the sampling can be spread over a pool of processes.
+"""
+
+from multiprocessing import Pool
+from random import Random
+from timeit import default_timer
+
+from Gameboard import *
+
+
+def sample_layouts(task):
+    """Draws fleet layouts that agree with the AI's observations; used directly and by the processes of a sampler
+
+    Args:
+        task (tuple): (sizes, blocked, hits, rows, columns, count, seconds, seed), where sizes are the sizes of the
+            remaining ships, blocked is the bitmask of cells no ship can be on, hits is the bitmask of hit cells that
+            must be covered, count is the most layouts to return, seconds is the longest to spend (None for no limit)
+            and seed seeds the Random used
+
+    Returns:
+        A list of layouts, each a tuple of (size, bitmask) for every remaining ship
+    """
+    sizes, blocked, hits, rows, columns, count, seconds, seed = task
+    rng = Random(seed)
+    allowed = {}
+    for size in set(sizes):
+        allowed[size] = [mask for cells, mask in geometry(rows, columns).placements(size)
+                         if not mask & blocked and mask & ~hits]
+    layouts = []
+    deadline = None if seconds is None else default_timer() + seconds
+    attempts = 0
+    while len(layouts) < count:
+        attempts += 1
+        if deadline is not None and attempts % 64 == 0 and default_timer() > deadline:
+            break
+        taken = 0
+        layout = []
+        for size in sizes:
+            if not allowed[size]:
+                return layouts
+            mask = rng.choice(allowed[size])
+            if mask & taken:
+                legal = [other for other in allowed[size] if not other & taken]
+                if not legal:
+                    break
+                mask = rng.choice(legal)
+            layout.append((size, mask))
+            taken |= mask
+        else:
+            if not hits & ~taken:
+                layouts.append(tuple(layout))
+    return layouts
+
+
+class PosteriorSampler(object):
+    """Keeps a pool of sampled layouts of the opposing player's remaining ships for one ComputerPlayer
+
+    Attributes:
+        sizes (list of int): The sizes of the opposing player's remaining ships
+        geometry (Geometry): The Geometry of the board being fired on
+        samples (int): The number of layouts to keep in the pool
+        budget (float): The most wall-clock seconds to spend drawing new layouts each move, or None for no limit
+        processes (int): The number of processes to draw layouts on; 0 draws them in this process
+        fired (int): Bitmask of every cell fired upon
+        hits (int): Bitmask of the hit cells that aren't part of a sunk ship
+        pool (list): The sampled layouts, each a (bitmask of every ship, tuple of (size, bitmask) for every ship) pair
+    """
+    def __init__(self, sizes, samples=1000, budget=None, processes=0, geometry=None):
+        """Inits PosteriorSampler for a fleet of ships with the given sizes, with nothing seen yet
+
+        Args:
+            sizes (list of int): The sizes of the opposing player's ships
+            samples (int): The number of layouts to keep in the pool
+            budget (float): The most wall-clock seconds to spend drawing new layouts each move, or None for no limit;
+                with no limit, the AI plays the same way every time for the same random state
+            processes (int): The number of processes to draw layouts on; 0 draws them in this process
+            geometry (Geometry): The Geometry of the board being fired on; the standard board if None
+        """
+        self.sizes = sorted(sizes, reverse=True)
+        self.geometry = geometry or standard
+        self.samples = samples
+        self.budget = budget
+        self.processes = processes
+        self.fired = 0
+        self.hits = 0
+        self.pool = []
+        self._workers = None
+
+    def observe(self, shot, sunken_ship=None):
+        """Takes account of a shot fired on the opposing player's Board, dropping layouts that no longer agree with it
+
+        Args:
+            shot (Shot): The result of the shot
+            sunken_ship (Ship): The ship the shot sank, if any
+        """
+        bit = 1 << shot.cell
+        self.fired |= bit
+        if shot.ship is None:
+            self.pool = [entry for entry in self.pool if not entry[0] & bit]
+            return
+        self.hits |= bit
+        self.pool = [entry for entry in self.pool if entry[0] & bit]
+        if sunken_ship is not None:
+            self.hits &= ~sunken_ship.mask
+            self.sizes.remove(sunken_ship.size)
+            sunk = (sunken_ship.size, sunken_ship.mask)
+            pool = []
+            for union, layout in self.pool:
+                if sunk in layout:
+                    rest = list(layout)
+                    rest.remove(sunk)
+                    pool.append((union & ~sunken_ship.mask, tuple(rest)))
+            self.pool = pool
+        # a remaining ship that's been hit all over would have been sunk
+        self.pool = [entry for entry in self.pool if not any(mask & self.hits == mask for size, mask in entry[1])]
+
+    def _top_up(self, rng):
+        """Draws new layouts until the pool is full or the move's budget is spent"""
+        missing = self.samples - len(self.pool)
+        if missing <= 0 or not self.sizes:
+            return
+        rows, columns = self.geometry.rows, self.geometry.columns
+        blocked = self.fired & ~self.hits
+        if self.processes:
+            if self._workers is None:
+                self._workers = Pool(self.processes)
+            share = -(-missing // self.processes)
+            tasks = [(self.sizes, blocked, self.hits, rows, columns, share, self.budget, rng.getrandbits(64))
+                     for i in range(self.processes)]
+            layouts = [layout for part in self._workers.map(sample_layouts, tasks) for layout in part]
+        else:
+            layouts = sample_layouts((self.sizes, blocked, self.hits, rows, columns, missing, self.budget,
+                                      rng.getrandbits(64)))
+        for layout in layouts[:missing]:
+            union = 0
+            for size, mask in layout:
+                union |= mask
+            self.pool.append((union, layout))
+
+    def posterior(self):
+        """Counts, for every cell, how many of the layouts in the pool have a ship on it"""
+        counts = [0] * self.geometry.cells
+        for union, layout in self.pool:
+            while union:
+                bit = union & -union
+                union ^= bit
+                counts[bit.bit_length() - 1] += 1
+        return counts
+
+    def best(self, rng):
+        """Tops up the pool and finds the cells most likely to have a ship on them
+
+        Args:
+            rng (Random): The random number generator used to seed the sampling
+
+        Returns:
+            The sorted list of the unfired cells with a ship in the most layouts, or an empty list if no layouts could
+            be drawn
+        """
+        self._top_up(rng)
+        if not self.pool:
+            return []
+        counts = self.posterior()
+        fired = self.fired
+        top = max(count for cell, count in enumerate(counts) if not fired >> cell & 1)
+        return [cell for cell, count in enumerate(counts) if count == top and not fired >> cell & 1]
+
+    def close(self):
+        """Shuts down the pool of processes, if there is one"""
+        if self._workers is not None:
+            self._workers.close()
+            self._workers.join()
+            self._workers = None
@@ -0,0 +1,216 @@
+"""Adversarial fleet placement
+
+ComputerPlayer.setup() used to place its ships uniformly at random. This module searches for layouts that the AI itself
+takes the most shots to sink, by simulated annealing: a layout is changed by moving one ship to another of its legal
+placements, and the change is kept if the AI takes more shots against it, or with a probability that falls as the
+temperature does if it takes fewer.
+
+Layouts are scored with Batch.py: every layout is played against the AI a number of times, all of them in one lockstep
+GameBatch, and a run of annealing chains is stepped together so each step is scored in one batch. Batches can be spread
+over a pool of processes. Every score is cached by layout, so a layout that comes up again, which happens a lot once the
+chains settle, costs nothing; a layout scored with fewer games than asked for is only played the games it's missing.
+
+The AI in a GameBatch has no EndgameSolver (see Batch.py), so the layouts are the strongest against a ComputerPlayer
+made with endgame=None. The pool in layouts.json was tuned that way; layouts that hold out by leaving a last ship with
+many places to hide in should stay strong against the default AI too, since the solver is only used once there are few,
+but their scores are for the AI without it.
+
+Run it directly to build the pool of strong layouts that ComputerPlayers place their ships from (see Placement.py):
+
+    python Optimizer.py --layouts 256 --output layouts.json
+"""
+
+from math import exp
+from multiprocessing import Pool, cpu_count
+
+from Batch import *
+
+
+def score_layouts(task):
+    """Plays the AI against each of a list of layouts
+
+    This is module-level, rather than a method, so a multiprocessing.Pool can run it.
+
+    Args:
+        task (tuple): (seed, list of layouts, each a tuple of placement numbers, number of games for each, sizes of
+            the ships, rows and columns of the board)
+
+    Returns:
+        A list of the total number of shots the AI took against each layout over all of its games
+    """
+    seed, layouts, games, sizes, shape = task
+    playing = GameBatch(len(layouts) * games, sizes, numpy.random.RandomState(seed), geometry(*shape),
+                        numpy.repeat(numpy.array(layouts, dtype=numpy.int64), games, axis=0))
+    totals = numpy.zeros(len(layouts), dtype=numpy.int64)
+    while len(playing):
+        numbers, shots = playing.step()
+        numpy.add.at(totals, numbers // games, shots)
+    return totals.tolist()
+
+
+class PlacementOptimizer(object):
+    """Searches for fleet layouts that the AI takes the most shots to sink
+
+    A layout is a tuple of the number of each ship's placement in Geometry.placements(), like fleet_batches() gives.
+
+    Attributes:
+        sizes (list of int): The size of each ship
+        geometry (Geometry): The Geometry of the board
+        games (int): The number of games each layout is scored with
+        rng (Random): The random number generator for moves and acceptance
+        scores (dict): Maps every layout scored so far to (total shots, games played)
+        workers (Pool): The processes batches are scored on, or None to score them in this one
+    """
+    def __init__(self, sizes, geometry=None, games=128, seed=None, workers=1):
+        """Inits PlacementOptimizer with no layouts scored
+
+        Args:
+            sizes (list of int): The size of each ship
+            geometry (Geometry): The Geometry of the board; the standard board if None
+            games (int): The number of games each layout is scored with
+            seed (int): Seed for the random numbers, so a search can be repeated
+            workers (int): The number of processes to score batches on; 0 uses every CPU
+        """
+        self.sizes = sizes
+        self.geometry = geometry or standard
+        self.games = games
+        self.rng = Random(seed)
+        self.scores = {}
+        self.masks = {size: [mask for cells, mask in self.geometry.placements(size)] for size in set(sizes)}
+        self.workers = None
+        if workers != 1:
+            self.workers = Pool(workers or cpu_count())
+
+    def score(self, layouts, games=None):
+        """Returns the average number of shots the AI takes to sink each of the layouts
+
+        Layouts that have already been scored with enough games aren't played again; the rest are only played the games
+        they're missing, all of them together.
+
+        Args:
+            layouts (list of tuple): The layouts
+            games (int): The number of games to score each layout with; self.games if None
+        """
+        games = games or self.games
+        missing = {}
+        for layout in layouts:
+            played = self.scores.get(layout, (0, 0))[1]
+            if played < games:
+                missing[layout] = games - played
+        # layouts missing the same number of games are played in the same batches
+        by_games = {}
+        for layout, needed in missing.items():
+            by_games.setdefault(needed, []).append(layout)
+        tasks = []
+        for needed, group in sorted(by_games.items()):
+            chunk = max(1, 16384 // needed)
+            for first in range(0, len(group), chunk):
+                tasks.append((self.rng.getrandbits(32), group[first:first + chunk], needed, self.sizes,
+                              (self.geometry.rows, self.geometry.columns)))
+        results = (self.workers.imap if self.workers is not None else map)(score_layouts, tasks)
+        for task, totals in zip(tasks, results):
+            for layout, total in zip(task[1], totals):
+                shots, played = self.scores.get(layout, (0, 0))
+                self.scores[layout] = (shots + total, played + task[2])
+        return [float(self.scores[layout][0]) / self.scores[layout][1] for layout in layouts]
+
+    def random_layout(self):
+        """Returns a layout placed at random, the way random_fleet() places them"""
+        fleet = random_fleet(self.sizes, self.rng, self.geometry)
+        return tuple(self.masks[size].index(sum(1 << cell for cell in cells)) for size, cells in zip(self.sizes, fleet))
+
+    def neighbor(self, layout):
+        """Returns a copy of a layout with one ship moved to another of its legal placements, chosen at random"""
+        ship = self.rng.randrange(len(self.sizes))
+        size = self.sizes[ship]
+        taken = 0
+        for other, number in enumerate(layout):
+            if other != ship:
+                taken |= self.masks[self.sizes[other]][number]
+        legal = [number for number, mask in enumerate(self.masks[size]) if not mask & taken and number != layout[ship]]
+        if not legal:
+            return layout
+        return layout[:ship] + (self.rng.choice(legal),) + layout[ship + 1:]
+
+    def anneal(self, chains=64, steps=400, hot=3.0, cold=0.1):
+        """Runs annealing chains side by side, from random layouts
+
+        Args:
+            chains (int): The number of chains
+            steps (int): The number of moves each chain tries
+            hot (float): The starting temperature, in shots; a move that costs this many shots is kept about a third of
+                the time
+            cold (float): The final temperature, in shots
+
+        Returns:
+            The best layout each chain found
+        """
+        current = [self.random_layout() for chain in range(chains)]
+        current_scores = self.score(current)
+        best = list(current)
+        best_scores = list(current_scores)
+        for step in range(steps):
+            temperature = hot * (cold / hot) ** (float(step) / max(steps - 1, 1))
+            proposed = [self.neighbor(layout) for layout in current]
+            proposed_scores = self.score(proposed)
+            for chain in range(chains):
+                change = proposed_scores[chain] - current_scores[chain]
+                if change >= 0 or self.rng.random() < exp(change / temperature):
+                    current[chain] = proposed[chain]
+                    current_scores[chain] = proposed_scores[chain]
+                    if current_scores[chain] > best_scores[chain]:
+                        best[chain] = current[chain]
+                        best_scores[chain] = current_scores[chain]
+        return best
+
+    def cells(self, layout):
+        """Returns the tuple of cells of each ship of a layout, in the same order as sizes"""
+        return [self.geometry.placements(size)[number][0] for size, number in zip(self.sizes, layout)]
+
+    def close(self):
+        """Shuts down the pool of processes, if there is one"""
+        if self.workers is not None:
+            self.workers.close()
+            self.workers.join()
+            self.workers = None
+
+
+# Builds the pool of strong layouts
+
+if __name__ == '__main__':
+    import argparse
+    from timeit import default_timer
+
+    parser = argparse.ArgumentParser(description="Search for fleet layouts that the AI takes the most shots to sink.")
+    parser.add_argument("--layouts", type=int, default=256, help="number of layouts to find (default 256)")
+    parser.add_argument("--chains", type=int, default=64, help="number of annealing chains run together (default 64)")
+    parser.add_argument("--steps", type=int, default=400, help="number of moves each chain tries (default 400)")
+    parser.add_argument("--games", type=int, default=128, help="number of games to score a layout with (default 128)")
+    parser.add_argument("--final", type=int, default=2048,
+                        help="number of games to score the best layouts with before keeping them (default 2048)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, for repeatable runs")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes to score on; 0 uses every CPU (default 1)")
+    parser.add_argument("--output", default=layout_file, help="layout file to add the layouts to (default %(default)s)")
+    args = parser.parse_args()
+
+    sizes = sorted((size for name, size in standard_fleet), reverse=True)
+    optimizer = PlacementOptimizer(sizes, games=args.games, seed=args.seed, workers=args.workers)
+    start = default_timer()
+    baseline = optimizer.score([optimizer.random_layout() for layout in range(args.chains)], args.final)
+    print("Random layouts: {0:.2f} shots on average".format(sum(baseline) / len(baseline)))
+    found = []
+    while len(found) < args.layouts:
+        found.extend(layout for layout in optimizer.anneal(args.chains, args.steps) if layout not in found)
+        print("{0} layouts found in {1:.0f} s, {2} scored".format(len(found), default_timer() - start,
+                                                                  len(optimizer.scores)))
+    found = found[:args.layouts]
+    shots = optimizer.score(found, args.final)
+    optimizer.close()
+    print("Strong layouts: {0:.2f} shots on average, {1:.2f} to {2:.2f}".format(
+        sum(shots) / len(shots), min(shots), max(shots)))
+    pool = LayoutPool()
+    if os.path.exists(args.output):
+        pool.load(args.output)
+    pool.add(sizes, standard, [optimizer.cells(layout) for layout in found], shots)
+    pool.save(args.output)
@@ -0,0 +1,278 @@
+"""Random fleet placement
+
+This module places fleets of ships at random by drawing each ship from the placements that are still legal, instead of
+picking a random location and direction and retrying until Board.put_ship() accepts it. A placement is one of the
+horizontal or vertical runs listed by Geometry.placements(); it's legal if it doesn't overlap a ship already placed.
+
+Drawing each ship in turn uniformly from its legal placements gives the same layouts, with the same probabilities, as
+the old retry loop. Passing uniform=True instead makes every complete fleet layout equally likely, by drawing every
+ship from all of its placements and throwing the whole fleet away if any ships overlap.
+
+fleet_batches() produces layouts in bulk as NumPy arrays, for simulations that need a lot of them; without NumPy it falls
+back to random_fleet() one layout at a time.
+
+A LayoutPool holds layouts that the AI takes a long time to sink, found by Optimizer.py. The shared strong_layouts is
+loaded from layout_file, which is shipped next to this module, the first time a ComputerPlayer places its ships; picking
+a layout from it costs one random choice.
+"""
+
+import json
+import os
+import random as module_random
+
+from Gameboard import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def legal_placements(size, occupied=0, geometry=None):
+    """Lists the placements of a ship of a specific size that don't overlap any occupied cells
+
+    Args:
+        size (int): The size of ship
+        occupied (int): Bitmask of the cells already taken, such as a Board's ship_mask
+        geometry (Geometry): The Geometry of the board; the standard board if None
+
+    Returns:
+        A list of (tuple of cells, bitmask of cells) for every legal placement
+    """
+    geometry = geometry or standard
+    return [placement for placement in geometry.placements(size) if not placement[1] & occupied]
+
+
+def random_fleet(sizes, rng=None, geometry=None, occupied=0, uniform=False):
+    """Places a fleet of ships at random
+
+    Each ship is drawn directly from its legal placements. If the ships placed so far leave no room at all for the next
+    one, which can only happen on small boards or with crowded fleets, the fleet is started again.
+
+    Args:
+        sizes (list of int): The size of each ship, in the order they're placed
+        rng (Random): The random number generator to use; defaults to the random module's shared one
+        geometry (Geometry): The Geometry of the board; the standard board if None
+        occupied (int): Bitmask of the cells already taken
+        uniform (bool): Whether to make every complete layout equally likely, rather than drawing ships one at a time
+
+    Returns:
+        A list of the tuple of cells of each ship, in the same order as sizes
+    """
+    rng = rng or module_random
+    geometry = geometry or standard
+    while True:
+        fleet = []
+        taken = occupied
+        for size in sizes:
+            if uniform:
+                cells, mask = rng.choice(geometry.placements(size))
+                if mask & taken:
+                    break
+            else:
+                # A placement drawn from all of them is nearly always legal, and only drawing from the legal ones when it
+                # isn't still picks each legal placement with the same probability.
+                cells, mask = rng.choice(geometry.placements(size))
+                if mask & taken:
+                    legal = [placement for placement in geometry.placements(size) if not placement[1] & taken]
+                    if not legal:
+                        break
+                    cells, mask = rng.choice(legal)
+            fleet.append(cells)
+            taken |= mask
+        else:
+            return fleet
+        if stats.enabled:
+            stats.count('random_fleet restarts')
+
+
+def placement_words(size, geometry):
+    """Splits the bitmask of every placement of a ship into 64-bit words, for fleet_batches()
+
+    Returns:
+        A NumPy uint64 array with a row for each placement and a column for each word, lowest bits first
+    """
+    words = (geometry.cells + 63) // 64
+    return numpy.array([[mask >> 64 * word & 0xFFFFFFFFFFFFFFFF for word in range(words)]
+                        for cells, mask in geometry.placements(size)], dtype=numpy.uint64)
+
+
+def fleet_batches(sizes, batch=10000, seed=None, geometry=None, uniform=False):
+    """Generates random fleet layouts in bulk, forever
+
+    The layouts are drawn the same way as random_fleet(), but for a whole batch at once using NumPy. Each layout is a
+    row of placement numbers, one for each ship, which index Geometry.placements() for the ship's size.
+
+    Args:
+        sizes (list of int): The size of each ship
+        batch (int): The number of layouts to work on at once
+        seed (int): Seed for the random numbers, so the stream can be repeated; None seeds from the system
+        geometry (Geometry): The Geometry of the board; the standard board if None
+        uniform (bool): Whether to make every complete layout equally likely; batches can then come out smaller, since
+            layouts with overlapping ships are dropped
+
+    Yields:
+        NumPy int arrays with a row for each layout and a column for each ship. Without NumPy, single layouts from
+        random_fleet() are yielded as lists of placement numbers instead.
+    """
+    geometry = geometry or standard
+    if numpy is None:
+        rng = module_random.Random(seed)
+        numbers = {size: {cells: number for number, (cells, mask) in enumerate(geometry.placements(size))}
+                   for size in set(sizes)}
+        while True:
+            fleet = random_fleet(sizes, rng, geometry, uniform=uniform)
+            yield [numbers[size][cells] for size, cells in zip(sizes, fleet)]
+    rng = numpy.random.RandomState(seed)
+    words = {size: placement_words(size, geometry) for size in set(sizes)}
+    while True:
+        if uniform:
+            layouts = numpy.empty((batch, len(sizes)), dtype=numpy.int64)
+            taken = numpy.zeros((batch, words[sizes[0]].shape[1]), dtype=numpy.uint64)
+            overlap = numpy.zeros(batch, dtype=bool)
+            for ship, size in enumerate(sizes):
+                chosen = rng.randint(0, len(words[size]), batch)
+                layouts[:, ship] = chosen
+                masks = words[size][chosen]
+                overlap |= (taken & masks).any(axis=1)
+                taken |= masks
+            yield layouts[~overlap]
+        else:
+            yield sequential_batch(sizes, batch, rng, words)
+
+
+def sequential_batch(sizes, batch, rng, words):
+    """Draws a batch of layouts for fleet_batches(), one ship at a time from its legal placements"""
+    layouts = numpy.empty((batch, len(sizes)), dtype=numpy.int64)
+    taken = numpy.zeros((batch, words[sizes[0]].shape[1]), dtype=numpy.uint64)
+    stuck = numpy.zeros(batch, dtype=bool)
+    for ship, size in enumerate(sizes):
+        # Try one placement from all of them first, which is nearly always legal. Only the layouts where it isn't
+        # draw from their full list of legal placements; a placement is still picked with probability 1 / (number of
+        # legal placements) either way.
+        chosen = rng.randint(0, len(words[size]), batch)
+        rows = numpy.flatnonzero((taken & words[size][chosen]).any(axis=1))
+        if len(rows):
+            legal = numpy.ones((len(rows), len(words[size])), dtype=bool)
+            for word in range(taken.shape[1]):
+                legal &= (taken[rows, word, None] & words[size][None, :, word]) == 0
+            counts = legal.sum(axis=1)
+            stuck[rows] |= counts == 0
+            # pick the k-th legal placement, with k uniform below the number of legal placements
+            picks = (rng.random_sample(len(rows)) * counts).astype(numpy.int64)
+            chosen[rows] = (legal.cumsum(axis=1) > picks[:, None]).argmax(axis=1)
+        layouts[:, ship] = chosen
+        taken |= words[size][chosen]
+    if stuck.any():
+        layouts[stuck] = sequential_batch(sizes, int(stuck.sum()), rng, words)
+    return layouts
+
+
+layout_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "layouts.json")
+"""The file strong_layouts is loaded from"""
+
+
+class LayoutPool(object):
+    """Fleet layouts to place ships from, for boards of particular shapes and fleets of particular sizes
+
+    The file is JSON: a list of pools, each with the rows and columns of the board, the sizes of the fleet from largest
+    to smallest, the layouts, each a list of the cells of every ship in that order, and the average number of shots the
+    AI took to sink each layout.
+
+    Attributes:
+        path (str): The file to load the pools from the first time one is used; None once it has been, or for none
+        pools (dict): Maps (rows, columns, sizes from largest to smallest) to a list of layouts
+        shots (dict): Maps the same keys to the average number of shots the AI took to sink each layout
+    """
+    def __init__(self, path=None):
+        """Inits LayoutPool empty, to be loaded from path if it's given and exists"""
+        self.path = path
+        self.pools = {}
+        self.shots = {}
+
+    @staticmethod
+    def key(sizes, geometry):
+        """Returns the key of the pool for a fleet of the given sizes on a board of the given Geometry"""
+        return geometry.rows, geometry.columns, tuple(sorted(sizes, reverse=True))
+
+    def sample(self, sizes, geometry=None, rng=None):
+        """Picks a layout at random from the pool for a fleet and board
+
+        Args:
+            sizes (list of int): The size of each ship, in the order they're placed
+            geometry (Geometry): The Geometry of the board; the standard board if None
+            rng (Random): The random number generator to use; defaults to the random module's shared one
+
+        Returns:
+            A list of the tuple of cells of each ship, in the same order as sizes, like random_fleet() gives; or None if
+            there's no pool for the fleet and board
+        """
+        if self.path is not None:
+            path, self.path = self.path, None
+            if os.path.exists(path):
+                self.load(path)
+        layouts = self.pools.get(self.key(sizes, geometry or standard))
+        if not layouts:
+            return None
+        layout = list((rng or module_random).choice(layouts))
+        fleet = []
+        for size in sizes:
+            cells = next(cells for cells in layout if len(cells) == size)
+            layout.remove(cells)
+            fleet.append(cells)
+        return fleet
+
+    def add(self, sizes, geometry, layouts, shots):
+        """Adds layouts to the pool for a fleet and board
+
+        Args:
+            sizes (list of int): The size of each ship
+            geometry (Geometry): The Geometry of the board
+            layouts (list of list): Each layout, as a list of the tuple of cells of each ship in the same order as sizes
+            shots (list of float): The average number of shots the AI took to sink each layout
+        """
+        key = self.key(sizes, geometry)
+        order = sorted(range(len(sizes)), key=lambda ship: -sizes[ship])
+        self.pools.setdefault(key, []).extend([tuple(tuple(layout[ship]) for ship in order) for layout in layouts])
+        self.shots.setdefault(key, []).extend(shots)
+
+    def load(self, path):
+        """Adds the pools in a layout file to these ones"""
+        with open(path) as stream:
+            pools = json.load(stream)
+        for pool in pools:
+            key = (pool['rows'], pool['columns'], tuple(pool['sizes']))
+            layouts = [tuple(tuple(cells) for cells in layout) for layout in pool['layouts']]
+            self.pools.setdefault(key, []).extend(layouts)
+            self.shots.setdefault(key, []).extend(pool['shots'])
+
+    def save(self, path):
+        """Writes every pool to a layout file, replacing it"""
+        pools = [{'rows': rows, 'columns': columns, 'sizes': list(sizes), 'layouts': self.pools[key],
+                  'shots': [round(shots, 2) for shots in self.shots[key]]}
+                 for key in sorted(self.pools) for rows, columns, sizes in [key]]
+        with open(path, 'w') as stream:
+            json.dump(pools, stream, separators=(',', ':'))
+
+
+strong_layouts = LayoutPool(layout_file)
+"""The LayoutPool ComputerPlayers place their ships from"""
+
+
+# Benchmark of bulk fleet placement
+
+if __name__ == '__main__':
+    from itertools import islice
+    from timeit import default_timer
+
+    standard_sizes = [5, 4, 3, 3, 2]
+    for uniform in (False, True):
+        start = default_timer()
+        layouts = sum(len(layouts) for layouts in islice(fleet_batches(standard_sizes, 100000, 0, uniform=uniform), 5))
+        print("fleet_batches(uniform={0}): {1:.0f} layouts per second".format(
+            uniform, layouts / (default_timer() - start)))
+        start = default_timer()
+        rng = module_random.Random(0)
+        for i in range(10000):
+            random_fleet(standard_sizes, rng, uniform=uniform)
+        print("random_fleet(uniform={0}): {1:.0f} layouts per second".format(uniform, 10000 / (default_timer() - start)))
@@ -1,24 +1,37 @@
 """Human and Computer Player objects
 
 This module contains the Player objects, which represent the players of the game. The Computer player is actually very
-skilled, and will probably beat you. The handle function is special, it's used to handle user input.
+skilled, and will probably beat you. The handle function is special, it's used to handle user input, which comes from
+an InputSource (see Inputs.py): the keyboard, or a script.
 
 """
 
 from Gameboard import *
+from Density import *
+from Placement import *
+from MonteCarlo import *
+from Book import *
+from Endgame import *
+from Renderer import *
+from Inputs import *
 from random import *
+import random as module_random
+from timeit import default_timer
 
 
 def clear():
-    """Clears the screen by printing blank lines"""
-    print "\n" * 100
+    """Clears the screen, with the shared Renderer (see Renderer.py)"""
+    screen.clear()
 
 directions = ['n', 'e', 's', 'w']
 """List of directions to assist iterating through directions. Ordered such that adding 1 mod 4 rotates clockwise, and
 adding two reverses."""
 
+standard_fleet = [("Carrier", 5), ("Battleship", 4), ("Cruiser", 3), ("Submarine", 3), ("Destroyer", 2)]
+"""The names and sizes of the standard 5 ships, which every Player has unless given a different fleet"""
 
-def handle(prompts, message, func=None, precondition=lambda *x: True, postcondition=True):
+
+def handle(prompts, message, func=None, precondition=lambda *x: True, postcondition=True, source=None):
     """Handles User Input
     
     This function attempts apply a function to given input (or just test the input), and throws a message back to the
@@ -26,7 +39,8 @@ def handle(prompts, message, func=None, precondition=lambda *x: True, postcondit
     of handling user input; as part of my philosophy that the program should not crash regardless of user input, I use
     this function to instead force the user to retry whenever they enter bad input.
     
-    The code for this evolved over time and is a little messy, a decent target for refactoring.
+    Bad input is retried in a loop rather than by calling handle() again, so there's no limit to how much of it there
+    can be; a script of answers (see Inputs.py) can be as long as it likes.
     
     Args:
         prompts (list of strings OR str): The prompt(s) that the user receives for their input
@@ -34,29 +48,28 @@ def handle(prompts, message, func=None, precondition=lambda *x: True, postcondit
         func (func): The function that will be applied to the user input
         precondition (func): A test applied to the input
         postcondition (func): A test after the function is called
+        source (InputSource): Where the input comes from; the keyboard if None
     
     Returns:
         If func is not None, then a tuple containing (the list of inputs, the return value of func(*inputs)). If func
         is None, then it's just a typle containing a list of the inputs twice, which is very lazy and should probably
-        be refactored.
+        be refactored. Raises EOFError if the source runs out of input.
     """
-    inputs = []
-    if isinstance(prompts, list):
-        for prompt in prompts:
-            inputs.append(raw_input(prompt))
-    else:
-        inputs.append(raw_input(prompts))
-    try:
-        assert precondition(*inputs)
-        if func:
-            result = func(*inputs)
-        else:
-            result = inputs
-        assert postcondition
-        return inputs, result
-    except (KeyError, IndexError, AssertionError, ShipError):
-        print message
-        return handle(prompts, message, func, precondition, postcondition)
+    source = keyboard if source is None else source
+    if not isinstance(prompts, list):
+        prompts = [prompts]
+    while True:
+        inputs = [source.read(prompt) for prompt in prompts]
+        try:
+            assert precondition(*inputs)
+            if func:
+                result = func(*inputs)
+            else:
+                result = inputs
+            assert postcondition
+            return inputs, result
+        except (KeyError, IndexError, AssertionError, ShipError):
+            source.reject(message)
 
 
 class Player:
@@ -67,10 +80,16 @@ class Player:
         ships (dict): A dictionary of the player's ships corresponding to their sizes
         opposing_player (Player): The Player's opponent
     """
-    def __init__(self):
-        """Inits Player with a fresh Board, the standard 5 ships, and no opposing player."""
-        self.board = Board()
-        self.ships = {"Carrier": 5, "Battleship": 4, "Cruiser": 3, "Submarine": 3, "Destroyer": 2}
+    def __init__(self, geometry=None, fleet=None):
+        """Inits Player with a fresh Board, the given fleet of ships, and no opposing player.
+
+        Args:
+            geometry (Geometry): The Geometry of the Player's board; the standard board if None
+            fleet (dict): The names of the Player's ships and their sizes, or a list of (name, size) pairs; the standard
+                5 ships if None
+        """
+        self.board = Board(geometry)
+        self.ships = dict(standard_fleet if fleet is None else fleet)
         self.opposing_player = None
 
     def setup(self):
@@ -88,38 +107,55 @@ class Player:
 
 
 class HumanPlayer(Player):
-    """Human Player object"""
-    def setup(self):
-        """Sets up the board by taking user input with the handle() function for location and direction"""
-        for ship, size in self.ships.items():
-            print(self.board)
+    """Human Player object
+
+    A HumanPlayer plays in a GameSession (see Session.py), which keeps the rules and the turn order; its methods only
+    ask for moves, make them through the session and show what happened.
+
+    Attributes:
+        renderer (Renderer): The Renderer the boards are drawn with
+        source (InputSource): Where the Player's answers come from
+    """
+    def __init__(self, geometry=None, fleet=None, renderer=None, source=None):
+        """Inits HumanPlayer like a Player, drawing on the given Renderer (the shared one if None) and reading answers
+        from the given InputSource (the keyboard if None)"""
+        Player.__init__(self, geometry, fleet)
+        self.renderer = screen if renderer is None else renderer
+        self.source = keyboard if source is None else source
+
+    def setup(self, session):
+        """Places the Player's ships in a GameSession, in the order it asks for them, taking user input with the
+        handle() function for location and direction"""
+        player = session.players.index(self)
+        while session.next_ship(player) is not None:
+            ship, size = session.next_ship(player)
+            self.renderer.draw((self.board, False))
             handle(["Select the location of (one end of) your {0} ({1}):\n".format(ship, size),
                     "Selection the direction of your {}:\n".format(ship)],
                    "Please choose a valid location and (cardinal) direction.",
-                   lambda x, y: self.board.put_ship(size, x, y, ship))
-            clear()
+                   lambda x, y: session.place(player, x, y), source=self.source)
+        self.renderer.clear()
 
-    def take_turn(self):
-        """Takes user input for where to fire on, and reports the result"""
-        clear()
-        print(self.opposing_player.board.show())
-        print(self.board)
-        loc = handle(["Select a location to fire on!\n"], "Please choose a valid location.",
-                     lambda x: self.opposing_player.board.nodes[x].hit())[0][0]
-        clear()
-        print(self.opposing_player.board.show())
-        if self.opposing_player.board.nodes[loc].is_ship:
-            print "A hit!!!!\n"
-            raw_input("Press Enter to continue\n")
-        else:
-            print "A miss...\n"
-            raw_input("Press Enter to continue\n")
-        sunken_ship = self.opposing_player.board.sink_ships()
-        if sunken_ship:
-            print "You sunk the " + sunken_ship[1] + "!\n"
-            raw_input("Press Enter to continue\n")
+    def take_turn(self, session):
+        """Takes user input for where to fire on, fires through a GameSession, and reports the result
+
+        Both boards stay on the screen for the whole turn, so the Renderer only has to redraw the row that was fired on
+        once the result is in.
+        """
+        player = session.players.index(self)
+        self.renderer.draw((self.opposing_player.board, True), (self.board, False))
+        move = handle(["Select a location to fire on!\n"], "Please choose a valid location.",
+                      lambda x: session.fire(player, x), source=self.source)[1]
+        self.renderer.draw((self.opposing_player.board, True), (self.board, False))
+        if move.result != 'miss':
+            self.source.say("A hit!!!!\n")
+            self.source.pause("Press Enter to continue\n")
         else:
-            pass
+            self.source.say("A miss...\n")
+            self.source.pause("Press Enter to continue\n")
+        if move.ship:
+            self.source.say("You sunk the " + move.ship + "!\n")
+            self.source.pause("Press Enter to continue\n")
 
 
 class ComputerPlayer(Player):
@@ -129,209 +165,374 @@ class ComputerPlayer(Player):
     moves, which is faster than most humans. It wins most of the time, but it is possible to beat it with a bit of luck.
     
     The AI is the main target for refactoring; in addition to just cleaning up the targeting code, it's possible to
-    optimize that code even further as well as optimize the AI's ship placement instead of doing it randomly.
+    optimize that code even further. Its ship placement is optimized already: it places its fleet from a pool of layouts
+    that it takes the longest to sink itself (see Optimizer.py), and only at random for boards and fleets with no pool.
     
     Attributes:
-        mode (str): A string representing the AI's targeting mode; either 'search', 'pinpoint', or 'destroy'.
+        mode (str): A string representing the AI's targeting mode; either 'search', 'pinpoint', 'destroy' or
+                    'montecarlo'.
+        turn_mode (str): The mode the last turn was played in: the mode it started in, or 'endgame' if the
+                    EndgameSolver picked the shot; None before the first turn
         target (str): A string representing a location where the AI believes there to be a ship; used during pinpoint
                         and destroy modes
         target_direction (str): A string representing the direction the AI believes a ship to be in
         has_flipped (bool): A bool used during destroy that describes whether the AI has already reached one end of the
                     ship that it believes it is destroying
         self.sunken_ships (list of str): a list of all of the location that contain ships that have already been sunk
+        wounded (set of int): The cells the AI has hit that aren't part of a sunken ship
+        engine (class): The class used to keep the probability scores, either DensityMap or PlacementDensity
+        rng (Random): The random number generator used to place ships and break ties between targets
+        density (DensityMap): The probability scores of the opposing player's Board, used during search mode
+        book (OpeningBook): The best cells of search mode states seen before, shared with other ComputerPlayers; None
+            to always work the scores out
+        state (int): The Zobrist hash of the shots fired on the opposing player's Board (see Book.py), kept up to date
+            while they're within the book's depth
+        shots (int): The number of shots fired on the opposing player's Board, counted up to one past the book's depth
+        sampler (PosteriorSampler): The sampled layouts of the opposing player's ships, used during montecarlo mode
+        pool (LayoutPool): The layouts the ComputerPlayer places its ships from; None to place them at random
+        endgame (EndgameSolver): Works out the best shots once only a few of the opposing player's ships are left,
+            shared with other ComputerPlayers; None to keep to the targeting modes until the end
     """
-    def __init__(self):
-        """Inits the ComputerPlayer in search mode, with no target and target_direction 'w'."""
-        Player.__init__(self)
-        self.mode = 'search'
+    def __init__(self, engine=DensityMap, rng=None, sampler=None, geometry=None, fleet=None, book=opening_book,
+                 pool=strong_layouts, endgame=endgame_solver):
+        """Inits the ComputerPlayer in search mode, with no target and target_direction 'w'.
+
+        Args:
+            engine (class): The class used to keep the probability scores; PlacementDensity needs NumPy
+            rng (Random): The random number generator to use; defaults to the random module's shared one. Giving each
+                game its own seeded Random makes it repeatable, even when other games are being played at the same time
+            sampler (PosteriorSampler): If given, the ComputerPlayer plays every turn in montecarlo mode with it instead
+            geometry (Geometry): The Geometry of the ComputerPlayer's board; the standard board if None
+            fleet (dict): The names of the ComputerPlayer's ships and their sizes, or a list of (name, size) pairs; the
+                standard 5 ships if None
+            book (OpeningBook): The book to look search mode states up in; the shared one by default, or None for none
+            pool (LayoutPool): The layouts to place ships from; the shared strong_layouts by default, or None to place
+                them at random
+            endgame (EndgameSolver): The solver to play the endgame with; the shared one by default, or None for none
+        """
+        Player.__init__(self, geometry, fleet)
+        self.engine = engine
+        self.rng = module_random if rng is None else rng
+        self.sampler = sampler
+        self.mode = 'search' if sampler is None else 'montecarlo'
+        self.turn_mode = None
         self.target = None
         self.target_direction = 'w'
         self.has_flipped = False
         self.sunken_ships = []
+        self.wounded = set()
+        self.density = None
+        self.book = book
+        self.state = 0
+        self.shots = 0
+        self.pool = pool
+        self.endgame = endgame
 
     def setup(self):
-        """Places the ComputerPlayer's ships on the board randomly, retrying ships placed in invalid locations"""
-        for ship, size in self.ships.items():
-            while True:
-                try:
-                    numloc = randint(1, 10)
-                    letterloc = ntl[randint(1, 10)]
-                    loc = letterloc + str(numloc)
-                    direction = choice(directions)
-                    self.board.put_ship(size, loc, direction, ship)
-                    break
-                except ShipError:
-                    pass
+        """Places the ComputerPlayer's ships on the board
+
+        They're placed as a layout from the pool if it has any for the board and fleet, and the board has no ships on it
+        yet; otherwise randomly, drawing each one from the places it can still go.
+        """
+        ships = list(self.ships.items())
+        sizes = [size for ship, size in ships]
+        fleet = None
+        if self.pool is not None and not self.board.ship_mask:
+            fleet = self.pool.sample(sizes, self.board.geometry, self.rng)
+        if fleet is None:
+            fleet = random_fleet(sizes, self.rng, self.board.geometry, self.board.ship_mask)
+        for (ship, size), cells in zip(ships, fleet):
+            self.board.add_ship(cells, ship)
+
+    def fire(self, loc):
+        """Fires on a location of the opposing player's Board, keeping track of which hits haven't sunk a ship yet
+
+        Args:
+            loc (str): The location to fire on
+
+        Returns:
+            The Shot; raises NodeError if the location has already been fired upon, or KeyError if it isn't on the board
+        """
+        shot = self.opposing_player.board.fire(loc)
+        if self.book is not None and self.shots <= self.book.depth:
+            self.state ^= zobrist(self.opposing_player.board.geometry).shot(shot.cell, shot.ship is not None)
+            self.shots += 1
+        if shot.ship is not None:
+            self.wounded.add(shot.cell)
+        sunken_ship = self.opposing_player.board.sink_ships()
+        # sunken_ship is None unless it sinks a ship that turn
+        if sunken_ship:
+            self.sunken_ships += sunken_ship[0]
+            self.wounded.difference_update(sunken_ship.cells)
+        if self.sampler is not None:
+            self.sampler.observe(shot, sunken_ship)
+        return shot
+
+    def wounded_locations(self):
+        """Returns the locations that have been hit but aren't part of a sunken ship, row by row"""
+        return [self.opposing_player.board.geometry.locations[cell] for cell in sorted(self.wounded)]
 
     def take_turn(self):
+        """Determines where to fire on the opposing player's Board and fires; see _take_turn()
+
+        With stats enabled, the whole turn is timed by the mode it's played in; see turn_mode.
+        """
+        if not stats.enabled:
+            self._take_turn()
+            return
+        start = default_timer()
+        self._take_turn()
+        stats.time('take_turn ' + self.turn_mode, default_timer() - start)
+
+    def _take_turn(self):
         """Determines where to fire on the opposing player's Board and fires.
         
         This is the targeting code for the AI, the bulk of its complexity. It operates in three modes: search, pinpoint,
         and destroy. Search is used when it does not know the location of any of the opposing player's ships. When the
         AI gets a hit in that mode, it switches to pinpoint mode, which is used to determine the direction of the enemy
-        ship. Once the AI believes it knows the direction, it switches into destroy mode, which is used to destroy the
-        enemy ship. These modes are documented individually below.
-        
-        This is the prime target for refactoring. The code is messy and complex, and could probably be split into 4
-        separate methods. That would probably allow us to move some of the object attributes (target, target_direction,
-        and has_flipped) into the parameters for the new methods, which would be very clean.
+        ship. Once it believes it knows the direction, it switches into destroy mode, which is used to destroy the enemy
+        ship. These modes are documented individually in _search(), _pinpoint() and _destroy().
+
+        Each mode only looks at cells that are on the board and haven't been fired upon, so nothing is raised and caught
+        on the way. A mode that runs out of such cells hands the turn on to the next one down, destroy to pinpoint to
+        search, which always fires; so a turn never looks at more than the two lines through the target, its 4
+        neighbors and one draw per cell of the board.
+
+        A ComputerPlayer given a PosteriorSampler stays in a fourth mode, montecarlo, for the whole game instead.
+
+        Whatever the mode, once few enough of the opposing player's ships are left the EndgameSolver picks the shot
+        instead, if it can within its caps; see _endgame().
         """
-        if self.mode == 'search':
-            """Search Mode
-            
-            The first step in search mode is to figure out the most likely locations to have a ship. This is done by
-            iterating through every location on the opposing player's board, and using the length of the list returned
-            by the neighborhood() method to get the total number of possible ships of a specific size that could be on
-            that location, and summing that for every ship that the enemy player has remaining. We use this sum as the
-            'probability score' for that location; by doing this for every location, we can create a dictionary of the
-            scores for every node on the opposing player's board.
-            
-            Then, the AI chooses randomly from locations with the maximum 'scores' and fires upon it. If it hits, then
-            it moves into pinpoint mode and assigned self.target to the location that it hit.
-            
-            This can be optimized for speed by storing the probability score dictionary, and only updating the values
-            that change when it fires, rather than recalculating every location each time.
-            """
-            while True:
-                try:
-                    node_probablities = {node: 0 for node in self.opposing_player.board.nodes.keys()}
-                    for node in node_probablities.keys() :
-                        if not self.opposing_player.board.nodes[node].is_hit:
-                            for ship in self.opposing_player.board.ships:
-                                node_probablities[node] += len(self.opposing_player.board.neighborhoods(node, len(ship)))
-                    nodes = list(node_probablities.keys())
-                    probs = list(node_probablities.values())
-                    best_nodes = [node for node in nodes if probs[nodes.index(node)] == max(probs)]
-                    loc = choice(best_nodes)
-                    self.opposing_player.board.nodes[loc].hit()
-                    if self.opposing_player.board.nodes[loc].is_ship:
-                        self.mode = 'pinpoint'
-                        self.target = loc
-                    sunken_ship = self.opposing_player.board.sink_ships()
-                    if sunken_ship:
-                        self.sunken_ships += sunken_ship[0]
-                    break
-                except NodeError:
-                    pass
-        elif self.mode == 'pinpoint':
-            """Pinpoint Mode
-            
-            This mode fires in a circle around a specific other location (self.target), attempting to determine the
-            direction of the ship that has been hit. Once it does, it sets that to self.target_direction and goes into
-            destroy mode. 
-            
-            This could be refactored using the adjacent() function; the code was written before that function.
-            """
-            while True:
-                try:
-                    loc = self.target
-                    if self.target_direction == 'n':
-                        loc = ntl[ltn[loc[0]] - 1] + loc[1:]
-                    elif self.target_direction == 's':
-                        loc = ntl[ltn[loc[0]] + 1] + loc[1:]
-                    elif self.target_direction == 'e':
-                        loc = loc[0] + str(int(loc[1:]) + 1)
-                    else:
-                        loc = loc[0] + str(int(loc[1:]) - 1)
-                    # loc = adjacent(self.target, self.target_direction)
-                    self.opposing_player.board.nodes[loc].hit()
-                    if self.opposing_player.board.nodes[loc].is_ship:
-                        self.mode = 'destroy'
-                    else:
-                        # rotate self.target_direction clockwise
-                        self.target_direction = directions[(directions.index(self.target_direction) + 1) % 4]
-                    sunken_ship = self.opposing_player.board.sink_ships()
-                    # sunken_ship is None unless it sinks a ship that turn
-                    if sunken_ship:
-                        self.sunken_ships += sunken_ship[0]
-                    break
-                except (NodeError, KeyError, IndexError):
-                    self.target_direction = directions[(directions.index(self.target_direction) + 1) % 4]
-        else:
-            """Destroy Mode:
-            
-            This mode is active only when the AI believes that it knows the location and direction of a ship. It fires
-            along that direction, and reverses direction if it misses or fails. If it sinks a ship, or if it misses when
-            it has already reversed direction, then it checks to see whether there are any nodes that are ships and have
-            been hit but are not part of a sunken ship. If there are, it chooses one as self.target and goes into
-            pinpoint mode; if not, then it goes back into search mode.
-            
-            This could also be refactored to make use of adjacent(), as well as cleaned up a lot in general.
-            """
-            while True:
-                try:
-                    # set loc to the adjacent location to self.target
-                    loc = self.target
-                    if self.target_direction == 'n':
-                        loc = ntl[ltn[loc[0]] - 1] + loc[1:]
-                    elif self.target_direction == 's':
-                        loc = ntl[ltn[loc[0]] + 1] + loc[1:]
-                    elif self.target_direction == 'e':
-                        loc = loc[0] + str(int(loc[1:]) + 1)
-                    else:
-                        loc = loc[0] + str(int(loc[1:]) - 1)
-                    if not self.opposing_player.board.nodes[loc].hide().is_hit:
-                        self.opposing_player.board.nodes[loc].hit()
-                        if not (self.opposing_player.board.nodes[loc].is_ship or self.has_flipped):
-                            self.target_direction = directions[(directions.index(self.target_direction) + 2) % 4]
-                            self.has_flipped = True
-                        elif not self.opposing_player.board.nodes[loc].is_ship and self.has_flipped:
-                            self.target_direction = directions[(directions.index(self.target_direction) + 1) % 4]
-                            self.has_flipped = False
-                        sunken_ship = self.opposing_player.board.sink_ships()
-                        if sunken_ship:
-                            self.has_flipped = False
-                            self.sunken_ships += sunken_ship[0]
-                            targets = filter(lambda x: x not in self.sunken_ships and self.opposing_player.board.nodes[
-                                x].hide().is_ship,
-                                             self.opposing_player.board.nodes.keys())
-                            if targets:
-                                self.target = choice(targets)
-                            else:
-                                self.mode = 'search'
-                        break
-                    elif self.opposing_player.board.nodes[loc].hide().is_ship:
-                        self.target = loc
-                    else:
-                        raise KeyError
-                        # print self.opposing_player.board
-                except (KeyError, IndexError):
-                    if self.has_flipped:
-                        targets = filter(
-                            lambda x: x not in self.sunken_ships and self.opposing_player.board.nodes[x].hide().is_ship,
-                            self.opposing_player.board.nodes.keys())
-                        self.has_flipped = False
-                        if targets:
-                            self.target = choice(targets)
-                            self.mode = "pinpoint"
-                            self.take_turn()
-                            break
-                        else:
-                            self.mode = 'search'
-                            self.take_turn()
-                            break
-                    else:
-                        # flips direction
-                        self.target_direction = directions[(directions.index(self.target_direction) + 2) % 4]
-                        self.has_flipped = True
-
-# Code used to test AI and debug
-# d = []
-# for i in range(50):
-#     a = ComputerPlayer()
-#     b = ComputerPlayer()
-#     a.set_opponent(b)
-#     a.setup()
-#     b.setup()
-#     c = 0
-#     try:
-#         for j in range(99):
-#             a.take_turn()
-#             c += 1
-#             assert b.board.ships
-#         print b.board.ships
-#         print b.board
-#     except AssertionError:
-#         d.append(c)
-# print d
-# print sum(d) / float(len(d))
+        if self._endgame():
+            self.turn_mode = 'endgame'
+            return
+        self.turn_mode = self.mode
+        if self.mode == 'montecarlo':
+            self._montecarlo()
+            return
+        if self.mode == 'destroy' and self._destroy():
+            return
+        if self.mode == 'pinpoint' and self._pinpoint():
+            return
+        self._search()
+
+    def _search_cell(self):
+        """Picks one of the unfired cells with the highest search mode score, keeping the scores up to date
+
+        When no ship fits anywhere the scores are all 0, and the best cells include the ones already fired upon. They're
+        drawn again until one hasn't been, the way the AI always has, but only as many times as there are best cells;
+        after that one is drawn from the unfired ones alone.
+
+        Within the book's depth, the best cells are looked up in it first, and stored in it if they had to be worked
+        out.
+        """
+        board = self.opposing_player.board
+        sizes = [len(ship) for ship in board.ships]
+        best = None
+        opening = self.book is not None and self.shots <= self.book.depth
+        if opening:
+            state = self.state ^ zobrist(board.geometry).fleet(sizes)
+            best = self.book.get(board.geometry, state)
+        if best is None:
+            if self.density is None or self.density.board is not board:
+                self.density = self.engine(board)
+            self.density.sync(sizes)
+            best = self.density.best()
+            if opening:
+                self.book.put(board.geometry, state, best)
+        for draw in range(len(best)):
+            cell = self.rng.choice(best)
+            if not board.hit_mask >> cell & 1:
+                return cell
+            if stats.enabled:
+                stats.count('search redraws')
+        return self.rng.choice([cell for cell in best if not board.hit_mask >> cell & 1])
+
+    def _endgame(self):
+        """Endgame
+
+        Once the opposing player has no more ships left than the EndgameSolver takes, it fires at one of the cells that
+        leave the fewest shots expected to sink them (see Endgame.py). The targeting modes are left ready to take over
+        on any turn the solver gives up on: pinpointing around a hit that hasn't sunk a ship, if there is one, or
+        searching.
+
+        Returns:
+            Whether it fired; if not, the turn is played in the current mode
+        """
+        board = self.opposing_player.board
+        if self.endgame is None or len(board.ships) > self.endgame.ships:
+            return False
+        hits = 0
+        for cell in self.wounded:
+            hits |= 1 << cell
+        best = self.endgame.best(board.geometry, [ship.size for ship in board.ships], board.hit_mask & ~hits, hits)
+        if best is None:
+            if stats.enabled:
+                stats.count('endgame fallbacks')
+            return False
+        if stats.enabled:
+            stats.count('endgame shots')
+        loc = board.geometry.locations[self.rng.choice(best)]
+        shot = self.fire(loc)
+        if self.mode != 'montecarlo':
+            self.has_flipped = False
+            if shot.cell in self.wounded:
+                self.mode = 'pinpoint'
+                self.target = loc
+            elif self.wounded:
+                self.mode = 'pinpoint'
+                self.target = self.rng.choice(self.wounded_locations())
+            else:
+                self.mode = 'search'
+        return True
+
+    def _montecarlo(self):
+        """Monte-Carlo Mode
+
+        Fires at the location that has a ship in the most of the sampled layouts of the opposing player's remaining
+        ships (see MonteCarlo.py). If no layouts could be drawn within the move's budget, the search mode scores are
+        used for this turn instead.
+        """
+        best = self.sampler.best(self.rng)
+        cell = self.rng.choice(best) if best else self._search_cell()
+        self.fire(self.opposing_player.board.geometry.locations[cell])
+
+    def _search(self):
+        """Search Mode
+
+        The first step in search mode is to figure out the most likely locations to have a ship. This is done by
+        iterating through every location on the opposing player's board, and using the length of the list returned by
+        the neighborhood() method to get the total number of possible ships of a specific size that could be on that
+        location, and summing that for every ship that the enemy player has remaining. We use this sum as the
+        'probability score' for that location; by doing this for every location, we can create a dictionary of the
+        scores for every node on the opposing player's board.
+
+        Then, the AI chooses randomly from locations with the maximum 'scores' and fires upon it. If it hits, then it
+        moves into pinpoint mode and assigned self.target to the location that it hit.
+
+        The scores are kept in a DensityMap between turns, which only updates the values that change when a shot is
+        fired or a ship is sunk, rather than recalculating every location each time. The best locations are listed row
+        by row, the same order that density() scores them in.
+
+        The size used for each ship is len(ship), which is the length of the (locations, name) tuple rather than the
+        length of the ship. That's how the AI has always been tuned, so it's kept as is.
+        """
+        loc = self.opposing_player.board.geometry.locations[self._search_cell()]
+        shot = self.fire(loc)
+        if shot.ship is not None:
+            self.mode = 'pinpoint'
+            self.target = loc
+
+    def _around(self, cell):
+        """Yields the direction and cell of each neighbor of a cell that is on the board and hasn't been fired upon
+
+        The directions go clockwise, starting from self.target_direction.
+        """
+        board = self.opposing_player.board
+        start = directions.index(self.target_direction)
+        for turn in range(4):
+            direction = directions[(start + turn) % 4]
+            neighbor = board.geometry.neighbors[direction][cell]
+            if neighbor is not None and not board.hit_mask >> neighbor & 1:
+                yield direction, neighbor
+
+    def _pinpoint(self):
+        """Pinpoint Mode
+
+        This mode fires in a circle around a specific other location (self.target), attempting to determine the
+        direction of the ship that has been hit. Once it does, it sets that to self.target_direction and goes into
+        destroy mode. Otherwise the direction is rotated clockwise past the one it fired in, ready for next turn.
+
+        If every location around the target has already been fired upon or is off the board, this turn is played in
+        search mode instead.
+
+        Returns:
+            Whether it fired; if not, the mode has been set to 'search'
+        """
+        geometry = self.opposing_player.board.geometry
+        for direction, cell in self._around(geometry.index[self.target]):
+            shot = self.fire(geometry.locations[cell])
+            if shot.ship is not None:
+                self.mode = 'destroy'
+                self.target_direction = direction
+            else:
+                # rotate self.target_direction clockwise
+                self.target_direction = directions[(directions.index(direction) + 1) % 4]
+            return True
+        self.mode = 'search'
+        if stats.enabled:
+            stats.count('fallback pinpoint to search')
+        return False
+
+    def _along(self, cell):
+        """Follows the hit ship cells from a cell in self.target_direction
+
+        Returns:
+            A tuple of the last hit ship cell reached (cell itself if the next one isn't), and the cell after it if that
+            is on the board and hasn't been fired upon, or None
+        """
+        board = self.opposing_player.board
+        neighbors = board.geometry.neighbors[self.target_direction]
+        while True:
+            neighbor = neighbors[cell]
+            if neighbor is None:
+                return cell, None
+            if not board.hit_mask >> neighbor & 1:
+                return cell, neighbor
+            if not board.ship_mask >> neighbor & 1:
+                return cell, None
+            cell = neighbor
+
+    def _destroy(self):
+        """Destroy Mode
+
+        This mode is active only when the AI believes that it knows the location and direction of a ship. It fires along
+        that direction, past any part of the ship it has already hit, and reverses direction if it misses or can't go
+        any further. If it sinks a ship, it checks to see whether there are any nodes that are ships and have been hit
+        but are not part of a sunken ship. If there are, it chooses one as self.target; if not, then it goes back into
+        search mode.
+
+        If it can't go any further in either direction, it chooses one of those nodes and plays this turn in pinpoint
+        mode instead, or in search mode if there are none.
+
+        Returns:
+            Whether it fired; if not, the mode has been set to 'pinpoint' or 'search'
+        """
+        geometry = self.opposing_player.board.geometry
+        cell = geometry.index[self.target]
+        while True:
+            cell, candidate = self._along(cell)
+            self.target = geometry.locations[cell]
+            if candidate is not None:
+                break
+            if self.has_flipped:
+                targets = self.wounded_locations()
+                self.has_flipped = False
+                if targets:
+                    self.target = self.rng.choice(targets)
+                    self.mode = 'pinpoint'
+                else:
+                    self.mode = 'search'
+                if stats.enabled:
+                    stats.count('fallback destroy to ' + self.mode)
+                return False
+            # flips direction
+            self.target_direction = directions[(directions.index(self.target_direction) + 2) % 4]
+            self.has_flipped = True
+        shot = self.fire(geometry.locations[candidate])
+        if not (shot.ship is not None or self.has_flipped):
+            self.target_direction = directions[(directions.index(self.target_direction) + 2) % 4]
+            self.has_flipped = True
+        elif shot.ship is None and self.has_flipped:
+            self.target_direction = directions[(directions.index(self.target_direction) + 1) % 4]
+            self.has_flipped = False
+        if shot.result == 'sunk':
+            self.has_flipped = False
+            targets = self.wounded_locations()
+            if targets:
+                self.target = self.rng.choice(targets)
+            else:
+                self.mode = 'search'
+        return True
+
+# The AI is tested with the headless simulator in Simulator.py
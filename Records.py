@@ -0,0 +1,413 @@
+"""Binary game records
+
+This module records games in a compact binary file that is only ever appended to, so it can be written as games finish
+and hold any number of them. Each game is recorded with its seed, the shape of the boards, both fleets and every shot
+with its result and the targeting mode the ComputerPlayer fired it in, which is enough to replay it exactly (see
+replay()) and to analyse it (see Analytics.py).
+
+The file starts with the 4 bytes MAGIC, then holds a run of entries. Every entry is a kind byte, the length of the rest
+of the entry and the rest of the entry; the length lets a reader skip entries it doesn't need. All of the numbers are
+varints: 7 bits to a byte, lowest first, with the top bit set on every byte but the last.
+
+    N entry: a ship name and its id; written the first time the name is used
+        id, then the name in UTF-8
+    G entry: a game
+        seed + 1 (0 if the game had no seed), rows, columns
+        for each of the two fleets: the number of ships, then for each ship its first cell, its direction (the index
+            in directions), its size and the id of its name
+        the number of shots, then for each shot cell << 6 | mode << 3 | result << 1 | player, where mode is the index
+            in shot_modes, result is the index in shot_results and player is 0 or 1 for the player who fired
+
+Files of version 1 of the format, which didn't record modes and packed shots as cell << 3 | result << 1 | player, can
+still be read, but not added to.
+
+A game on the standard board with 100 shots takes around 240 bytes. RecordReader memory-maps the file, so iterating over
+it only reads the entries as it reaches them.
+"""
+
+import mmap
+import os
+from collections import namedtuple
+
+from Gameboard import *
+
+
+MAGIC = 'BSR2'
+"""The bytes every record file starts with; the last one is the version of the format"""
+
+shot_results = ['miss', 'hit', 'sunk']
+"""The results of a shot, in the order they're numbered in a record"""
+
+shot_modes = [None, 'search', 'pinpoint', 'destroy', 'montecarlo', 'endgame']
+"""The ComputerPlayer targeting modes a shot can be fired in, in the order they're numbered in a record; None is for
+shots fired by a HumanPlayer, or recorded without a mode, and 'endgame' for shots the EndgameSolver picked"""
+
+
+def record_version(magic):
+    """Returns the version of the format a file starting with the given bytes is in, or None if it isn't a record file"""
+    if len(magic) == len(MAGIC) and magic[:-1] == MAGIC[:-1] and magic[-1] in '12':
+        return int(magic[-1])
+    return None
+
+
+GameRecord = namedtuple('GameRecord', ['seed', 'rows', 'columns', 'fleets', 'shots'])
+"""A recorded game
+
+seed is the seed the game was played with, or None. fleets is a 2-tuple of the fleet each player placed on their own
+board, each a tuple of (first cell, direction, size, name) for every ship in the order it was placed. shots is a tuple
+of (player, cell, result, mode) for every shot in the order it was fired, where player is 0 or 1, result is 'miss',
+'hit' or 'sunk' and mode is one of shot_modes.
+"""
+
+
+def fleet_of(board):
+    """Describes the ships on a Board the way a GameRecord does
+
+    Ships are described from their first cell, pointing east if they're horizontal and south if they're vertical, so
+    the description doesn't depend on which end they were placed from.
+
+    Args:
+        board (Board): The Board, before any of its ships have been sunk
+
+    Returns:
+        A tuple of (first cell, direction, size, name) for every ship on the Board, in order
+    """
+    columns = board.geometry.columns
+    fleet = []
+    for ship in board.ships:
+        cells = sorted(ship.cells)
+        direction = 'e' if cells[0] // columns == cells[-1] // columns else 's'
+        fleet.append((cells[0], direction, len(cells), ship.name))
+    return tuple(fleet)
+
+
+class GameLog(object):
+    """Collects the GameRecord of a game as it's played
+
+    Shots are picked up from the Boards' hit bitmasks, so the players don't need to know they're being recorded; call
+    turn() after every turn.
+
+    Attributes:
+        seed (int): The seed the game is played with, or None
+        boards (tuple of Board): The Boards of player 0 and player 1
+        fleets (tuple): The fleet of each player, as given by fleet_of() when the GameLog was made
+        shots (list): (player, cell, result, mode) for every shot recorded so far
+    """
+    def __init__(self, seed, board0, board1):
+        """Inits GameLog for a game between the owners of two Boards, once both have placed their ships"""
+        self.seed = seed
+        self.boards = (board0, board1)
+        self.fleets = (fleet_of(board0), fleet_of(board1))
+        self.shots = []
+        self._seen = [board0.hit_mask, board1.hit_mask]
+
+    def turn(self, player, mode=None):
+        """Records the shots fired by a player since the last call
+
+        Args:
+            player (int): The player who just took their turn, 0 or 1
+            mode (str): The targeting mode a ComputerPlayer played the turn in (see ComputerPlayer.turn_mode); None
+                for a HumanPlayer
+        """
+        board = self.boards[1 - player]
+        new = board.hit_mask & ~self._seen[1 - player]
+        self._seen[1 - player] = board.hit_mask
+        while new:
+            bit = new & -new
+            new ^= bit
+            cell = bit.bit_length() - 1
+            ship = board.ship_at[cell]
+            self.shots.append((player, cell, 'miss' if ship is None else 'sunk' if not ship.remaining else 'hit', mode))
+
+    def record(self):
+        """Returns the GameRecord of the game so far"""
+        geometry = self.boards[0].geometry
+        return GameRecord(self.seed, geometry.rows, geometry.columns, self.fleets, tuple(self.shots))
+
+
+def put_varint(buffer, number):
+    """Appends a varint to a bytearray"""
+    while number > 0x7F:
+        buffer.append(number & 0x7F | 0x80)
+        number >>= 7
+    buffer.append(number)
+
+
+def get_varint(buffer, position):
+    """Reads a varint from a bytearray
+
+    Returns:
+        A tuple of the number and the position after it
+    """
+    number = shift = 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, position
+        shift += 7
+
+
+class RecordWriter(object):
+    """Appends GameRecords to a record file
+
+    Attributes:
+        path (str): The path of the file
+        names (dict): Maps every ship name in the file to its id
+    """
+    def __init__(self, path):
+        """Inits RecordWriter for the file at the given path, starting it if it doesn't exist yet
+
+        If the last entry in the file was only partly written, it's dropped. Raises ValueError if the file is in an older
+        version of the format.
+        """
+        self.path = path
+        self.names = {}
+        if os.path.exists(path) and os.path.getsize(path):
+            reader = RecordReader(path)
+            if reader.version != record_version(MAGIC):
+                reader.close()
+                raise ValueError("{0} is in version {1} of the record format".format(path, reader.version))
+            self.names = {name: number for number, name in enumerate(reader.scan_names())}
+            reader.close()
+            if reader.end < os.path.getsize(path):
+                with open(path, 'r+b') as partial:
+                    partial.truncate(reader.end)
+        self._file = open(path, 'ab')
+        if not self._file.tell():
+            self._file.write(MAGIC)
+
+    def _name_id(self, name):
+        """Returns the id of a ship name, writing an N entry for it if it's new to the file"""
+        if name not in self.names:
+            number = self.names[name] = len(self.names)
+            payload = bytearray()
+            put_varint(payload, number)
+            payload += name.encode('utf-8') if isinstance(name, unicode) else name
+            self._write_entry('N', payload)
+        return self.names[name]
+
+    def _write_entry(self, kind, payload):
+        """Writes an entry with the given kind byte and payload"""
+        entry = bytearray(kind)
+        put_varint(entry, len(payload))
+        self._file.write(entry + payload)
+
+    def write(self, record):
+        """Appends a GameRecord to the file"""
+        payload = bytearray()
+        put_varint(payload, 0 if record.seed is None else record.seed + 1)
+        put_varint(payload, record.rows)
+        put_varint(payload, record.columns)
+        for fleet in record.fleets:
+            put_varint(payload, len(fleet))
+            for cell, direction, size, name in fleet:
+                put_varint(payload, cell)
+                payload.append(directions.index(direction))
+                put_varint(payload, size)
+                put_varint(payload, self._name_id(name))
+        put_varint(payload, len(record.shots))
+        for player, cell, result, mode in record.shots:
+            put_varint(payload, cell << 6 | shot_modes.index(mode) << 3 | shot_results.index(result) << 1 | player)
+        self._write_entry('G', payload)
+
+    def flush(self):
+        """Makes sure everything written so far is in the file"""
+        self._file.flush()
+
+    def close(self):
+        """Flushes and closes the file"""
+        self._file.close()
+
+
+class RecordReader(object):
+    """Reads the GameRecords in a record file, memory-mapping it rather than loading it
+
+    Iterating over a RecordReader gives every GameRecord in the file, in the order they were written.
+
+    Attributes:
+        path (str): The path of the file
+        names (list of str): The ship name with every id seen so far
+        end (int): The position just after the last whole entry read so far
+        version (int): The version of the format the file is in
+    """
+    def __init__(self, path):
+        """Inits RecordReader for the file at the given path; raises ValueError if it isn't a record file"""
+        self.path = path
+        self.names = []
+        self.end = len(MAGIC)
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else ''
+        self.version = record_version(self._map[:len(MAGIC)])
+        if self.version is None:
+            self.close()
+            raise ValueError("{0} isn't a game record file".format(path))
+
+    def _entries(self):
+        """Generates (kind, payload) for every entry in the file"""
+        data = self._map
+        position = len(MAGIC)
+        end = len(data)
+        while position < end:
+            kind = data[position]
+            # the length is at most a few bytes, so only those are copied to read it
+            try:
+                length, start = get_varint(bytearray(data[position + 1:position + 11]), 0)
+            except IndexError:
+                length, start = end, 0
+            start += position + 1
+            position = start + length
+            if position > end:
+                # the last entry was being written when the file was copied, or the writer was stopped part way through
+                return
+            self.end = position
+            yield kind, data[start:position]
+
+    def _name(self, payload):
+        """Takes account of an N entry"""
+        payload = bytearray(payload)
+        number, position = get_varint(payload, 0)
+        # names are numbered in the order they're written, so the id is always the next one
+        self.names.append(str(payload[position:]))
+
+    def scan_names(self):
+        """Reads every ship name in the file, skipping over the games, and returns the list of them by id"""
+        self.names = []
+        for kind, payload in self._entries():
+            if kind == 'N':
+                self._name(payload)
+        return self.names
+
+    def __iter__(self):
+        self.names = []
+        for kind, payload in self._entries():
+            if kind == 'N':
+                self._name(payload)
+            elif kind == 'G':
+                yield self._game(bytearray(payload))
+
+    def _game(self, payload):
+        """Decodes the payload of a G entry"""
+        seed, position = get_varint(payload, 0)
+        rows, position = get_varint(payload, position)
+        columns, position = get_varint(payload, position)
+        fleets = []
+        for player in range(2):
+            ships, position = get_varint(payload, position)
+            fleet = []
+            for ship in range(ships):
+                cell, position = get_varint(payload, position)
+                direction = directions[payload[position]]
+                size, position = get_varint(payload, position + 1)
+                name, position = get_varint(payload, position)
+                fleet.append((cell, direction, size, self.names[name]))
+            fleets.append(tuple(fleet))
+        count, position = get_varint(payload, position)
+        shots = []
+        for shot in range(count):
+            value, position = get_varint(payload, position)
+            if self.version == 1:
+                shots.append((value & 1, value >> 3, shot_results[value >> 1 & 3], None))
+            else:
+                shots.append((value & 1, value >> 6, shot_results[value >> 1 & 3], shot_modes[value >> 3 & 7]))
+        return GameRecord(seed - 1 if seed else None, rows, columns, tuple(fleets), tuple(shots))
+
+    def close(self):
+        """Unmaps and closes the file"""
+        if not isinstance(self._map, str):
+            self._map.close()
+        self._file.close()
+
+
+def open_records(path):
+    """Opens a RecordWriter for a file, first moving the file aside if it's in an older version of the format
+
+    An older file can still be read, but not added to, so it's renamed to path + '.v' + its version (or the first of
+    those with a number after it that's free), and a new file is started in its place.
+
+    Args:
+        path (str): The path of the file
+
+    Returns:
+        A tuple of the RecordWriter and the path the older file was moved to, or None if it wasn't; raises ValueError if
+        the file isn't a record file at all
+    """
+    moved = None
+    if os.path.exists(path) and os.path.getsize(path):
+        reader = RecordReader(path)
+        version = reader.version
+        reader.close()
+        if version != record_version(MAGIC):
+            moved = "{0}.v{1}".format(path, version)
+            number = 1
+            while os.path.exists(moved):
+                number += 1
+                moved = "{0}.v{1}.{2}".format(path, version, number)
+            os.rename(path, moved)
+    return RecordWriter(path), moved
+
+
+def replay(record):
+    """Plays a recorded game again
+
+    Args:
+        record (GameRecord): The game to replay
+
+    Returns:
+        The Boards of player 0 and player 1 at the end of the game; raises ValueError if a shot doesn't have the result
+        that was recorded
+    """
+    board_geometry = geometry(record.rows, record.columns)
+    boards = (Board(board_geometry), Board(board_geometry))
+    for board, fleet in zip(boards, record.fleets):
+        for cell, direction, size, name in fleet:
+            board.add_ship(board_geometry.ship_cells(size, cell, direction), name)
+    for number, (player, cell, result, mode) in enumerate(record.shots):
+        board = boards[1 - player]
+        shot = board.fire_cell(cell)
+        board.sink_ships()
+        if shot.result != result:
+            raise ValueError("shot {0} was a {1} but was recorded as a {2}".format(number, shot.result, result))
+    return boards
+
+
+# Benchmark of writing and reading records of simulated games
+
+if __name__ == '__main__':
+    import tempfile
+    from random import Random
+    from timeit import default_timer
+
+    from Player import ComputerPlayer
+
+    path = os.path.join(tempfile.mkdtemp(), 'games.rec')
+    records = []
+    for game in range(1000):
+        rng = Random(game)
+        attacker, defender = ComputerPlayer(rng=rng), ComputerPlayer(rng=rng)
+        attacker.set_opponent(defender)
+        attacker.setup()
+        defender.setup()
+        log = GameLog(game, attacker.board, defender.board)
+        while defender.board.ships:
+            attacker.take_turn()
+            log.turn(0, attacker.turn_mode)
+        records.append(log.record())
+    start = default_timer()
+    writer = RecordWriter(path)
+    for record in records:
+        writer.write(record)
+    writer.close()
+    print("Writing: {0:.0f} games per second, {1:.1f} bytes per game".format(
+        len(records) / (default_timer() - start), os.path.getsize(path) / float(len(records))))
+    start = default_timer()
+    reader = RecordReader(path)
+    assert list(reader) == records
+    print("Reading: {0:.0f} games per second".format(len(records) / (default_timer() - start)))
+    start = default_timer()
+    for record in reader:
+        replay(record)
+    reader.close()
+    print("Replaying: {0:.0f} games per second".format(len(records) / (default_timer() - start)))
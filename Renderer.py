@@ -0,0 +1,196 @@
+"""Terminal rendering
+
+The game used to redraw the screen by printing 100 blank lines and then building every Board's string again, cell by
+cell. The Renderer instead remembers what it last drew: every row of a Board is kept as an encoded string, built from a
+list of the glyph of each cell, and when the same Boards are drawn again only the cells whose bits have changed since
+are looked up again, and only their rows are written, using ANSI escape codes to move the cursor to them.
+
+Rows are rewritten whole rather than moving the cursor to single cells, because the glyphs aren't all the same width in
+every terminal (see Board.heading), so the column a cell starts in can't be worked out reliably.
+
+A Renderer has three modes:
+    ansi: draws incrementally as above; the default when writing to a terminal
+    plain: clears the screen with blank lines and prints every Board in full, the way the game always has; the default
+        otherwise, such as in an IDE's console, which usually ignores cursor movement
+    off: draws nothing at all, for spectators and slow remote terminals that don't need to see the Boards
+"""
+
+import sys
+
+
+ESC = '\x1b['
+"""The start of every ANSI escape code"""
+
+render_modes = ['ansi', 'plain', 'off']
+"""The Renderer modes"""
+
+
+class BoardView(object):
+    """A Board as last drawn on the screen
+
+    Attributes:
+        board (Board): The Board drawn
+        hidden (bool): Whether the Board is drawn for the opposing player, with unrevealed cells hidden
+        top (int): The screen line the Board's heading is drawn on, counting from 0
+        glyphs (list): A list for every row of the glyph drawn in every cell
+        rows (list of str): The drawn string of every row
+        ship_mask (int): The Board's ship bitmask when it was last drawn
+        hit_mask (int): The Board's hit bitmask when it was last drawn
+    """
+    __slots__ = ('board', 'hidden', 'top', 'glyphs', 'rows', 'ship_mask', 'hit_mask')
+
+    def __init__(self, board, hidden, top):
+        """Inits BoardView with every row built from the Board as it is now"""
+        self.board = board
+        self.hidden = hidden
+        self.top = top
+        glyph = board.hidden_glyph if hidden else board.glyph
+        columns = board.geometry.columns
+        self.glyphs = [[glyph(row * columns + column) for column in range(columns)]
+                       for row in range(board.geometry.rows)]
+        self.rows = [self._row(row) for row in range(board.geometry.rows)]
+        self.ship_mask = board.ship_mask
+        self.hit_mask = board.hit_mask
+
+    def _row(self, row):
+        """Builds the drawn string of a row from its glyphs"""
+        return self.board.row_label(row) + "".join(" " + glyph for glyph in self.glyphs[row])
+
+    def lines(self):
+        """Returns every line of the Board as drawn: the heading, then every row"""
+        return [self.board.heading()] + self.rows
+
+    def update(self):
+        """Catches up with the changes to the Board since it was last drawn
+
+        Only the cells whose bits have changed are looked up again; a ship that's hidden can't have changed how its
+        cell is drawn, so hidden Boards only look at the cells fired upon.
+
+        Returns:
+            A sorted list of the rows that have changed
+        """
+        board = self.board
+        changed = board.hit_mask ^ self.hit_mask
+        if self.hidden:
+            changed |= (board.ship_mask ^ self.ship_mask) & board.hit_mask
+        else:
+            changed |= board.ship_mask ^ self.ship_mask
+        self.ship_mask = board.ship_mask
+        self.hit_mask = board.hit_mask
+        glyph = board.hidden_glyph if self.hidden else board.glyph
+        columns = board.geometry.columns
+        rows = set()
+        while changed:
+            bit = changed & -changed
+            changed ^= bit
+            cell = bit.bit_length() - 1
+            row, column = divmod(cell, columns)
+            self.glyphs[row][column] = glyph(cell)
+            rows.add(row)
+        for row in rows:
+            self.rows[row] = self._row(row)
+        return sorted(rows)
+
+
+class Renderer(object):
+    """Draws Boards on a terminal, redrawing as little as possible
+
+    Attributes:
+        stream (file): The stream drawn on
+        mode (str): The way of drawing; one of render_modes
+        views (list of BoardView): The Boards on the screen, top to bottom, as of the last draw()
+        bottom (int): The screen line below the last Board, where any other output goes
+    """
+    def __init__(self, stream=None, mode=None):
+        """Inits Renderer with nothing on the screen
+
+        Args:
+            stream (file): The stream to draw on; standard output if None
+            mode (str): One of render_modes; if None, 'ansi' if the stream is a terminal, else 'plain'
+        """
+        self.stream = sys.stdout if stream is None else stream
+        if mode is None:
+            isatty = getattr(self.stream, 'isatty', None)
+            mode = 'ansi' if isatty is not None and isatty() else 'plain'
+        if mode not in render_modes:
+            raise ValueError("mode must be one of " + ", ".join(render_modes))
+        self.mode = mode
+        self.views = []
+        self.bottom = 0
+
+    def clear(self):
+        """Clears the screen"""
+        self.views = []
+        self.bottom = 0
+        if self.mode == 'ansi':
+            self.stream.write(ESC + '2J' + ESC + 'H')
+            self.stream.flush()
+        elif self.mode == 'plain':
+            self.stream.write("\n" * 101)
+
+    def draw(self, *boards):
+        """Shows the given Boards, one below the other, on an otherwise clear screen
+
+        If the same Boards are on the screen in the same places, only the rows that have changed are written. The
+        cursor is left below the last Board, with the rest of the screen cleared.
+
+        Args:
+            boards (tuple): (Board, whether it's hidden) for every Board to show, top to bottom
+        """
+        if self.mode == 'off':
+            return
+        if self.mode == 'plain':
+            self.clear()
+            for board, hidden in boards:
+                self.stream.write((board.show() if hidden else str(board)) + "\n")
+            return
+        if [(view.board, view.hidden) for view in self.views] != [(board, hidden) for board, hidden in boards]:
+            self.views = []
+            top = 0
+            for board, hidden in boards:
+                self.views.append(BoardView(board, hidden, top))
+                top += board.geometry.rows + 1
+            self.bottom = top
+            output = [ESC + '2J' + ESC + 'H' + "\n".join(line for view in self.views for line in view.lines()) + "\n"]
+        else:
+            output = []
+            for view in self.views:
+                for row in view.update():
+                    # the screen's lines count from 1, and the heading is on the view's top line
+                    output.append(ESC + '{0};1H'.format(view.top + row + 2) + view.rows[row] + ESC + 'K')
+        output.append(ESC + '{0};1H'.format(self.bottom + 1) + ESC + 'J')
+        self.stream.write("".join(output))
+        self.stream.flush()
+
+
+screen = Renderer()
+"""The Renderer for standard output shared by the game"""
+
+
+# Benchmark of drawing a turn in full against drawing only the changes
+
+if __name__ == '__main__':
+    from random import Random
+    from timeit import default_timer
+
+    from Gameboard import *
+
+    class Discard(object):
+        """A stream that throws away everything written to it"""
+        def write(self, text):
+            pass
+
+        def flush(self):
+            pass
+
+    rng = Random(0)
+    for name, shape in (("10x10", (10, 10)), ("100x100", (100, 100))):
+        shots = rng.sample(range(geometry(*shape).cells), 100)
+        for mode in ('plain', 'ansi'):
+            renderer = Renderer(Discard(), mode)
+            boards = [Board(geometry(*shape)), Board(geometry(*shape))]
+            start = default_timer()
+            for cell in shots:
+                boards[0].fire_cell(cell)
+                renderer.draw((boards[0], True), (boards[1], False))
+            print("{0} {1}: {2:.3f} ms per turn".format(name, mode, (default_timer() - start) / len(shots) * 1000))
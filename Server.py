@@ -0,0 +1,688 @@
+"""Game server
+
+Game.py plays one game at a time, at one terminal. This module hosts any number of games at once over a TCP or Unix
+socket, each one a session between a client and a ComputerPlayer, or between two clients. The standard library of the
+Python 2 the game is written in has no asyncio, so the server is built on asyncore instead: every connection is served
+by one thread, from a single poll() (or select()) loop. The ComputerPlayers' turns are run on a pool of threads, so a
+slow move, in montecarlo mode say, doesn't hold up the other sessions; a finished move wakes the loop up through a pipe.
+
+The protocol is lines of text. Clients send commands:
+    NEW COMPUTER                    start a game against a ComputerPlayer
+    NEW HUMAN                       start a game against the next client to ask for one
+    PLACE <location> <direction>    place the next ship, e.g. PLACE a1 s
+    PLACE RANDOM                    place every ship not placed yet at random
+    FIRE <location>                 fire on the opponent's board
+    SHOW                            show both boards, one line at a time, each starting with "|"
+    STATS                           show the session's latencies; STATS ALL shows the whole server's
+    QUIT                            leave the game, which the opponent wins
+Every command is answered with a line starting with OK or ERROR; FIRE is answered with "OK <result>", where the result
+is miss, hit or sunk, followed by the name of the ship if it was sunk. The server also sends these when they happen:
+    PLACE <ship> <size>             the next ship to place
+    TURN                            it's the client's turn to fire
+    SHOT <location> <result>        the opponent fired, with the result as above
+    OVER <WON|LOST>                 the game is over
+
+Run it directly to serve games, or with --load to play simulated clients against a server in another process:
+
+    python Server.py --port 8765
+    python Server.py --load 1000
+
+ComputerPlayers solve the endgame exactly when they can (see Endgame.py), for at most --endgame-budget seconds a move,
+so a slow move can't hold up a worker thread for long.
+"""
+
+import asynchat
+import asyncore
+import os
+import select
+import socket
+from multiprocessing.pool import ThreadPool
+from Queue import Queue, Empty
+from timeit import default_timer
+
+from Player import *
+from Records import *
+from Session import *
+
+
+latency_kinds = ['command', 'reply', 'move']
+"""The latencies kept for every session:
+    command: the time the loop spent handling a command
+    reply: the time from a client's shot to the ComputerPlayer's answering shot being sent, including the time the move
+        waited for a thread
+    move: the time the ComputerPlayer's take_turn() took
+"""
+
+
+commands = {'new': (1, 1), 'place': (1, 2), 'fire': (1, 1), 'show': (0, 0), 'stats': (0, 1), 'quit': (0, 0)}
+"""Maps every command to the fewest and most arguments it takes"""
+
+
+class ServerError(Exception):
+    """Raised for a command that can't be carried out; the message is sent back to the client"""
+    pass
+
+
+class Latency(object):
+    """Timings of one kind of event
+
+    Attributes:
+        count (int): The number of events timed
+        total (float): The total seconds taken
+        worst (float): The most seconds any event took
+        samples (list of float): The seconds taken by the latest events, at most sample_size of them
+    """
+    sample_size = 1000
+    """The number of the latest events kept for percentiles"""
+
+    def __init__(self):
+        """Inits Latency with nothing timed"""
+        self.count = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.samples = []
+
+    def add(self, seconds):
+        """Adds the time of an event"""
+        self.count += 1
+        self.total += seconds
+        self.worst = max(self.worst, seconds)
+        if len(self.samples) >= self.sample_size:
+            self.samples[self.count % self.sample_size] = seconds
+        else:
+            self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        """Returns the time the given fraction of the latest events took at most"""
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        return samples[min(int(fraction * len(samples)), len(samples) - 1)]
+
+    def summary(self):
+        """Returns the count, mean, median, 99th percentile and worst time, in milliseconds, as a string"""
+        mean = self.total / self.count if self.count else 0.0
+        return "{0} mean {1:.3f} p50 {2:.3f} p99 {3:.3f} max {4:.3f}".format(
+            self.count, mean * 1000, self.percentile(0.5) * 1000, self.percentile(0.99) * 1000, self.worst * 1000)
+
+
+class Session(GameSession):
+    """A GameSession between a client and a ComputerPlayer, or between two clients
+
+    Client seats are played with plain Players, whose ships are placed and shots fired by the server on the client's
+    behalf. The ComputerPlayer, if any, is always player 1.
+
+    Attributes:
+        number (int): The number of the session on the server
+        clients (list of Client): The client in each seat, or None for the ComputerPlayer or an empty seat
+        latency (dict): Maps each of latency_kinds to the Latency of the session
+        shot_time (float): When the shot the ComputerPlayer is answering was fired
+        busy (bool): Whether the ComputerPlayer's move is out on one of the server's threads; until it's handed back,
+            only that thread touches the game
+        quitter (int): The seat of a client that left while the session was busy, or None; the game is conceded once
+            the move is handed back
+        showing (list of Client): The clients that sent SHOW while the session was busy, to answer once it isn't
+    """
+    def __init__(self, number, computer, seed=None, engine=DensityMap, geometry=None, fleet=None):
+        """Inits Session with the ComputerPlayer's ships placed, if there's a ComputerPlayer
+
+        Args:
+            number (int): The number of the session on the server
+            computer (bool): Whether player 1 is a ComputerPlayer rather than a second client
+            seed (int): The seed for the ComputerPlayer's Random
+            engine (class): The class the ComputerPlayer keeps its probability scores with
+            geometry (Geometry): The Geometry of the boards; the standard board if None
+            fleet (list): The (name, size) of every ship in each fleet; the standard 5 ships if None
+        """
+        opponent = ComputerPlayer(engine, Random(seed), geometry=geometry, fleet=fleet) if computer \
+            else Player(geometry, fleet)
+        GameSession.__init__(self, Player(geometry, fleet), opponent, seed if computer else None)
+        self.number = number
+        self.clients = [None, None]
+        self.latency = {kind: Latency() for kind in latency_kinds}
+        self.shot_time = None
+        self.busy = False
+        self.quitter = None
+        self.showing = []
+
+
+def no_delay(sock):
+    """Turns off Nagle's algorithm on a TCP socket, which would otherwise hold back short replies"""
+    if sock.family == socket.AF_INET:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class Client(asynchat.async_chat):
+    """A connection to the server
+
+    Attributes:
+        server (GameServer): The server the client is connected to
+        session (Session): The session the client is playing in, or None
+        seat (int): The player the client plays in the session
+    """
+    def __init__(self, server, sock):
+        """Inits Client for a newly accepted socket"""
+        asynchat.async_chat.__init__(self, sock, server.map)
+        no_delay(sock)
+        self.set_terminator('\n')
+        self.server = server
+        self.session = None
+        self.seat = None
+        self._received = []
+
+    def collect_incoming_data(self, data):
+        self._received.append(data)
+
+    def found_terminator(self):
+        line = "".join(self._received).strip()
+        self._received = []
+        if line:
+            self.server.command(self, line)
+
+    def send_line(self, text):
+        """Sends a line of text to the client"""
+        self.push(text + "\n")
+
+    def handle_close(self):
+        self.server.leave(self)
+        self.close()
+
+
+if hasattr(asyncore, 'file_dispatcher'):
+    class Waker(asyncore.file_dispatcher):
+        """The read end of a pipe in the server's loop, which other threads write to to wake the loop up"""
+        def __init__(self, server):
+            """Inits Waker with a new pipe"""
+            read, self._write = os.pipe()
+            asyncore.file_dispatcher.__init__(self, read, server.map)
+            # file_dispatcher keeps a copy of the file descriptor
+            os.close(read)
+            self.server = server
+
+        def wake(self):
+            """Wakes the loop up; safe to call from any thread"""
+            os.write(self._write, 'x')
+
+        def writable(self):
+            return False
+
+        def handle_read(self):
+            self.recv(4096)
+            self.server.finish_moves()
+
+        def close(self):
+            asyncore.file_dispatcher.close(self)
+            os.close(self._write)
+else:
+    Waker = None
+
+
+class GameServer(asyncore.dispatcher):
+    """Hosts games for clients connecting over a socket
+
+    Attributes:
+        map (dict): The asyncore socket map of the server's loop, which holds the server and every connection
+        address: The address the server is listening on; (host, port) for TCP, or the path of a Unix socket
+        sessions (dict): Maps the number of every session being played to the Session
+        waiting (Session): A session waiting for a second client, or None
+        finished (int): The number of games played to the end
+        latency (dict): Maps each of latency_kinds to the Latency of every session together
+        records (RecordWriter): The RecordWriter every finished game is recorded with, if any
+    """
+    def __init__(self, address, workers=4, engine=DensityMap, geometry=None, fleet=None, records=None):
+        """Inits GameServer listening on the given address
+
+        Args:
+            address: (host, port) to listen on TCP, where port 0 picks a free one, or a path to listen on a Unix socket
+            workers (int): The number of threads to play ComputerPlayers' turns on
+            engine (class): The class ComputerPlayers keep their probability scores with
+            geometry (Geometry): The Geometry of every board; the standard board if None
+            fleet (list): The (name, size) of every ship in each fleet; the standard 5 ships if None
+            records (RecordWriter): The RecordWriter to record finished games with, if any
+        """
+        self.map = {}
+        asyncore.dispatcher.__init__(self, map=self.map)
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.remove(address)
+            self.create_socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.set_reuse_addr()
+        self.bind(address)
+        self.listen(1024)
+        self.address = self.socket.getsockname()
+        self.engine = engine
+        self.geometry = geometry
+        self.fleet = fleet
+        self.records = records
+        self.sessions = {}
+        self.waiting = None
+        self.finished = 0
+        self.latency = {kind: Latency() for kind in latency_kinds}
+        self._numbers = 0
+        self._pool = ThreadPool(workers)
+        self._moves = Queue()
+        self._waker = Waker(self) if Waker is not None else None
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            Client(self, pair[0])
+
+    def serve(self, count=None):
+        """Runs the server's loop, forever or for the given number of polls"""
+        # without a Waker, finished moves are only noticed when a poll times out
+        timeout = 30.0 if self._waker is not None else 0.005
+        use_poll = hasattr(select, 'poll')
+        while self.map and count != 0:
+            asyncore.loop(timeout, use_poll, self.map, 1)
+            if self._waker is None:
+                self.finish_moves()
+            if count is not None:
+                count -= 1
+
+    def shutdown(self):
+        """Closes every connection and stops the threads"""
+        self._pool.close()
+        self._pool.join()
+        asyncore.close_all(self.map)
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+    def command(self, client, line):
+        """Carries out a command from a client"""
+        start = default_timer()
+        words = line.split()
+        name = words[0].lower()
+        try:
+            if name not in commands:
+                raise ServerError("unknown command " + words[0])
+            fewest, most = commands[name]
+            if not fewest <= len(words) - 1 <= most:
+                raise ServerError("wrong number of arguments to " + words[0].upper())
+            getattr(self, '_command_' + name)(client, *words[1:])
+        except (ServerError, SessionError) as error:
+            client.send_line("ERROR " + str(error))
+        if client.session is not None:
+            self._time(client.session, 'command', default_timer() - start)
+
+    def _time(self, session, kind, seconds):
+        """Adds a time to a session's Latency and the server's"""
+        session.latency[kind].add(seconds)
+        self.latency[kind].add(seconds)
+
+    def _command_new(self, client, opponent):
+        if client.session is not None:
+            raise ServerError("you're already in a game")
+        opponent = opponent.lower()
+        if opponent not in ('computer', 'human'):
+            raise ServerError("play against COMPUTER or HUMAN")
+        if opponent == 'human' and self.waiting is not None:
+            session = self.waiting
+            self.waiting = None
+            self._join(session, client, 1)
+            client.send_line("OK session {0}".format(session.number))
+            for seat in range(2):
+                self._prompt(session, seat)
+            return
+        self._numbers += 1
+        session = Session(self._numbers, opponent == 'computer', randrange(2 ** 32), self.engine, self.geometry,
+                          self.fleet)
+        self.sessions[session.number] = session
+        self._join(session, client, 0)
+        if opponent == 'computer':
+            client.send_line("OK session {0}".format(session.number))
+            self._prompt(session, 0)
+        else:
+            self.waiting = session
+            client.send_line("OK session {0} waiting for an opponent".format(session.number))
+
+    def _join(self, session, client, seat):
+        session.clients[seat] = client
+        client.session = session
+        client.seat = seat
+
+    def _prompt(self, session, seat):
+        """Tells a client the next ship to place"""
+        ship, size = session.unplaced[seat][0]
+        session.clients[seat].send_line("PLACE {0} {1}".format(ship, size))
+
+    def _command_place(self, client, location, direction=None):
+        session = self._session(client)
+        if session is self.waiting:
+            raise ServerError("you're waiting for an opponent")
+        if location.lower() == 'random':
+            session.place_random(client.seat)
+        elif direction is None:
+            raise ServerError("give a location and a direction, or RANDOM")
+        else:
+            ship = session.next_ship(client.seat)
+            try:
+                session.place(client.seat, location, direction)
+            except ShipError:
+                raise ServerError("the {0} can't go there".format(ship[0]))
+        client.send_line("OK")
+        if session.next_ship(client.seat) is not None:
+            self._prompt(session, client.seat)
+        elif session.phase == 'turn':
+            self._next_turn(session)
+
+    def _command_fire(self, client, location):
+        session = self._session(client)
+        if session.busy:
+            raise ServerError("it's the computer's turn")
+        try:
+            move = session.fire(client.seat, location)
+        except NodeError:
+            raise ServerError("{0} has already been fired on".format(location))
+        except KeyError:
+            raise ServerError("{0} isn't on the board".format(location))
+        result = move.result + (" " + move.ship if move.ship else "")
+        client.send_line("OK " + result)
+        opponent = session.clients[1 - client.seat]
+        if opponent is not None:
+            opponent.send_line("SHOT {0} {1}".format(move.location, result))
+        session.shot_time = default_timer()
+        self._next_turn(session)
+
+    def _command_show(self, client):
+        session = self._session(client)
+        if session.busy:
+            # the boards are being changed by the move's thread, so they're shown once it's handed back
+            session.showing.append(client)
+            return
+        self._show(session, client)
+
+    def _show(self, session, client):
+        """Sends a client both boards of its session"""
+        player = session.players[client.seat]
+        for line in (player.opposing_player.board.show() + "\n" + str(player.board)).split("\n"):
+            client.send_line("|" + line)
+        client.send_line("OK")
+
+    def _command_stats(self, client, scope=None):
+        if scope is not None and scope.lower() == 'all':
+            latency = self.latency
+            client.send_line("OK sessions {0} finished {1} ".format(len(self.sessions), self.finished) +
+                             " ".join("{0} {1}".format(kind, latency[kind].summary()) for kind in latency_kinds))
+            return
+        latency = self._session(client).latency
+        client.send_line("OK " + " ".join("{0} {1}".format(kind, latency[kind].summary()) for kind in latency_kinds))
+
+    def _command_quit(self, client):
+        client.send_line("OK")
+        self.leave(client)
+
+    def _session(self, client):
+        if client.session is None:
+            raise ServerError("you aren't in a game")
+        return client.session
+
+    def _next_turn(self, session):
+        """Moves a session on after a shot or once the ships are placed"""
+        if session.phase == 'finished':
+            self._end(session)
+        elif session.ai_turn:
+            session.busy = True
+            self._pool.apply_async(play_computer_turn, (session,), callback=self._moved)
+        else:
+            session.clients[session.turn].send_line("TURN")
+
+    def _moved(self, result):
+        """Hands a finished ComputerPlayer turn over to the loop; called on one of the pool's threads"""
+        self._moves.put(result)
+        if self._waker is not None:
+            self._waker.wake()
+
+    def finish_moves(self):
+        """Sends the results of every finished ComputerPlayer turn to the clients"""
+        while True:
+            try:
+                session, move, seconds = self._moves.get_nowait()
+            except Empty:
+                return
+            session.busy = False
+            showing, session.showing = session.showing, []
+            if session.quitter is not None:
+                # the client left while the move was being played
+                self._close(session, session.quitter)
+                continue
+            client = session.clients[0]
+            if isinstance(move, Exception):
+                client.send_line("ERROR the computer failed to move: {0}".format(move))
+                self.leave(client)
+                continue
+            client.send_line("SHOT {0} {1}".format(move.location, move.result + (" " + move.ship if move.ship else "")))
+            for waiting in showing:
+                self._show(session, waiting)
+            self._time(session, 'move', seconds)
+            if session.shot_time is not None:
+                self._time(session, 'reply', default_timer() - session.shot_time)
+            self._next_turn(session)
+
+    def _end(self, session):
+        """Tells the clients who won and records the game"""
+        for seat, client in enumerate(session.clients):
+            if client is not None:
+                client.send_line("OVER " + ("WON" if seat == session.winner else "LOST"))
+                client.session = None
+        if self.records is not None and session.log is not None:
+            self.records.write(session.record())
+            self.records.flush()
+        self.finished += 1
+        self.sessions.pop(session.number, None)
+
+    def leave(self, client):
+        """Takes a client out of its session, which the opponent wins
+
+        If the ComputerPlayer's move is out on a thread, the session is only closed once the move is handed back (see
+        finish_moves()), so the thread doesn't finish the game over the top of the concession.
+        """
+        session = client.session
+        if session is None:
+            return
+        session.clients[client.seat] = None
+        client.session = None
+        if session is self.waiting:
+            self.waiting = None
+            self.sessions.pop(session.number, None)
+        elif session.busy:
+            session.quitter = client.seat
+        else:
+            self._close(session, client.seat)
+
+    def _close(self, session, seat):
+        """Ends a session the client in a seat has left: the opponent wins, unless the game was over already"""
+        if session.phase == 'finished':
+            # the move that was out finished it
+            self._end(session)
+            return
+        session.concede(seat)
+        opponent = session.clients[1 - seat]
+        if opponent is not None:
+            opponent.send_line("OVER WON")
+            opponent.session = None
+        self.sessions.pop(session.number, None)
+
+
+def play_computer_turn(session):
+    """Plays a session's ComputerPlayer turn; run on one of the server's threads
+
+    Returns:
+        A tuple of the session, the Move or the exception raised, and the seconds the move took
+    """
+    start = default_timer()
+    try:
+        move = session.ai_move()
+    except Exception as error:
+        move = error
+    return session, move, default_timer() - start
+
+
+def run_server(address, workers, connection):
+    """Runs a GameServer until the process is stopped, sending its address down the given Connection once listening"""
+    server = GameServer(address, workers)
+    connection.send(server.address)
+    server.serve()
+
+
+class SimulatedClient(asynchat.async_chat):
+    """A client that plays games against the server on its own, for load testing
+
+    It places its ships at random and fires at random on cells it hasn't fired on yet.
+
+    Attributes:
+        games (int): The number of games left to play
+        human (bool): Whether it asks for games against other clients rather than ComputerPlayers
+        latency (dict): Latencies seen by the client: 'fire', from sending FIRE to getting its answer, and 'turn', from
+            sending FIRE to getting its next turn
+    """
+    def __init__(self, address, games, human, cells, rng, map):
+        """Inits SimulatedClient and starts connecting to the server"""
+        asynchat.async_chat.__init__(self, map=map)
+        self.create_socket(socket.AF_UNIX if isinstance(address, str) else socket.AF_INET, socket.SOCK_STREAM)
+        no_delay(self.socket)
+        self.set_terminator('\n')
+        self.games = games
+        self.human = human
+        self.cells = cells
+        self.rng = rng
+        self.latency = {'fire': Latency(), 'turn': Latency()}
+        self._received = []
+        self._targets = []
+        self._fired = None
+        self.connect(address)
+
+    def handle_connect(self):
+        self._new_game()
+
+    def _new_game(self):
+        self.games -= 1
+        self._targets = self.rng.sample(self.cells, len(self.cells))
+        self.push("NEW {0}\n".format("HUMAN" if self.human else "COMPUTER"))
+
+    def collect_incoming_data(self, data):
+        self._received.append(data)
+
+    def found_terminator(self):
+        line = "".join(self._received)
+        self._received = []
+        words = line.split()
+        if words[0] == 'PLACE':
+            self.push("PLACE RANDOM\n")
+        elif words[0] == 'TURN':
+            if self._fired is not None:
+                self.latency['turn'].add(default_timer() - self._fired)
+            self._fired = default_timer()
+            self.push("FIRE {0}\n".format(self._targets.pop()))
+        elif words[0] == 'OK' and len(words) > 1 and words[1] in shot_results:
+            self.latency['fire'].add(default_timer() - self._fired)
+        elif words[0] == 'OVER':
+            self._fired = None
+            if self.games:
+                self._new_game()
+            else:
+                self.close()
+        elif words[0] == 'ERROR':
+            raise ServerError(line)
+
+    def handle_close(self):
+        self.close()
+
+
+def load_test(clients, games=1, humans=0.0, address=('127.0.0.1', 0), workers=4, seed=None):
+    """Starts a server in another process and plays simulated clients against it, all at once
+
+    Args:
+        clients (int): The number of clients
+        games (int): The number of games each client plays
+        humans (float): The fraction of clients that play each other rather than ComputerPlayers; rounded down to an
+            even number of clients
+        address: The address for the server; see GameServer
+        workers (int): The number of threads the server plays ComputerPlayers' turns on
+        seed (int): Seed for the clients' shots
+
+    Returns:
+        A multi-line summary of the latencies the clients saw and the ones the server measured
+    """
+    from multiprocessing import Process, Pipe
+
+    here, there = Pipe()
+    process = Process(target=run_server, args=(address, workers, there))
+    process.daemon = True
+    process.start()
+    server_address = here.recv()
+    rng = Random(seed)
+    cells = list(geometry(10, 10).locations)
+    human_clients = int(clients * humans) // 2 * 2
+    map = {}
+    start = default_timer()
+    simulated = [SimulatedClient(server_address, games, number < human_clients, cells, Random(rng.random()), map)
+                 for number in range(clients)]
+    asyncore.loop(30.0, hasattr(select, 'poll'), map)
+    elapsed = default_timer() - start
+    stats = socket.socket(socket.AF_UNIX if isinstance(server_address, str) else socket.AF_INET, socket.SOCK_STREAM)
+    stats.connect(server_address)
+    stats.sendall("STATS ALL\n")
+    server_stats = stats.makefile().readline().strip()
+    stats.close()
+    process.terminate()
+    lines = ["Clients: {0} ({1} playing each other), {2} games each, {3:.2f} s".format(
+                 clients, human_clients, games, elapsed)]
+    for kind in ('fire', 'turn'):
+        latency = Latency()
+        for client in simulated:
+            latency.samples.extend(client.latency[kind].samples)
+            latency.count += client.latency[kind].count
+            latency.total += client.latency[kind].total
+            latency.worst = max(latency.worst, client.latency[kind].worst)
+        lines.append("Client {0} latency (ms): {1}".format(kind, latency.summary()))
+    lines.append("Server: " + server_stats)
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Host Battleship games over a socket, or load test a server.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to listen on (default 8765)")
+    parser.add_argument("--unix", default=None, help="path of a Unix socket to listen on instead of TCP")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="number of threads to play the computer's turns on (default 4)")
+    parser.add_argument("--record", default=None, help="record file to add finished games to")
+    parser.add_argument("--load", type=int, default=None,
+                        help="instead of serving, load test a new server with this many simulated clients")
+    parser.add_argument("--games", type=int, default=1, help="number of games each simulated client plays")
+    parser.add_argument("--humans", type=float, default=0.0,
+                        help="fraction of simulated clients that play each other rather than the computer")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for the simulated clients")
+    parser.add_argument("--endgame-budget", type=float, default=interactive_budget,
+                        help="most seconds a ComputerPlayer spends solving an endgame move before it plays its usual "
+                             "targeting (default %(default)g)")
+    args = parser.parse_args()
+    # set before the server starts, so a load test's server process has it too
+    endgame_solver.budget = args.endgame_budget
+    address = args.unix if args.unix is not None else (args.host, args.port)
+    if args.load is not None:
+        try:
+            import resource
+            # every client needs a file descriptor in this process and one in the server's
+            soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ImportError, ValueError):
+            pass
+        print(load_test(args.load, args.games, args.humans, address if args.unix else (args.host, 0), args.workers,
+                        args.seed))
+    else:
+        records = None if args.record is None else RecordWriter(args.record)
+        server = GameServer(address, args.workers, records=records)
+        print("Listening on {0}".format(server.address))
+        try:
+            server.serve()
+        except KeyboardInterrupt:
+            pass
+        server.shutdown()
+        if records is not None:
+            records.close()
@@ -0,0 +1,221 @@
+"""Game sessions
+
+A GameSession holds the rules of a game between two Players: the order ships are placed in, whose turn it is, and who
+has won. It never asks for input or prints anything; every move is a method call that returns what happened, so a game
+can be played by a terminal (see Game.py), a server (see Server.py) or a plain loop alike.
+
+A session goes through three phases:
+    placement: the Players are placing their ships, one ship at a time, in the order of their fleets; ComputerPlayers
+        place theirs as soon as the session starts
+    turn: the Players take turns to fire, player 0 first; fire() plays a human's turn and ai_move() a ComputerPlayer's
+    finished: one Player has sunk every ship of the other; winner says which
+
+Moves against the rules raise SessionError. A placement or a shot that the Board refuses raises the same errors Board
+does: ShipError for a ship that doesn't fit, NodeError for a location already fired on and KeyError for one that isn't
+on the board.
+"""
+
+from collections import namedtuple
+
+from Player import *
+from Records import *
+
+
+phases = ['placement', 'turn', 'finished']
+"""The phases of a GameSession, in order"""
+
+Move = namedtuple('Move', ['player', 'location', 'result', 'ship', 'mode'])
+"""A shot fired in a GameSession
+
+player is the Player who fired, 0 or 1. result is 'miss', 'hit' or 'sunk', and ship is the name of the ship sunk, or
+None. mode is the targeting mode a ComputerPlayer played the turn in (see ComputerPlayer.turn_mode), or None for a
+human.
+"""
+
+
+class SessionError(Exception):
+    """Raised for a move that isn't allowed in the session's phase, or by a Player whose turn it isn't"""
+    pass
+
+
+class GameSession(object):
+    """A game between two Players
+
+    Attributes:
+        players (list of Player): Player 0 and player 1; either can be a ComputerPlayer
+        seed (int): The seed the game is played with, for its GameRecord; None if it isn't known
+        phase (str): The phase the game is in; one of phases
+        turn (int): The Player whose turn it is to fire
+        winner (int): The Player who won, or None while the game isn't finished
+        unplaced (list of list): The (name, size) of every ship each Player still has to place, in order
+        log (GameLog): The record of the game, from the end of the placement phase
+    """
+    def __init__(self, player0, player1, seed=None):
+        """Inits GameSession in the placement phase, with the ComputerPlayers' ships placed
+
+        Args:
+            player0 (Player): The Player who fires first
+            player1 (Player): The other Player
+            seed (int): The seed the game is played with, for its GameRecord
+        """
+        self.players = [player0, player1]
+        player0.set_opponent(player1)
+        self.seed = seed
+        self.phase = 'placement'
+        self.turn = 0
+        self.winner = None
+        self.log = None
+        self.unplaced = []
+        for player in self.players:
+            if isinstance(player, ComputerPlayer):
+                player.setup()
+                self.unplaced.append([])
+            else:
+                self.unplaced.append(list(player.ships.items()))
+        self._start()
+
+    @property
+    def ai_turn(self):
+        """Whether it's a ComputerPlayer's turn to fire, so ai_move() is the next move"""
+        return self.phase == 'turn' and isinstance(self.players[self.turn], ComputerPlayer)
+
+    def next_ship(self, player):
+        """Returns (name, size) of the next ship the given Player has to place, or None if they've placed them all"""
+        return self.unplaced[player][0] if self.unplaced[player] else None
+
+    def place(self, player, location, direction):
+        """Places a Player's next ship
+
+        Args:
+            player (int): The Player placing the ship, 0 or 1
+            location (str): The location of one end of the ship
+            direction (str): The direction the ship goes in from there
+
+        Returns:
+            The Ship placed; raises ShipError if it doesn't fit there
+        """
+        ship, size = self._next(player)
+        placed = self.players[player].board.put_ship(size, location, direction, ship)
+        self.unplaced[player].pop(0)
+        self._start()
+        return placed
+
+    def place_random(self, player, rng=None):
+        """Places every ship a Player has left to place at random
+
+        Args:
+            player (int): The Player placing the ships, 0 or 1
+            rng (Random): The random number generator to use; defaults to the random module's shared one
+
+        Returns:
+            A list of the Ships placed
+        """
+        self._next(player)
+        board = self.players[player].board
+        ships = self.unplaced[player]
+        fleet = random_fleet([size for ship, size in ships], rng, board.geometry, board.ship_mask)
+        placed = [board.add_ship(cells, ship) for (ship, size), cells in zip(ships, fleet)]
+        self.unplaced[player] = []
+        self._start()
+        return placed
+
+    def fire(self, player, location):
+        """Fires a human Player's shot
+
+        Args:
+            player (int): The Player firing, 0 or 1
+            location (str): The location to fire on
+
+        Returns:
+            The Move; raises NodeError if the location has already been fired upon, or KeyError if it isn't on the board
+        """
+        self._check('turn')
+        if player != self.turn:
+            raise SessionError("it isn't player {0}'s turn".format(player))
+        if isinstance(self.players[player], ComputerPlayer):
+            raise SessionError("player {0} is a ComputerPlayer, which fires with ai_move()".format(player))
+        board = self.players[1 - player].board
+        board.fire(location.lower())
+        board.sink_ships()
+        return self._end_turn(None)
+
+    def ai_move(self):
+        """Plays the turn of the ComputerPlayer whose turn it is
+
+        Returns:
+            The Move
+        """
+        self._check('turn')
+        if not self.ai_turn:
+            raise SessionError("it isn't a ComputerPlayer's turn")
+        player = self.players[self.turn]
+        player.take_turn()
+        return self._end_turn(player.turn_mode)
+
+    def concede(self, player):
+        """Finishes the game early, with the other Player as the winner"""
+        self._check('placement', 'turn')
+        self.phase = 'finished'
+        self.winner = 1 - player
+
+    def record(self):
+        """Returns the GameRecord of the game so far"""
+        self._check('turn', 'finished')
+        return self.log.record()
+
+    def _check(self, *allowed):
+        """Raises SessionError unless the session is in one of the given phases"""
+        if self.phase not in allowed:
+            raise SessionError("the game is in the {0} phase".format(self.phase))
+
+    def _next(self, player):
+        """Returns the next ship a Player has to place, raising SessionError if there are none"""
+        self._check('placement')
+        if not self.unplaced[player]:
+            raise SessionError("player {0} has placed every ship".format(player))
+        return self.unplaced[player][0]
+
+    def _start(self):
+        """Moves on to the turn phase once every ship has been placed"""
+        if self.unplaced[0] or self.unplaced[1]:
+            return
+        self.phase = 'turn'
+        self.log = GameLog(self.seed, self.players[0].board, self.players[1].board)
+
+    def _end_turn(self, mode):
+        """Records the shot of the Player whose turn it is and passes the turn on, or finishes the game"""
+        player = self.turn
+        board = self.players[1 - player].board
+        self.log.turn(player, mode)
+        cell, result = self.log.shots[-1][1:3]
+        move = Move(player, board.geometry.locations[cell], result,
+                    board.ship_at[cell].name if result == 'sunk' else None, mode)
+        if board.ships:
+            self.turn = 1 - player
+        else:
+            self.phase = 'finished'
+            self.winner = player
+        return move
+
+
+# Benchmark of stepping many ComputerPlayer against ComputerPlayer sessions
+
+if __name__ == '__main__':
+    from timeit import default_timer
+
+    games = 2000
+    rng = Random(0)
+    sessions = [GameSession(ComputerPlayer(rng=Random(rng.random())), ComputerPlayer(rng=Random(rng.random())))
+                for game in range(games)]
+    start = default_timer()
+    moves = 0
+    # one move of every unfinished session at a time, the way a server interleaves them
+    playing = sessions
+    while playing:
+        for session in playing:
+            session.ai_move()
+        moves += len(playing)
+        playing = [session for session in playing if session.phase != 'finished']
+    elapsed = default_timer() - start
+    print("{0} games, {1} moves in {2:.2f} s: {3:.0f} games per second, {4:.0f} moves per second".format(
+        games, moves, elapsed, games / elapsed, moves / elapsed))
@@ -0,0 +1,352 @@
+"""Headless AI self-play simulator
+
+This module plays ComputerPlayer against ComputerPlayer without any input or output, to measure how strong the AI is
+(the number of shots it takes to sink every ship) and how fast it is (games per second, and the time each targeting
+mode takes per turn). Run it directly for a report:
+
+    python Simulator.py 1000 --seed 42
+
+Each game is one-sided, like the old test loop in Player.py: one ComputerPlayer fires on the other's randomly placed
+fleet until every ship is sunk. Games can be played on boards of any shape and with any fleet, to stress the AI:
+
+    python Simulator.py 100 --rows 100 --columns 100 --fleet 5,5,4,4,3,3,3,2,2,2
+
+Games can also be recorded in a record file (see Records.py) with --record, each with the seed of its own Random.
+With --stats, the AI's hot paths are counted and timed (see Stats.py) and reported for the whole run; --dump-stats also
+writes the counts and times of every game to a file, one JSON object per line, to find where a slow game spent its time.
+--book loads an opening book (see Book.py) into the shared one before the games start, instead of the default book_file.
+--no-endgame plays without the endgame solver (see Endgame.py), which is about four times as fast, for a weaker AI.
+--batch plays the games in lockstep batches with NumPy instead (see Batch.py), which is many times faster, but only
+reports the shots to win and the speed.
+
+Every game gets its own Random, seeded from the run's seed and the game's number, which both ComputerPlayers use for
+placing ships and breaking ties. That makes every game repeatable on its own, so tournament() can spread the games over
+a pool of processes and still get exactly the same statistics (apart from the timings) for the same seed, whatever the
+number of processes. Each process sends back a Results per chunk of games, which are merged as they arrive, so the
+memory used doesn't grow with the number of games.
+"""
+
+import json
+from collections import Counter
+from multiprocessing import Pool, cpu_count
+from random import Random, randrange
+from timeit import default_timer
+
+from Player import *
+from Records import *
+
+
+modes = ['search', 'pinpoint', 'destroy', 'montecarlo', 'endgame']
+"""The ComputerPlayer targeting modes, in the order they're reported; a turn is counted in the mode it was played in
+(see ComputerPlayer.turn_mode)"""
+
+
+class Results(object):
+    """Statistics collected over a number of simulated games
+
+    Attributes:
+        shots (Counter): Maps each number of shots taken to win a game to the number of games won in that many shots
+        elapsed (float): Total wall-clock seconds spent playing the games, including setup
+        mode_turns (dict): Maps each targeting mode to the number of turns played in that mode
+        mode_time (dict): Maps each targeting mode to the total seconds spent on turns played in that mode
+        stats (Stats): The instrumentation counters and timers of every game, if it was switched on
+    """
+    def __init__(self):
+        """Inits Results with no games played"""
+        self.shots = Counter()
+        self.elapsed = 0.0
+        self.mode_turns = {mode: 0 for mode in modes}
+        self.mode_time = {mode: 0.0 for mode in modes}
+        self.stats = Stats()
+
+    @property
+    def games(self):
+        """The number of games played"""
+        return sum(self.shots.values())
+
+    def mean(self):
+        """Returns the average number of shots taken to win a game"""
+        return sum(shots * count for shots, count in self.shots.items()) / float(self.games)
+
+    def percentile(self, fraction):
+        """Returns the smallest number of shots that at least the given fraction of games were won in"""
+        needed = fraction * self.games
+        seen = 0
+        for shots in sorted(self.shots):
+            seen += self.shots[shots]
+            if seen >= needed:
+                return shots
+
+    def merge(self, other):
+        """Adds the statistics of another Results to these ones"""
+        self.shots.update(other.shots)
+        self.elapsed += other.elapsed
+        for mode in modes:
+            self.mode_turns[mode] += other.mode_turns[mode]
+            self.mode_time[mode] += other.mode_time[mode]
+        self.stats.merge(other.stats.snapshot())
+
+    def report(self):
+        """Returns a multi-line summary of the statistics"""
+        lines = ["Games: {0}".format(self.games),
+                 "Shots to win: mean {0:.2f}, min {1}, median {2}, 90th percentile {3}, max {4}".format(
+                     self.mean(), min(self.shots), self.percentile(0.5), self.percentile(0.9), max(self.shots)),
+                 "Games per second: {0:.1f}".format(self.games / self.elapsed if self.elapsed else 0.0)]
+        for mode in modes:
+            if self.mode_turns[mode]:
+                lines.append("{0:>8}: {1} turns, {2:.3f} ms per turn".format(
+                    mode, self.mode_turns[mode], self.mode_time[mode] / self.mode_turns[mode] * 1000))
+        lines.append("Distribution:")
+        for shots in sorted(self.shots):
+            lines.append("{0:>5} {1}".format(shots, self.shots[shots]))
+        if self.stats.counts:
+            lines.append("Instrumentation:")
+            lines.append(self.stats.report())
+        return "\n".join(lines)
+
+
+def game_seed(seed, game):
+    """Returns the seed for the Random of a specific game of a run with the given seed"""
+    return seed * 2 ** 40 + game
+
+
+def play(results, engine=DensityMap, rng=None, montecarlo=None, shape=(10, 10), fleet=None, records=None, seed=None,
+         dumps=None, pool=None):
+    """Plays one headless game and adds it to the given Results
+
+    Args:
+        results (Results): The Results to add the game to
+        engine (class): The class the attacking ComputerPlayer uses to keep its probability scores
+        rng (Random): The random number generator for both players; defaults to the random module's shared one
+        montecarlo (tuple): (samples, budget) to have the attacker play in montecarlo mode with a PosteriorSampler
+            of that many samples and that per-move budget; None plays the normal modes
+        shape (tuple): (rows, columns) of the boards
+        fleet (dict): The names of the defender's ships and their sizes; the standard 5 ships if None
+        records (list): A list to add the GameRecord of the game to, if any; the attacker is player 0
+        seed (int): The seed rng was made with, for the GameRecord and the dump
+        dumps (list): A list to add the seed, the shots and the instrumentation snapshot of the game to, if any; only
+            used when stats are enabled
+        pool (LayoutPool): The layouts the defender places its ships from; None places them at random, so the AI is
+            measured against the same fleets whatever layouts have been found
+
+    Returns:
+        The number of shots the attacker took to sink every ship
+    """
+    if stats.enabled:
+        stats.reset()
+        book = (opening_book.hits, opening_book.misses)
+    start = default_timer()
+    board_geometry = geometry(*shape)
+    defender = ComputerPlayer(rng=rng, geometry=board_geometry, fleet=fleet, pool=pool)
+    sampler = None
+    if montecarlo is not None:
+        sampler = PosteriorSampler(defender.ships.values(), *montecarlo, geometry=board_geometry)
+    attacker = ComputerPlayer(engine, rng, sampler, board_geometry, fleet)
+    attacker.set_opponent(defender)
+    defender.setup()
+    log = None if records is None else GameLog(seed, attacker.board, defender.board)
+    shots = 0
+    while defender.board.ships:
+        turn_start = default_timer()
+        attacker.take_turn()
+        mode = attacker.turn_mode
+        results.mode_time[mode] += default_timer() - turn_start
+        results.mode_turns[mode] += 1
+        shots += 1
+        if log is not None:
+            log.turn(0, mode)
+    if log is not None:
+        records.append(log.record())
+    results.shots[shots] += 1
+    results.elapsed += default_timer() - start
+    if stats.enabled:
+        stats.count('opening book hits', opening_book.hits - book[0])
+        stats.count('opening book misses', opening_book.misses - book[1])
+        snapshot = stats.snapshot()
+        results.stats.merge(snapshot)
+        if dumps is not None:
+            snapshot.update(seed=seed, shots=shots)
+            dumps.append(snapshot)
+    return shots
+
+
+def play_chunk(task):
+    """Plays a run of consecutive games of a simulation; used by the processes in tournament()
+
+    Args:
+        task (tuple): (seed, number of the first game, number of games, engine, montecarlo, shape, fleet, whether to
+            record the games, whether to switch stats on, whether to dump the stats of every game, defenders' pool)
+
+    Returns:
+        A tuple of a Results containing the statistics of the games, a list of their GameRecords, which is empty
+        unless they're recorded, and a list of their stats dumps, which is empty unless they're dumped
+    """
+    seed, first, games, engine, montecarlo, shape, fleet, record, instrument, dump, pool = task
+    stats.enabled = instrument
+    results = Results()
+    records = [] if record else None
+    dumps = [] if dump else None
+    for game in range(first, first + games):
+        rng_seed = game_seed(seed, game)
+        play(results, engine, Random(rng_seed), montecarlo, shape, fleet, records, rng_seed, dumps, pool)
+    return results, records or [], dumps or []
+
+
+def write_dumps(dumps, stream):
+    """Writes stats dumps to a stream, one JSON object per line"""
+    for dump in dumps:
+        stream.write(json.dumps(dump, sort_keys=True) + "\n")
+
+
+def simulate(games, seed=None, engine=DensityMap, montecarlo=None, shape=(10, 10), fleet=None, records=None,
+             instrument=False, dumps=None, pool=None):
+    """Plays a number of headless games in this process
+
+    Args:
+        games (int): The number of games to play
+        seed (int): Seed for the run, so it can be repeated exactly; None picks one at random
+        engine (class): The class the attacking ComputerPlayers use to keep their probability scores
+        montecarlo (tuple): (samples, budget) for attacking ComputerPlayers in montecarlo mode; see play()
+        shape (tuple): (rows, columns) of the boards
+        fleet (dict): The names of the ships in every fleet and their sizes; the standard 5 ships if None
+        records (RecordWriter): The RecordWriter to record the games with, if any
+        instrument (bool): Whether to switch stats on and collect them in the Results
+        dumps (file): A stream to write the stats of every game to, which switches stats on; see write_dumps()
+        pool (LayoutPool): The layouts the defenders place their ships from; None places them at random
+
+    Returns:
+        A Results containing the statistics of every game
+    """
+    if seed is None:
+        seed = randrange(2 ** 32)
+    results, game_records, game_dumps = play_chunk((seed, 0, games, engine, montecarlo, shape, fleet,
+                                                    records is not None, instrument or dumps is not None,
+                                                    dumps is not None, pool))
+    for record in game_records:
+        records.write(record)
+    if dumps is not None:
+        write_dumps(game_dumps, dumps)
+    return results
+
+
+def tournament(games, seed=None, engine=DensityMap, workers=None, chunk=1000, montecarlo=None, shape=(10, 10),
+               fleet=None, records=None, instrument=False, dumps=None, pool=None):
+    """Plays a number of headless games spread across a pool of processes
+
+    Gives the same statistics as simulate() for the same seed, apart from the timings.
+
+    Args:
+        games (int): The number of games to play
+        seed (int): Seed for the run, so it can be repeated exactly; None picks one at random
+        engine (class): The class the attacking ComputerPlayers use to keep their probability scores
+        workers (int): The number of processes to use; defaults to the number of CPUs
+        chunk (int): The number of games each process plays before sending back its results
+        montecarlo (tuple): (samples, budget) for attacking ComputerPlayers in montecarlo mode; see play()
+        shape (tuple): (rows, columns) of the boards
+        fleet (dict): The names of the ships in every fleet and their sizes; the standard 5 ships if None
+        records (RecordWriter): The RecordWriter to record the games with, if any; the chunks of games are written in
+            the order they finish, and every game can be told apart by its seed
+        instrument (bool): Whether to switch stats on and collect them in the Results
+        dumps (file): A stream to write the stats of every game to, which switches stats on; see write_dumps()
+        pool (LayoutPool): The layouts the defenders place their ships from; None places them at random
+
+    Returns:
+        A Results containing the statistics of every game
+    """
+    if seed is None:
+        seed = randrange(2 ** 32)
+    workers = workers or cpu_count()
+    instrument = instrument or dumps is not None
+    tasks = ((seed, first, min(chunk, games - first), engine, montecarlo, shape, fleet, records is not None,
+              instrument, dumps is not None, pool) for first in range(0, games, chunk))
+    if workers == 1:
+        chunks = (play_chunk(task) for task in tasks)
+        processes = None
+    else:
+        processes = Pool(workers)
+        chunks = processes.imap_unordered(play_chunk, tasks)
+    results = Results()
+    start = default_timer()
+    for chunk_results, game_records, game_dumps in chunks:
+        results.merge(chunk_results)
+        for record in game_records:
+            records.write(record)
+        if dumps is not None:
+            write_dumps(game_dumps, dumps)
+    if processes is not None:
+        processes.close()
+        processes.join()
+    results.elapsed = default_timer() - start
+    return results
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Play ComputerPlayer against ComputerPlayer and report the AI's strength "
+                                        "and speed.")
+    parser.add_argument("games", type=int, nargs="?", default=100, help="number of games to play (default 100)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, for repeatable runs")
+    parser.add_argument("--engine", choices=["density", "placement"], default="density",
+                        help="search-mode scoring engine (placement needs NumPy)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes to play on; 0 uses every CPU (default 1)")
+    parser.add_argument("--samples", type=int, default=None,
+                        help="play the attacker in montecarlo mode with this many sampled layouts")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="most seconds per move to spend sampling in montecarlo mode (default no limit)")
+    parser.add_argument("--rows", type=int, default=10, help="number of rows on the boards (default 10)")
+    parser.add_argument("--columns", type=int, default=10, help="number of columns on the boards (default 10)")
+    parser.add_argument("--fleet", default=None,
+                        help="comma-separated sizes of the ships in each fleet (default the standard 5 ships)")
+    parser.add_argument("--record", default=None, help="record file to add the games to")
+    parser.add_argument("--book", default=None, help="opening book to play the games with (default %s)" % book_file)
+    parser.add_argument("--no-endgame", action="store_true",
+                        help="play without the endgame solver, for about four times as many games a second (see "
+                             "Endgame.py)")
+    parser.add_argument("--stats", action="store_true", help="count and time the AI's hot paths and report them")
+    parser.add_argument("--dump-stats", default=None,
+                        help="file to write the counts and times of every game to, one JSON object per line")
+    parser.add_argument("--batch", type=int, default=None,
+                        help="play the games in lockstep batches of this many with NumPy (see Batch.py)")
+    parser.add_argument("--pool", default=None,
+                        help="layout file the defenders place their ships from (default random placement); "
+                             "see Optimizer.py")
+    args = parser.parse_args()
+    if args.batch is not None and args.pool is not None:
+        parser.error("--pool can't be used with --batch")
+    if args.seed is None:
+        args.seed = randrange(2 ** 32)
+    fleet = None
+    if args.fleet is not None:
+        fleet = {"Ship {0}".format(number + 1): int(size) for number, size in enumerate(args.fleet.split(","))}
+    records = None if args.record is None else RecordWriter(args.record)
+    if args.no_endgame:
+        # set now, so every worker starts with it
+        endgame_solver.ships = 0
+    if args.book is not None:
+        # loaded now rather than lazily, so every worker starts with it
+        opening_book.path = None
+        try:
+            opening_book.load(args.book)
+        except (IOError, ValueError) as error:
+            parser.error("can't use the opening book: {0}".format(error))
+    dumps = None if args.dump_stats is None else open(args.dump_stats, "w")
+    pool = None
+    if args.pool is not None:
+        # loaded now rather than lazily, so every worker starts with it
+        pool = LayoutPool()
+        pool.load(args.pool)
+    print("Seed: {0}".format(args.seed))
+    if args.batch is not None:
+        from Batch import batch_simulate
+        print(batch_simulate(args.games, args.seed, (args.rows, args.columns), fleet, args.batch).report())
+    else:
+        print(tournament(args.games, args.seed, PlacementDensity if args.engine == "placement" else DensityMap,
+                         args.workers, montecarlo=None if args.samples is None else (args.samples, args.budget),
+                         shape=(args.rows, args.columns), fleet=fleet, records=records, instrument=args.stats,
+                         dumps=dumps, pool=pool).report())
+    if records is not None:
+        records.close()
+    if dumps is not None:
+        dumps.close()
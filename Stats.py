@@ -0,0 +1,78 @@
+"""Instrumentation counters and timers
+
+The shared Stats object, stats, counts how often the hot paths of the AI and the Board are taken and times the
+ComputerPlayer's turns, so a slow game can be traced to where it spent its time. It's switched off by default; every
+place that records something checks stats.enabled first, so switched off it costs one attribute lookup per call.
+
+Counters:
+    Board.neighborhoods: calls to Board.neighborhoods()
+    adjacent: calls to adjacent()
+    random_fleet restarts: fleets started again because the ships placed so far left no room for the next one (since
+        ships are drawn from their legal placements, this is the only retrying ComputerPlayer.setup() can do)
+    DensityMap rebuilds, DensityMap rescored cells: scores worked out from scratch, and cells rescored after a shot
+    opening book hits, opening book misses: lookups in Book.opening_book, counted by Simulator.py for each game from
+        the book's own statistics
+    search redraws: best cells drawn in search mode that had already been fired upon, and were drawn again
+    fallback <mode> to <mode>: turns a targeting mode handed on to another because it had nowhere left to fire
+    endgame shots, endgame fallbacks: turns the EndgameSolver picked the shot on, and turns it was tried on but gave up
+Timers, which also count their calls:
+    take_turn <mode>: whole turns of a ComputerPlayer, by the mode the turn was played in: the mode it started in, or
+        endgame if the EndgameSolver picked the shot
+
+Simulator.py can turn it on and report it, as a whole or per game (see its --stats and --dump-stats options).
+"""
+
+from collections import Counter
+
+
+class Stats(object):
+    """Counters and timers that can be switched off
+
+    Attributes:
+        enabled (bool): Whether anything is recorded
+        counts (Counter): Maps the name of every counter or timer to the number of times it was counted or timed
+        times (Counter): Maps the name of every timer to its total seconds
+    """
+    def __init__(self, enabled=False):
+        """Inits Stats with nothing recorded"""
+        self.enabled = enabled
+        self.counts = Counter()
+        self.times = Counter()
+
+    def count(self, name, number=1):
+        """Adds to a counter; callers check enabled first"""
+        self.counts[name] += number
+
+    def time(self, name, seconds):
+        """Adds a timing to a timer; callers check enabled first"""
+        self.counts[name] += 1
+        self.times[name] += seconds
+
+    def reset(self):
+        """Clears every counter and timer"""
+        self.counts = Counter()
+        self.times = Counter()
+
+    def snapshot(self):
+        """Returns a copy of every counter and timer, as a dictionary of 'counts' and 'times' that JSON can hold"""
+        return {'counts': dict(self.counts), 'times': dict(self.times)}
+
+    def merge(self, snapshot):
+        """Adds the counters and timers of a snapshot to these ones"""
+        self.counts.update(snapshot['counts'])
+        self.times.update(snapshot['times'])
+
+    def report(self):
+        """Returns a multi-line summary of every counter and timer"""
+        lines = []
+        for name in sorted(self.counts):
+            if name in self.times:
+                lines.append("{0:>32}: {1} calls, {2:.3f} s, {3:.3f} ms per call".format(
+                    name, self.counts[name], self.times[name], self.times[name] / self.counts[name] * 1000))
+            else:
+                lines.append("{0:>32}: {1}".format(name, self.counts[name]))
+        return "\n".join(lines)
+
+
+stats = Stats()
+"""The Stats shared by the whole game"""